@@ -11,14 +11,23 @@ import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import os
+import time
 from modules.validator import FileValidator
 
 # Import custom modules
 from modules.cleaner import DataCleaner
 from modules.simulator import Simulator
+from modules.inventory import InventoryEngine
+from modules.elasticity import ElasticityEstimator
+from modules.jobs import JobRunner
+from modules.profiler import DataProfiler
+from modules.rules import rule_catalog
+from modules.keys import intern_keys, DimensionLookup
+from modules.excel import read_excel_workbook, detect_sheets
 from modules.utils import (
     CONFIG, SIMULATOR_CONFIG, CHART_THEME, 
-    style_plotly_chart, load_sample_data, get_data_summary
+    style_plotly_chart, load_sample_data, get_data_summary, get_dataset_metadata,
+    read_csv_files, SAMPLE_DATA_FILES, write_export_archive, EXPORT_FORMATS
 )
 
 # ============================================================================
@@ -941,10 +950,131 @@ if 'clean_inventory' not in st.session_state:
     st.session_state.clean_inventory = None
 if 'issues_df' not in st.session_state:
     st.session_state.issues_df = None
+if 'issue_lineage' not in st.session_state:
+    st.session_state.issue_lineage = None
 if 'is_cleaned' not in st.session_state:
     st.session_state.is_cleaned = False
 if 'data_loaded' not in st.session_state:
     st.session_state.data_loaded = False
+if 'cleaning_job_id' not in st.session_state:
+    st.session_state.cleaning_job_id = None
+# data_version the running clean was submitted for; other versions discard its result
+if 'cleaning_job_version' not in st.session_state:
+    st.session_state.cleaning_job_version = None
+if 'dry_run' not in st.session_state:
+    st.session_state.dry_run = None
+# Rule toggles/overrides of the last submitted clean (see Cleaner page)
+if 'rule_settings_requested' not in st.session_state:
+    st.session_state.rule_settings_requested = None
+# Bumped whenever raw or cleaned data is replaced; keys per-dataset caches
+if 'data_version' not in st.session_state:
+    st.session_state.data_version = 0
+if 'export_cache' not in st.session_state:
+    st.session_state.export_cache = None
+
+# ============================================================================
+# BACKGROUND CLEANING
+# ============================================================================
+
+def run_cleaning_job(raw_products, raw_stores, raw_sales, raw_inventory, progress_callback=None,
+                     disabled_rules=None, rule_overrides=None):
+    """Clean all tables off the script thread; returns everything the session needs."""
+    cleaner = DataCleaner()
+    clean_products, clean_stores, clean_sales, clean_inventory = cleaner.clean_all(
+        raw_products, raw_stores, raw_sales, raw_inventory, progress_callback=progress_callback,
+        disabled_rules=disabled_rules, rule_overrides=rule_overrides
+    )
+    return {
+        'clean_products': clean_products,
+        'clean_stores': clean_stores,
+        'clean_sales': clean_sales,
+        'clean_inventory': clean_inventory,
+        'issues_df': cleaner.get_issues_df(),
+        'issue_lineage': cleaner.get_lineage(),
+        'cleaner_stats': cleaner.stats,
+        'cleaning_report': cleaner.cleaning_report,
+        'applied_rule_settings': {'disabled_rules': disabled_rules or [], 'rule_overrides': rule_overrides or {}}
+    }
+
+def collect_cleaning_job():
+    """Apply a finished cleaning job to the session; returns the job status (None if no job).
+    
+    A result for data that was replaced while the job ran is discarded
+    (status 'stale') so it cannot overwrite the newer data.
+    """
+    job_id = st.session_state.cleaning_job_id
+    if not job_id:
+        return None
+    
+    runner = JobRunner()
+    status = runner.status(job_id)
+    if status is None:
+        st.session_state.cleaning_job_id = None
+        return None
+    if status['finished_at'] is None:
+        return status
+    
+    result = runner.result(job_id)
+    st.session_state.cleaning_job_id = None
+    if status['status'] == 'done' and st.session_state.cleaning_job_version != st.session_state.data_version:
+        status['status'] = 'stale'
+    elif status['status'] == 'done' and result is not None:
+        for key, value in result.items():
+            st.session_state[key] = value
+        st.session_state.is_cleaned = True
+        st.session_state.data_version += 1
+    return status
+
+# Pick up results of a clean that finished while the user was on another page
+cleaning_job_status = collect_cleaning_job()
+
+# Delete an export archive built for data that has since been replaced
+if st.session_state.export_cache is not None and st.session_state.export_cache['key'][0] != st.session_state.data_version:
+    st.session_state.export_cache['archive'].release()
+    st.session_state.export_cache = None
+
+@st.fragment(run_every=0.5)
+def show_cleaning_progress():
+    """Progress and cancel button of the running clean, refreshed on its own (not a full rerun)."""
+    job_id = st.session_state.cleaning_job_id
+    status = JobRunner().status(job_id) if job_id else None
+    if status is None or status['finished_at'] is not None:
+        # Rerun the whole page so collect_cleaning_job applies the result
+        st.rerun()
+    
+    st.progress(status['progress'], text=f"🔄 {status['stage']} — {status['rows_processed']:,} / {status['total_rows']:,} rows ({status['elapsed_seconds']:.1f}s)")
+    if st.button("⏹️ Cancel Cleaning", use_container_width=True):
+        JobRunner().cancel(status['id'])
+
+def dataset_metadata():
+    """Summary stats for the current data, computed once per data version."""
+    key = (st.session_state.data_version, st.session_state.is_cleaned)
+    cached = st.session_state.get('dataset_metadata')
+    if cached is not None and cached['key'] == key:
+        return cached
+    
+    tables = {name: st.session_state[f'raw_{name}'] for name in ['products', 'stores', 'sales', 'inventory']}
+    sales_df = st.session_state.clean_sales if st.session_state.is_cleaned else st.session_state.raw_sales
+    metadata = get_dataset_metadata(tables, sales_df)
+    metadata['key'] = key
+    st.session_state.dataset_metadata = metadata
+    return metadata
+
+def view_cached(name, key, compute):
+    """compute() kept in session state until key (data version plus view filters) changes.
+    
+    Filtered frames are rebuilt on every rerun, so caches keyed on their
+    content would rehash every row each time; the view key is free.
+    Without a key nothing is cached.
+    """
+    if key is None:
+        return compute()
+    cached = st.session_state.get(name)
+    if cached is not None and cached['key'] == key:
+        return cached['value']
+    value = compute()
+    st.session_state[name] = {'key': key, 'value': value}
+    return value
 
 # ============================================================================
 # SIDEBAR NAVIGATION
@@ -1018,13 +1148,9 @@ with st.sidebar:
         
         sales_df = st.session_state.clean_sales if st.session_state.is_cleaned else st.session_state.raw_sales
         if sales_df is not None:
-            total_records = len(sales_df)
-            try:
-                qty = pd.to_numeric(sales_df['qty'], errors='coerce').fillna(0)
-                price = pd.to_numeric(sales_df['selling_price_aed'], errors='coerce').fillna(0)
-                total_revenue = (qty * price).sum()
-            except:
-                total_revenue = 0
+            metadata = dataset_metadata()
+            total_records = metadata['sales_records']
+            total_revenue = metadata['sales_revenue']
             
             st.markdown(f"""
             <div style="background: var(--bg-card); border-radius: var(--radius-lg); padding: 20px; border: 1px solid var(--border-default);">
@@ -1044,20 +1170,27 @@ with st.sidebar:
         st.markdown("---")
         st.markdown('<p style="color: var(--accent-green); font-weight: 700; letter-spacing: 2px; font-size: 0.75rem;">📥 EXPORT</p>', unsafe_allow_html=True)
         
-        import io, zipfile
-        zip_buffer = io.BytesIO()
-        with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-            if st.session_state.clean_products is not None:
-                zip_file.writestr("cleaned_products.csv", st.session_state.clean_products.to_csv(index=False))
-            if st.session_state.clean_stores is not None:
-                zip_file.writestr("cleaned_stores.csv", st.session_state.clean_stores.to_csv(index=False))
-            if st.session_state.clean_sales is not None:
-                zip_file.writestr("cleaned_sales.csv", st.session_state.clean_sales.to_csv(index=False))
-            if st.session_state.clean_inventory is not None:
-                zip_file.writestr("cleaned_inventory.csv", st.session_state.clean_inventory.to_csv(index=False))
-        zip_buffer.seek(0)
-        
-        st.download_button("📦 Download All (ZIP)", data=zip_buffer, file_name="cleaned_data.zip", mime="application/zip", use_container_width=True)
+        export_format = st.radio("Format", EXPORT_FORMATS, horizontal=True, key="export_format", label_visibility="collapsed")
+        export_key = (st.session_state.data_version, export_format)
+        export = st.session_state.export_cache
+        
+        # Archives are built on request only and reused until the data changes
+        if export is None or export['key'] != export_key or not export['archive'].exists():
+            if st.button("🗜️ Prepare Export", use_container_width=True):
+                with st.spinner("Building archive..."):
+                    frames = {
+                        f"cleaned_{name}": st.session_state[f"clean_{name}"]
+                        for name in ['products', 'stores', 'sales', 'inventory']
+                        if st.session_state[f"clean_{name}"] is not None
+                    }
+                    if export is not None:
+                        export['archive'].release()
+                    st.session_state.export_cache = {'key': export_key, 'archive': write_export_archive(frames, export_format)}
+                st.rerun()
+        else:
+            size_mb = os.path.getsize(export['archive'].path) / (1024 * 1024)
+            with open(export['archive'].path, 'rb') as archive:
+                st.download_button(f"📦 Download All (ZIP, {size_mb:.1f} MB)", data=archive, file_name="cleaned_data.zip", mime="application/zip", use_container_width=True)
 
 # ============================================================================
 # PAGE: HOME
@@ -1170,11 +1303,37 @@ def show_dashboard_page():
             if len(selected_categories) == 0:
                 selected_categories = all_categories
     
-    # Apply filters
-    filtered_sales = sales_df.copy()
-    filtered_stores = stores_df.copy() if stores_df is not None else None
-    filtered_products = products_df.copy() if products_df is not None else None
-    filtered_inventory = inventory_df.copy() if inventory_df is not None else None
+    fix_filter = "All rows"
+    if st.session_state.is_cleaned and DataCleaner.FIX_FLAG_COLUMN in sales_df.columns:
+        fix_options = ["All rows", "Untouched rows only", "Any fixed rows"] + list(DataCleaner.FIX_FLAGS.keys())
+        fix_col, _ = st.columns([1, 3])
+        with fix_col:
+            fix_filter = st.selectbox("🩹 Row Fixes", fix_options, format_func=lambda f: f"Rows with {f.lower().replace('_', ' ')}" if f in DataCleaner.FIX_FLAGS else f, key="global_fix_filter")
+    
+    # Apply filters (frames are only selected from, never modified, so no copies)
+    filtered_sales = sales_df
+    filtered_stores = stores_df
+    filtered_products = products_df
+    filtered_inventory = inventory_df
+    
+    # Identifies the filtered data for per-view caches (see view_cached)
+    view_key = (st.session_state.data_version, st.session_state.is_cleaned, tuple(date_range) if date_range else None,
+                tuple(selected_cities), tuple(selected_channels), tuple(selected_categories), fix_filter)
+    
+    # Fix flags: bitwise tests on each table's fix_flags; product/store filters propagate below
+    if fix_filter != "All rows":
+        tables = {'sales': filtered_sales, 'stores': filtered_stores, 'products': filtered_products, 'inventory': filtered_inventory}
+        for table_name, table_df in tables.items():
+            if table_df is None:
+                continue
+            if fix_filter == "Untouched rows only":
+                tables[table_name] = table_df[DataCleaner.fix_flag_mask(table_df, untouched=True)]
+            elif fix_filter == "Any fixed rows":
+                if table_name == 'sales':
+                    tables[table_name] = table_df[DataCleaner.fix_flag_mask(table_df)]
+            elif DataCleaner.FIX_FLAG_TABLES[fix_filter] == table_name:
+                tables[table_name] = table_df[DataCleaner.fix_flag_mask(table_df, [fix_filter])]
+        filtered_sales, filtered_stores, filtered_products, filtered_inventory = tables['sales'], tables['stores'], tables['products'], tables['inventory']
     
     if date_range and len(date_range) == 2 and 'order_time' in filtered_sales.columns:
         start_date, end_date = date_range
@@ -1225,10 +1384,10 @@ def show_dashboard_page():
     category_kpis = sim.calculate_kpis_by_dimension(filtered_sales, filtered_stores, filtered_products, 'category')
     
     with tab_exec:
-        show_executive_view(kpis, city_kpis, channel_kpis, category_kpis, filtered_sales, filtered_products, filtered_stores)
+        show_executive_view(kpis, city_kpis, channel_kpis, category_kpis, filtered_sales, filtered_products, filtered_stores, view_key)
     
     with tab_mgr:
-        show_manager_view(kpis, city_kpis, channel_kpis, category_kpis, filtered_sales, filtered_products, filtered_stores, filtered_inventory)
+        show_manager_view(kpis, city_kpis, channel_kpis, category_kpis, filtered_sales, filtered_products, filtered_stores, filtered_inventory, view_key)
     
     st.markdown("---")
     
@@ -1246,7 +1405,7 @@ def show_dashboard_page():
     show_footer()
 
 
-def show_executive_view(kpis, city_kpis, channel_kpis, category_kpis, sales_df, products_df, stores_df):
+def show_executive_view(kpis, city_kpis, channel_kpis, category_kpis, sales_df, products_df, stores_df, view_key=None):
     """Display Executive View - Financial & Strategic KPIs with ALL charts."""
     
     # ===== KPI CARDS =====
@@ -1429,15 +1588,17 @@ def show_executive_view(kpis, city_kpis, channel_kpis, category_kpis, sales_df,
         # CHART 4: Sunburst - Revenue Mix
         if sales_df is not None and stores_df is not None and products_df is not None:
             try:
-                sunburst_df = sales_df.copy()
+                # Only the needed sales columns, with store/product attributes gathered by key
+                sunburst_df = sales_df[[col for col in ['qty', 'selling_price_aed', 'payment_status'] if col in sales_df.columns]]
                 
-                if 'store_id' in sunburst_df.columns and 'store_id' in stores_df.columns:
-                    sunburst_df = sunburst_df.merge(stores_df[['store_id', 'city', 'channel']], on='store_id', how='left')
+                if 'store_id' in sales_df.columns and 'store_id' in stores_df.columns:
+                    stores_by_id = DimensionLookup(stores_df, 'store_id')
+                    sunburst_df = sunburst_df.assign(**stores_by_id.gather(sales_df['store_id'], {'city': 'city', 'channel': 'channel'}))
                 
-                if 'sku' in sunburst_df.columns and 'sku' in products_df.columns:
-                    sunburst_df = sunburst_df.merge(products_df[['sku', 'category']], on='sku', how='left')
-                elif 'product_id' in sunburst_df.columns and 'product_id' in products_df.columns:
-                    sunburst_df = sunburst_df.merge(products_df[['product_id', 'category']], on='product_id', how='left')
+                sku_col = 'sku' if 'sku' in sales_df.columns and 'sku' in products_df.columns else 'product_id'
+                if sku_col in sales_df.columns and sku_col in products_df.columns:
+                    products_by_sku = DimensionLookup(products_df, sku_col)
+                    sunburst_df = sunburst_df.assign(**products_by_sku.gather(sales_df[sku_col], {'category': 'category'}))
                 
                 if all(col in sunburst_df.columns for col in ['city', 'channel', 'category', 'selling_price_aed']):
                     if 'qty' in sunburst_df.columns:
@@ -1489,40 +1650,34 @@ def show_executive_view(kpis, city_kpis, channel_kpis, category_kpis, sales_df,
         
         margin_floor = st.slider("Margin Floor %", min_value=10, max_value=40, value=20, step=5, key="discount_margin_floor")
         
-        base_revenue = kpis.get('total_revenue', 0)
-        base_cogs = kpis.get('total_cogs', 0)
-        
-        discount_levels = [0, 5, 10, 15, 20, 25, 30]
-        profits = []
-        margins = []
-        
-        for disc in discount_levels:
-            volume_uplift = 1 + (disc * 0.02)
-            simulated_revenue = base_revenue * volume_uplift * (1 - disc/100)
-            simulated_cogs = base_cogs * volume_uplift
-            profit = simulated_revenue - simulated_cogs
-            margin = (profit / simulated_revenue * 100) if simulated_revenue > 0 else 0
-            profits.append(profit)
-            margins.append(margin)
-        
-        fig_combo = go.Figure()
-        
-        bar_colors = ['#10b981' if m >= margin_floor else '#ef4444' for m in margins]
-        fig_combo.add_trace(go.Bar(
-            x=discount_levels,
-            y=profits,
-            name='Profit',
-            marker_color=bar_colors,
-            text=[format_currency(p) for p in profits],
-            textposition='outside'
-        ))
-        
-        fig_combo.add_hline(y=base_revenue * margin_floor / 100, line_dash="dash", line_color="#f59e0b", annotation_text=f"Margin Floor ({margin_floor}%)", annotation_position="top right")
+        optimization = view_cached(
+            'discount_optimization_cache', view_key and (view_key, margin_floor),
+            lambda: Simulator().optimize_discount(sales_df, stores_df, products_df, promo_budget=25000, margin_floor=margin_floor, discounts=np.arange(0, 31, 1))
+        )
+        frontier = optimization.get('frontier')
+        optimum = optimization.get('optimum')
         
-        fig_combo = style_plotly_chart_themed(fig_combo, height=380)
-        fig_combo.update_layout(title="Profit at Different Discount Levels", xaxis_title="Discount %", yaxis_title="Profit (AED)", showlegend=False)
-        st.plotly_chart(fig_combo, use_container_width=True)
-        st.caption("📌 Green = above margin floor, Red = below margin floor.")
+        if frontier is not None and len(frontier) > 0:
+            fig_combo = go.Figure()
+            
+            bar_colors = ['#10b981' if ok else '#ef4444' for ok in frontier['meets_margin_floor']]
+            fig_combo.add_trace(go.Bar(
+                x=frontier['discount_pct'],
+                y=frontier['expected_net_profit'],
+                name='Profit',
+                marker_color=bar_colors,
+                hovertemplate='Discount %{x:.0f}%<br>Profit AED %{y:,.0f}<extra></extra>'
+            ))
+            
+            if optimum:
+                fig_combo.add_annotation(x=optimum['discount_pct'], y=optimum['expected_net_profit'], text=f"Best: {optimum['discount_pct']:.0f}% ({format_currency(optimum['expected_net_profit'])})", showarrow=True, arrowhead=2, arrowcolor="#f59e0b", font=dict(color="#f59e0b"))
+            
+            fig_combo = style_plotly_chart_themed(fig_combo, height=380)
+            fig_combo.update_layout(title="Profit at Different Discount Levels", xaxis_title="Discount %", yaxis_title="Profit (AED)", showlegend=False)
+            st.plotly_chart(fig_combo, use_container_width=True)
+            st.caption("📌 7-day campaign net profit, AED 25K promo budget. Green = above margin floor, Red = below margin floor.")
+        else:
+            st.info("Discount impact data not available")
     
     st.markdown("---")
     
@@ -1564,7 +1719,7 @@ def show_executive_view(kpis, city_kpis, channel_kpis, category_kpis, sales_df,
         st.markdown(create_insight_card(title, text), unsafe_allow_html=True)
 
 
-def show_manager_view(kpis, city_kpis, channel_kpis, category_kpis, sales_df, products_df, stores_df, inventory_df):
+def show_manager_view(kpis, city_kpis, channel_kpis, category_kpis, sales_df, products_df, stores_df, inventory_df, view_key=None):
     """Display Manager View - Operational Risk & Execution with ALL charts."""
     
     # ===== OPERATIONAL KPIs =====
@@ -1579,14 +1734,17 @@ def show_manager_view(kpis, city_kpis, channel_kpis, category_kpis, sales_df, pr
     else:
         payment_failure_rate = 0
     
+    inventory_plan = view_cached('inventory_plan_cache', view_key,
+                                 lambda: InventoryEngine().build_plan(sales_df, inventory_df)) if inventory_df is not None else None
+    
     stockout_risk = 0
     high_risk_skus = 0
     if inventory_df is not None and 'stock_on_hand' in inventory_df.columns:
         total_inventory = len(inventory_df)
         if 'reorder_point' in inventory_df.columns:
-            inventory_df['_stock'] = pd.to_numeric(inventory_df['stock_on_hand'], errors='coerce').fillna(0)
-            inventory_df['_reorder'] = pd.to_numeric(inventory_df['reorder_point'], errors='coerce').fillna(10)
-            low_stock = (inventory_df['_stock'] <= inventory_df['_reorder']).sum()
+            stock = pd.to_numeric(inventory_df['stock_on_hand'], errors='coerce').fillna(0)
+            reorder = pd.to_numeric(inventory_df['reorder_point'], errors='coerce').fillna(10)
+            low_stock = (stock <= reorder).sum()
         else:
             avg_stock = inventory_df['stock_on_hand'].mean()
             threshold = max(10, avg_stock * 0.1)
@@ -1639,12 +1797,15 @@ def show_manager_view(kpis, city_kpis, channel_kpis, category_kpis, sales_df, pr
         if inventory_df is not None and stores_df is not None and 'store_id' in inventory_df.columns:
             inv_with_store = inventory_df.merge(stores_df[['store_id', 'city', 'channel']], on='store_id', how='left')
             
-            if all(col in inv_with_store.columns for col in ['city', 'channel', 'stock_on_hand']):
+            if len(inv_with_store) == 0:
+                # Row filters (e.g. a fix flag on stores or products) can leave no inventory
+                st.info("No inventory rows match the current filters")
+            elif all(col in inv_with_store.columns for col in ['city', 'channel', 'stock_on_hand']):
                 top_n_risk = st.selectbox("Show Top", [5, 10, "All"], index=0, key="city_channel_risk_top_n")
                 
-                inv_with_store['city_channel'] = inv_with_store['city'] + ' - ' + inv_with_store['channel']
-                city_channel_risk = inv_with_store.groupby('city_channel').apply(lambda x: (x['stock_on_hand'] < 10).sum() / len(x) * 100 if len(x) > 0 else 0, include_groups=False).reset_index()
-                city_channel_risk.columns = ['City-Channel', 'Risk %']
+                city_channel = inv_with_store['city'] + ' - ' + inv_with_store['channel']
+                low_stock = (inv_with_store['stock_on_hand'] < 10).astype(float) * 100
+                city_channel_risk = low_stock.groupby(city_channel).mean().rename_axis('City-Channel').reset_index(name='Risk %')
                 city_channel_risk = city_channel_risk.sort_values('Risk %', ascending=False)
                 
                 if top_n_risk != "All":
@@ -1680,11 +1841,14 @@ def show_manager_view(kpis, city_kpis, channel_kpis, category_kpis, sales_df, pr
         # CHART 3: Bar Chart - Demand vs Stock by Category (FIXED - Dual Y-Axis)
         if sales_df is not None and inventory_df is not None and products_df is not None:
             try:
-                sales_with_cat = sales_df.copy()
-                sku_col = 'sku' if 'sku' in sales_with_cat.columns else 'product_id'
+                sales_with_cat = sales_df[[col for col in ['qty'] if col in sales_df.columns]]
+                sku_col = 'sku' if 'sku' in sales_df.columns else 'product_id'
                 
-                if sku_col in sales_with_cat.columns and sku_col in products_df.columns:
-                    sales_with_cat = sales_with_cat.merge(products_df[[sku_col, 'category']], on=sku_col, how='left')
+                # Category per row gathered by SKU (no merged frames)
+                products_by_sku = None
+                if sku_col in sales_df.columns and sku_col in products_df.columns:
+                    products_by_sku = DimensionLookup(products_df, sku_col)
+                    sales_with_cat = sales_with_cat.assign(**products_by_sku.gather(sales_df[sku_col], {'category': 'category'}))
                 
                 if 'category' in sales_with_cat.columns and 'qty' in sales_with_cat.columns:
                     # Calculate demand
@@ -1693,9 +1857,9 @@ def show_manager_view(kpis, city_kpis, channel_kpis, category_kpis, sales_df, pr
                     demand_by_cat.columns = ['Category', 'Demand']
                     
                     # Calculate stock
-                    inv_with_cat = inventory_df.copy()
-                    if sku_col in inv_with_cat.columns and sku_col in products_df.columns:
-                        inv_with_cat = inv_with_cat.merge(products_df[[sku_col, 'category']], on=sku_col, how='left')
+                    inv_with_cat = inventory_df[[col for col in ['stock_on_hand'] if col in inventory_df.columns]]
+                    if products_by_sku is not None and sku_col in inventory_df.columns:
+                        inv_with_cat = inv_with_cat.assign(**products_by_sku.gather(inventory_df[sku_col], {'category': 'category'}))
                     
                     if 'category' in inv_with_cat.columns and 'stock_on_hand' in inv_with_cat.columns:
                         inv_with_cat['stock_on_hand'] = pd.to_numeric(inv_with_cat['stock_on_hand'], errors='coerce').fillna(0)
@@ -1706,12 +1870,11 @@ def show_manager_view(kpis, city_kpis, channel_kpis, category_kpis, sales_df, pr
                         demand_stock = demand_by_cat.merge(stock_by_cat, on='Category', how='outer').fillna(0)
                         demand_stock = demand_stock.nlargest(8, 'Demand')
                         
-                        # Calculate stock coverage ratio (days of stock)
-                        demand_stock['Coverage'] = np.where(
-                            demand_stock['Demand'] > 0,
-                            demand_stock['Stock'] / demand_stock['Demand'],
-                            0
-                        )
+                        # Days of cover from the inventory engine (stock / daily sales velocity)
+                        cover_by_cat = InventoryEngine().coverage_by(inventory_plan, products_df, sku_col, 'category')
+                        cover_by_cat = cover_by_cat[['category', 'days_of_cover']].rename(columns={'category': 'Category', 'days_of_cover': 'Coverage'})
+                        demand_stock = demand_stock.merge(cover_by_cat, on='Category', how='left')
+                        demand_stock['Coverage'] = demand_stock['Coverage'].fillna(np.inf)
                         
                         # Create figure with secondary y-axis
                         fig_demand_stock = make_subplots(specs=[[{"secondary_y": True}]])
@@ -1790,12 +1953,12 @@ def show_manager_view(kpis, city_kpis, channel_kpis, category_kpis, sales_df, pr
                         
                         st.plotly_chart(fig_demand_stock, use_container_width=True)
                         
-                        # Show coverage ratio as additional insight
-                        low_coverage = demand_stock[demand_stock['Coverage'] < 10]
+                        # Show days of cover as additional insight
+                        low_coverage = demand_stock[demand_stock['Coverage'] < 30]
                         if len(low_coverage) > 0:
                             st.markdown(f"""
                             <div class="warning-card">
-                                ⚠️ <strong>{len(low_coverage)} categories</strong> have less than 10x stock coverage: 
+                                ⚠️ <strong>{len(low_coverage)} categories</strong> have less than 30 days of cover: 
                                 {', '.join(low_coverage['Category'].tolist())}
                             </div>
                             """, unsafe_allow_html=True)
@@ -1812,40 +1975,32 @@ def show_manager_view(kpis, city_kpis, channel_kpis, category_kpis, sales_df, pr
     
     with col2:
         # CHART 4: Horizontal Bar - Top N SKU-Store Stockout Risk
-        if inventory_df is not None and 'stock_on_hand' in inventory_df.columns:
-            sku_col = 'sku' if 'sku' in inventory_df.columns else 'product_id'
+        if inventory_plan is not None and len(inventory_plan) > 0:
+            top_n_sku = st.selectbox("Show Top", [5, 10, 15, 20], index=1, key="sku_stockout_top_n")
             
-            if sku_col in inventory_df.columns:
-                top_n_sku = st.selectbox("Show Top", [5, 10, 15, 20], index=1, key="sku_stockout_top_n")
-                
-                risk_df = inventory_df.nsmallest(int(top_n_sku), 'stock_on_hand').copy()
-                
-                if stores_df is not None and 'store_id' in risk_df.columns and 'store_id' in stores_df.columns:
-                    risk_df = risk_df.merge(stores_df[['store_id', 'city']], on='store_id', how='left')
-                    risk_df['SKU-Location'] = risk_df[sku_col].astype(str) + ' @ ' + risk_df['city'].fillna('Unknown')
-                else:
-                    risk_df['SKU-Location'] = risk_df[sku_col].astype(str)
-                
-                max_stock = risk_df['stock_on_hand'].max() + 1
-                risk_df['risk_score'] = ((max_stock - risk_df['stock_on_hand']) / max_stock * 100).clip(0, 100)
-                risk_df = risk_df.sort_values('risk_score', ascending=True)
-                
-                colors = ['#10b981' if x < 50 else '#f59e0b' if x < 80 else '#ef4444' for x in risk_df['risk_score']]
-                
-                fig_sku_risk = go.Figure(go.Bar(
-                    x=risk_df['risk_score'],
-                    y=risk_df['SKU-Location'],
-                    orientation='h',
-                    marker_color=colors,
-                    text=[f"{x:.0f}% risk" for x in risk_df['risk_score']],
-                    textposition='outside'
-                ))
-                fig_sku_risk = style_plotly_chart_themed(fig_sku_risk, height=350)
-                fig_sku_risk.update_layout(title=f"Top {top_n_sku} Stockout Risk SKU-Store", xaxis_title="Risk Score %", yaxis_title="")
-                st.plotly_chart(fig_sku_risk, use_container_width=True)
-                st.caption("📌 Action list for ops team.")
+            risk_df = inventory_plan.head(int(top_n_sku)).copy()
+            
+            if stores_df is not None and 'store_id' in stores_df.columns and 'city' in stores_df.columns:
+                risk_df = risk_df.merge(stores_df[['store_id', 'city']], on='store_id', how='left')
+                risk_df['SKU-Location'] = risk_df['sku'].astype(str) + ' @ ' + risk_df['store_id'].astype(str) + ' (' + risk_df['city'].fillna('Unknown') + ')'
             else:
-                st.info("SKU data not available")
+                risk_df['SKU-Location'] = risk_df['sku'].astype(str) + ' @ ' + risk_df['store_id'].astype(str)
+            
+            risk_df = risk_df.iloc[::-1]
+            colors = ['#ef4444' if x < lead else '#f59e0b' if x < lead + 14 else '#10b981' for x, lead in zip(risk_df['days_of_cover'], risk_df['lead_time_days'])]
+            
+            fig_sku_risk = go.Figure(go.Bar(
+                x=risk_df['days_of_cover'],
+                y=risk_df['SKU-Location'],
+                orientation='h',
+                marker_color=colors,
+                text=[f"{x:.1f}d cover / {lead:.0f}d lead" for x, lead in zip(risk_df['days_of_cover'], risk_df['lead_time_days'])],
+                textposition='outside'
+            ))
+            fig_sku_risk = style_plotly_chart_themed(fig_sku_risk, height=350)
+            fig_sku_risk.update_layout(title=f"Top {top_n_sku} Stockout Risk SKU-Store", xaxis_title="Days of Cover", yaxis_title="")
+            st.plotly_chart(fig_sku_risk, use_container_width=True)
+            st.caption("📌 Red = stocks out before replenishment lead time. Action list for ops team.")
         else:
             st.info("Inventory data not available")
     
@@ -1854,14 +2009,13 @@ def show_manager_view(kpis, city_kpis, channel_kpis, category_kpis, sales_df, pr
     # ===== CHART 5: PARETO - Issues Log =====
     st.markdown('<p class="section-title section-title-pink">📋 Data Quality Analysis</p>', unsafe_allow_html=True)
     
-    if st.session_state.is_cleaned and hasattr(st.session_state, 'issues_df') and st.session_state.issues_df is not None:
-        issues_df = st.session_state.issues_df
-        if len(issues_df) > 0 and 'issue_type' in issues_df.columns:
-            pareto_df = issues_df.copy()
-            pareto_df['Count'] = pareto_df['record_identifier'].str.extract(r'(\d+)').astype(float).fillna(1)
-            
-            issue_counts = pareto_df.groupby('issue_type')['Count'].sum().reset_index()
-            issue_counts.columns = ['Issue Type', 'Count']
+    if st.session_state.is_cleaned and st.session_state.get('issue_lineage') is not None:
+        lineage = st.session_state.issue_lineage
+        if len(lineage) > 0:
+            # Affected rows per issue type, straight from the lineage codes
+            counts = np.bincount(lineage['issue'].to_numpy(), minlength=len(DataCleaner.ISSUE_CODES))
+            present = np.flatnonzero(counts)
+            issue_counts = pd.DataFrame({'Issue Type': np.asarray(DataCleaner.ISSUE_CODES, dtype=object)[present], 'Count': counts[present]})
             issue_counts = issue_counts.sort_values('Count', ascending=False)
             
             top_n_pareto = st.selectbox("Show Top Issue Types", [5, 10, "All"], index=1, key="pareto_top_n")
@@ -1893,22 +2047,39 @@ def show_manager_view(kpis, city_kpis, channel_kpis, category_kpis, sales_df, pr
     # ===== TOP RISK TABLE =====
     st.markdown('<p class="section-title section-title-orange">🚨 Top Stockout Risk Items - Action List</p>', unsafe_allow_html=True)
     
-    if inventory_df is not None and 'stock_on_hand' in inventory_df.columns:
-        sku_col = 'sku' if 'sku' in inventory_df.columns else 'product_id'
+    if inventory_plan is not None and len(inventory_plan) > 0:
+        plan_summary = InventoryEngine().summarize(inventory_plan)
         
-        if sku_col in inventory_df.columns:
-            risk_table = inventory_df.nsmallest(10, 'stock_on_hand').copy()
-            
-            if stores_df is not None and 'store_id' in risk_table.columns and 'store_id' in stores_df.columns:
-                risk_table = risk_table.merge(stores_df[['store_id', 'city', 'channel']], on='store_id', how='left')
-            
-            risk_table['Risk Level'] = risk_table['stock_on_hand'].apply(lambda x: '🔴 Critical' if x < 5 else ('🟠 High' if x < 10 else '🟡 Medium'))
-            
-            display_cols = [col for col in [sku_col, 'store_id', 'city', 'channel', 'stock_on_hand', 'Risk Level'] if col in risk_table.columns]
-            st.dataframe(risk_table[display_cols], use_container_width=True, hide_index=True)
-            st.caption("📌 Operations action list: SKU-Store pairs with lowest stock.")
-        else:
-            st.info("SKU data not available")
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.markdown(create_metric_card("SKU-Store Pairs", f"{plan_summary['pairs']:,}", color="cyan"), unsafe_allow_html=True)
+        with col2:
+            st.markdown(create_metric_card("Need Reorder", f"{plan_summary['needs_reorder']:,}", color="orange"), unsafe_allow_html=True)
+        with col3:
+            st.markdown(create_metric_card("Stockout Before Restock", f"{plan_summary['stockout_before_replenishment']:,}", color="pink"), unsafe_allow_html=True)
+        with col4:
+            st.markdown(create_metric_card("Units To Reorder", f"{plan_summary['total_reorder_units']:,}", color="purple"), unsafe_allow_html=True)
+        
+        st.markdown("<br>", unsafe_allow_html=True)
+        
+        top_n_plan = st.selectbox("Show Top", [10, 25, 50, 100, "All"], index=0, key="inventory_plan_top_n")
+        risk_table = inventory_plan if top_n_plan == "All" else inventory_plan.head(int(top_n_plan))
+        risk_table = risk_table.copy()
+        
+        if stores_df is not None and 'store_id' in stores_df.columns:
+            risk_table = risk_table.merge(stores_df[['store_id', 'city', 'channel']], on='store_id', how='left')
+        
+        level_icons = {'Critical': '🔴 Critical', 'High': '🟠 High', 'Medium': '🟡 Medium', 'OK': '🟢 OK'}
+        risk_table['Risk Level'] = risk_table['risk_level'].astype(str).map(level_icons)
+        risk_table['days_of_cover'] = risk_table['days_of_cover'].round(1)
+        risk_table['daily_velocity'] = risk_table['daily_velocity'].round(2)
+        
+        display_cols = [col for col in ['risk_rank', 'sku', 'store_id', 'city', 'channel', 'stock_on_hand', 'daily_velocity',
+                                        'days_of_cover', 'lead_time_days', 'projected_stockout_date', 'reorder_qty', 'Risk Level'] if col in risk_table.columns]
+        st.dataframe(risk_table[display_cols], use_container_width=True, hide_index=True)
+        
+        st.download_button("📥 Download Full Reorder Plan", data=inventory_plan.to_csv(index=False), file_name="reorder_plan.csv", mime="text/csv", key="download_reorder_plan")
+        st.caption(f"📌 All {len(inventory_plan):,} SKU-Store pairs ranked by stockout risk (days of cover vs lead time), velocity over {inventory_plan.attrs.get('window_days', 0)} days of sales.")
     else:
         st.info("Inventory data not available for risk analysis")
     
@@ -1963,60 +2134,48 @@ def show_data_page():
     with col1:
         products_file = st.file_uploader("📦 Products CSV", type=['csv'], key='products_upload')
         if products_file:
-            try:
-                products_df = pd.read_csv(products_file)
-                products_file.seek(0)
-                validation = FileValidator.validate_file(products_df, 'products')
-                if validation['valid']:
-                    st.success(f"✅ Valid ({len(products_df):,} rows)")
-                    valid_files['products'] = products_df
-                else:
-                    st.error(f"❌ {validation['message']}")
-            except Exception as e:
+            validation = FileValidator.validate_header(products_file, 'products')
+            if validation['valid']:
+                st.success(f"✅ Valid ({products_file.size / (1024 * 1024):,.1f} MB)")
+                valid_files['products'] = products_file
+            elif validation['sample'] is None:
                 st.error(f"❌ Cannot read file")
+            else:
+                st.error(f"❌ {validation['message']}")
         
         sales_file = st.file_uploader("🛒 Sales CSV", type=['csv'], key='sales_upload')
         if sales_file:
-            try:
-                sales_df = pd.read_csv(sales_file)
-                sales_file.seek(0)
-                validation = FileValidator.validate_file(sales_df, 'sales')
-                if validation['valid']:
-                    st.success(f"✅ Valid ({len(sales_df):,} rows)")
-                    valid_files['sales'] = sales_df
-                else:
-                    st.error(f"❌ {validation['message']}")
-            except Exception as e:
+            validation = FileValidator.validate_header(sales_file, 'sales')
+            if validation['valid']:
+                st.success(f"✅ Valid ({sales_file.size / (1024 * 1024):,.1f} MB)")
+                valid_files['sales'] = sales_file
+            elif validation['sample'] is None:
                 st.error(f"❌ Cannot read file")
+            else:
+                st.error(f"❌ {validation['message']}")
     
     with col2:
         stores_file = st.file_uploader("🏪 Stores CSV", type=['csv'], key='stores_upload')
         if stores_file:
-            try:
-                stores_df = pd.read_csv(stores_file)
-                stores_file.seek(0)
-                validation = FileValidator.validate_file(stores_df, 'stores')
-                if validation['valid']:
-                    st.success(f"✅ Valid ({len(stores_df):,} rows)")
-                    valid_files['stores'] = stores_df
-                else:
-                    st.error(f"❌ {validation['message']}")
-            except Exception as e:
+            validation = FileValidator.validate_header(stores_file, 'stores')
+            if validation['valid']:
+                st.success(f"✅ Valid ({stores_file.size / (1024 * 1024):,.1f} MB)")
+                valid_files['stores'] = stores_file
+            elif validation['sample'] is None:
                 st.error(f"❌ Cannot read file")
+            else:
+                st.error(f"❌ {validation['message']}")
         
         inventory_file = st.file_uploader("📋 Inventory CSV", type=['csv'], key='inventory_upload')
         if inventory_file:
-            try:
-                inventory_df = pd.read_csv(inventory_file)
-                inventory_file.seek(0)
-                validation = FileValidator.validate_file(inventory_df, 'inventory')
-                if validation['valid']:
-                    st.success(f"✅ Valid ({len(inventory_df):,} rows)")
-                    valid_files['inventory'] = inventory_df
-                else:
-                    st.error(f"❌ {validation['message']}")
-            except Exception as e:
+            validation = FileValidator.validate_header(inventory_file, 'inventory')
+            if validation['valid']:
+                st.success(f"✅ Valid ({inventory_file.size / (1024 * 1024):,.1f} MB)")
+                valid_files['inventory'] = inventory_file
+            elif validation['sample'] is None:
                 st.error(f"❌ Cannot read file")
+            else:
+                st.error(f"❌ {validation['message']}")
     
     st.markdown("---")
     
@@ -2030,12 +2189,72 @@ def show_data_page():
             st.info("📤 Upload all 4 files")
         
         if st.button("📥 Load All Files", use_container_width=True, disabled=len(valid_files) != 4):
-            for key, df in valid_files.items():
-                setattr(st.session_state, f'raw_{key}', df)
-            st.session_state.data_loaded = True
-            st.session_state.is_cleaned = False
-            st.success("✅ Loaded!")
-            st.rerun()
+            # Files were only header-checked so far; parse them in full now
+            with st.spinner("🔄 Reading files..."):
+                try:
+                    frames, st.session_state.load_timings = read_csv_files(valid_files)
+                    # Intern sku/store_id/order_id to codes shared by all four tables
+                    frames, _ = intern_keys(frames)
+                    for key, df in frames.items():
+                        setattr(st.session_state, f'raw_{key}', df)
+                    st.session_state.data_loaded = True
+                    st.session_state.data_version += 1
+                    st.session_state.is_cleaned = False
+                    st.success("✅ Loaded!")
+                    st.rerun()
+                except Exception as e:
+                    st.error(f"❌ Error: {str(e)}")
+    
+    st.markdown("---")
+    st.markdown('<p class="section-title section-title-green">📗 Or Upload an Excel Workbook</p>', unsafe_allow_html=True)
+    
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col2:
+        workbook_file = st.file_uploader("📗 Workbook (.xlsx, one sheet per table)", type=['xlsx'], key='workbook_upload')
+        sheet_tables = {}
+        if workbook_file:
+            # Header detection reopens the workbook, so do it once per upload
+            cached = st.session_state.get('workbook_sheets')
+            if cached and cached[0] == workbook_file.file_id:
+                sheet_tables = cached[1]
+            else:
+                try:
+                    sheet_tables = detect_sheets(workbook_file)
+                    st.session_state.workbook_sheets = (workbook_file.file_id, sheet_tables)
+                except Exception:
+                    st.error(f"❌ Cannot read workbook")
+            found = {table for table in sheet_tables.values() if table}
+            if sheet_tables:
+                st.caption(" · ".join(f"{sheet} → {table or 'skipped'}" for sheet, table in sheet_tables.items()))
+                missing = [table for table in SAMPLE_DATA_FILES if table not in found]
+                if missing:
+                    st.warning(f"⚠️ No sheet found for: {', '.join(missing)}")
+                else:
+                    st.success("✅ All 4 tables found!")
+        
+        workbook_ready = bool(sheet_tables) and set(SAMPLE_DATA_FILES) <= set(sheet_tables.values())
+        if st.button("📥 Load Workbook", use_container_width=True, disabled=not workbook_ready):
+            with st.spinner("🔄 Streaming sheets..."):
+                try:
+                    frames, report = read_excel_workbook(workbook_file)
+                    timings = {}
+                    for sheet, result in report.items():
+                        if result['table']:
+                            timings[result['table']] = timings.get(result['table'], 0.0) + result['seconds']
+                    timings['total'] = report['total']['seconds']
+                    timings['rows_per_sec'] = report['total']['rows_per_sec']
+                    st.session_state.load_timings = timings
+                    # Intern sku/store_id/order_id to codes shared by all four tables
+                    frames, _ = intern_keys(frames)
+                    for key, df in frames.items():
+                        setattr(st.session_state, f'raw_{key}', df)
+                    st.session_state.data_loaded = True
+                    st.session_state.data_version += 1
+                    st.session_state.is_cleaned = False
+                    st.success("✅ Workbook loaded!")
+                    st.rerun()
+                except Exception as e:
+                    st.error(f"❌ Error: {str(e)}")
     
     st.markdown("---")
     st.markdown('<p class="section-title section-title-purple">📦 Or Use Sample Data</p>', unsafe_allow_html=True)
@@ -2044,11 +2263,13 @@ def show_data_page():
     with col2:
         if st.button("📥 Load Sample Data", use_container_width=True):
             try:
-                st.session_state.raw_products = pd.read_csv('data/products.csv')
-                st.session_state.raw_stores = pd.read_csv('data/stores.csv')
-                st.session_state.raw_sales = pd.read_csv('data/sales_raw.csv')
-                st.session_state.raw_inventory = pd.read_csv('data/inventory_snapshot.csv')
+                frames, st.session_state.load_timings = read_csv_files(SAMPLE_DATA_FILES)
+                # Intern sku/store_id/order_id to codes shared by all four tables
+                frames, _ = intern_keys(frames)
+                for key, df in frames.items():
+                    setattr(st.session_state, f'raw_{key}', df)
                 st.session_state.data_loaded = True
+                st.session_state.data_version += 1
                 st.session_state.is_cleaned = False
                 st.success("✅ Sample data loaded!")
                 st.rerun()
@@ -2059,22 +2280,42 @@ def show_data_page():
         st.markdown("---")
         st.markdown('<p class="section-title section-title-teal">👀 Data Preview</p>', unsafe_allow_html=True)
         
+        timings = st.session_state.get('load_timings')
+        if timings:
+            per_file = " · ".join(f"{name} {seconds:.2f}s" for name, seconds in timings.items() if name not in ('total', 'rows_per_sec'))
+            throughput = f", {timings['rows_per_sec']:,.0f} rows/s" if 'rows_per_sec' in timings else ""
+            st.caption(f"⏱️ Parsed in {timings['total']:.2f}s ({per_file}){throughput}")
+        
         tab1, tab2, tab3, tab4 = st.tabs(["📦 Products", "🏪 Stores", "🛒 Sales", "📋 Inventory"])
         
+        table_stats = dataset_metadata()['tables']
+        
         for tab, name, key in [(tab1, "Products", "raw_products"), (tab2, "Stores", "raw_stores"), (tab3, "Sales", "raw_sales"), (tab4, "Inventory", "raw_inventory")]:
             with tab:
                 df = getattr(st.session_state, key)
                 if df is not None:
+                    stats = table_stats.get(key.replace('raw_', ''), {})
                     col1, col2, col3 = st.columns(3)
                     with col1:
-                        st.markdown(create_metric_card("Rows", f"{len(df):,}", color="cyan"), unsafe_allow_html=True)
+                        st.markdown(create_metric_card("Rows", f"{stats.get('rows', len(df)):,}", color="cyan"), unsafe_allow_html=True)
                     with col2:
-                        st.markdown(create_metric_card("Columns", f"{len(df.columns)}", color="blue"), unsafe_allow_html=True)
+                        st.markdown(create_metric_card("Columns", f"{stats.get('columns', len(df.columns))}", color="blue"), unsafe_allow_html=True)
                     with col3:
-                        null_pct = (df.isnull().sum().sum() / (len(df) * len(df.columns)) * 100) if len(df) > 0 else 0
-                        st.markdown(create_metric_card("Null %", f"{null_pct:.1f}%", color="orange"), unsafe_allow_html=True)
+                        st.markdown(create_metric_card("Null %", f"{stats.get('null_pct', 0):.1f}%", color="orange"), unsafe_allow_html=True)
                     st.markdown("<br>", unsafe_allow_html=True)
                     st.dataframe(df.head(100), use_container_width=True)
+
+                    if st.checkbox("🔬 Column profile", key=f"profile_{key}", help="Nulls, distinct counts, stats, top values and histograms for every column"):
+                        profile = DataProfiler().profile(df)
+                        st.dataframe(profile['columns'], use_container_width=True, hide_index=True)
+                        if profile['histograms']:
+                            hist_col = st.selectbox("Histogram column", list(profile['histograms'].keys()), key=f"profile_hist_{key}")
+                            hist = profile['histograms'][hist_col]
+                            edges = pd.Series(hist['edges'])
+                            fig = go.Figure(go.Bar(x=edges[:-1], y=hist['counts'], marker_color='#06b6d4'))
+                            fig = style_plotly_chart_themed(fig, height=320)
+                            fig.update_layout(title=f"Distribution of {hist_col}", bargap=0.05, xaxis_title=hist_col, yaxis_title="Rows")
+                            st.plotly_chart(fig, use_container_width=True)
                 else:
                     st.info(f"No {name.lower()} data loaded")
     
@@ -2106,36 +2347,107 @@ def show_cleaner_page():
     
     st.markdown("---")
     
+    with st.expander("⚙️ Cleaning Rules", expanded=False):
+        st.caption("Switch rules off or tune outlier caps. After a first clean, apply your changes to re-run only the tables they affect.")
+        disabled_rules, rule_overrides = [], {}
+        for table in DataCleaner.TABLE_CODES:
+            table_rules = [(rid, rule) for rid, rule_table, rule in rule_catalog() if rule_table == table]
+            st.markdown(f"**{table.title()}**")
+            rule_cols = st.columns(3)
+            for k, (rid, rule) in enumerate(table_rules):
+                with rule_cols[k % 3]:
+                    name = (rule.get('issue') or rule.get('flag')).replace('_', ' ').capitalize()
+                    target = rule.get('column') or ', '.join(rule.get('columns', []))
+                    if not st.checkbox(name, value=True, key=f"rule_{rid}", help=f"{rule['type']} rule on {target}"):
+                        disabled_rules.append(rid)
+                    elif rule['type'] == 'cap':
+                        threshold = st.number_input("Cap above × p95", min_value=1.0, value=float(rule['threshold']), step=0.5, key=f"rule_{rid}_threshold")
+                        if threshold != rule['threshold']:
+                            rule_overrides[rid] = {'threshold': threshold}
+        rule_settings = {'disabled_rules': disabled_rules, 'rule_overrides': rule_overrides}
+    
+    def submit_cleaning():
+        runner = JobRunner()
+        # A clean still in flight is superseded: stop it so it frees its pool worker
+        if st.session_state.cleaning_job_id:
+            runner.cancel(st.session_state.cleaning_job_id)
+        st.session_state.rule_settings_requested = rule_settings
+        st.session_state.cleaning_job_version = st.session_state.data_version
+        st.session_state.cleaning_job_id = runner.submit(
+            # The session's own frames (read, never modified): their content
+            # digests are memoized per object, so re-cleans skip rehashing
+            run_cleaning_job,
+            st.session_state.raw_products,
+            st.session_state.raw_stores,
+            st.session_state.raw_sales,
+            st.session_state.raw_inventory,
+            label='Data cleaning',
+            **rule_settings
+        )
+        st.rerun()
+    
     col1, col2, col3 = st.columns([1, 2, 1])
     with col2:
-        if st.button("🚀 Run Data Cleaning", use_container_width=True, type="primary"):
-            with st.spinner("🔄 Cleaning..."):
-                try:
-                    cleaner = DataCleaner()
-                    clean_products, clean_stores, clean_sales, clean_inventory = cleaner.clean_all(
-                        st.session_state.raw_products.copy(),
-                        st.session_state.raw_stores.copy(),
-                        st.session_state.raw_sales.copy(),
-                        st.session_state.raw_inventory.copy()
-                    )
-                    st.session_state.clean_products = clean_products
-                    st.session_state.clean_stores = clean_stores
-                    st.session_state.clean_sales = clean_sales
-                    st.session_state.clean_inventory = clean_inventory
-                    st.session_state.issues_df = cleaner.get_issues_df()
-                    st.session_state.cleaner_stats = cleaner.stats
-                    st.session_state.cleaning_report = cleaner.cleaning_report
-                    st.session_state.is_cleaned = True
-                    st.success("✅ Done!")
-                    st.rerun()
-                except Exception as e:
-                    st.error(f"❌ Error: {str(e)}")
+        status = collect_cleaning_job() or cleaning_job_status
+        running = status is not None and status['finished_at'] is None
+        
+        if running:
+            show_cleaning_progress()
+        
+        if status is not None and status['status'] == 'done':
+            st.success(f"✅ Done in {status['elapsed_seconds']:.1f}s!")
+        elif status is not None and status['status'] == 'cancelled':
+            st.info("⏹️ Cleaning cancelled. No changes were applied.")
+        elif status is not None and status['status'] == 'stale':
+            st.info("🔄 Data changed while cleaning ran, so its result was discarded. Run cleaning again.")
+        elif status is not None and status['status'] == 'failed':
+            st.error(f"❌ Error: {status['error']}")
+        
+        if st.button("🔍 Preview Fixes (Dry Run)", use_container_width=True, help="Detect what cleaning would fix or drop, without changing any data"):
+            start = time.perf_counter()
+            result = DataCleaner().dry_run(
+                st.session_state.raw_products, st.session_state.raw_stores,
+                st.session_state.raw_sales, st.session_state.raw_inventory,
+                **rule_settings
+            )
+            result['seconds'] = time.perf_counter() - start
+            st.session_state.dry_run = {'data_version': st.session_state.data_version, 'result': result}
+        
+        if st.button("🚀 Run Data Cleaning", use_container_width=True, type="primary", disabled=running):
+            submit_cleaning()
+        
+        # Rule edits after a clean are batched until applied (unchanged stages are cached)
+        if st.session_state.is_cleaned and rule_settings != st.session_state.rule_settings_requested:
+            if st.button("♻️ Apply Rule Changes", use_container_width=True, disabled=running, help="Re-clean with the edited rules; only the tables they affect re-run"):
+                submit_cleaning()
+    
+    dry_run = st.session_state.get('dry_run')
+    if dry_run is not None and dry_run['data_version'] == st.session_state.data_version:
+        result = dry_run['result']
+        st.markdown("---")
+        st.markdown('<p class="section-title section-title-purple">🔍 Dry Run — Projected Changes</p>', unsafe_allow_html=True)
+        st.caption(f"⏱️ Detected in {result['seconds']:.2f}s · no data was modified")
+        
+        cols = st.columns(4)
+        for col, (table, projected) in zip(cols, result['projected_rows'].items()):
+            with col:
+                st.markdown(create_metric_card(f"{table.title()} Dropped", f"{projected['dropped_rows']:,}", color="orange"), unsafe_allow_html=True)
+                st.caption(f"{projected['final_rows']:,} of {projected['original_rows']:,} rows kept")
+        
+        if len(result['issues']) > 0:
+            st.markdown("<br>", unsafe_allow_html=True)
+            st.dataframe(result['issues'], use_container_width=True, hide_index=True)
+        else:
+            st.markdown(create_success_card("No issues detected!"), unsafe_allow_html=True)
     
     if st.session_state.is_cleaned:
         st.markdown("---")
         st.markdown('<p class="section-title section-title-blue">📊 Results</p>', unsafe_allow_html=True)
         
         stats = st.session_state.cleaner_stats
+        applied = st.session_state.get('applied_rule_settings') or {}
+        if applied.get('disabled_rules') or applied.get('rule_overrides'):
+            st.caption(f"⚙️ {len(applied.get('disabled_rules', []))} rule(s) off, {len(applied.get('rule_overrides', {}))} tuned")
         
         col1, col2, col3, col4 = st.columns(4)
         with col1:
@@ -2152,17 +2464,20 @@ def show_cleaner_page():
             st.markdown("---")
             st.markdown('<p class="section-title section-title-orange">🔍 Issues Log</p>', unsafe_allow_html=True)
             
+            lineage = st.session_state.get('issue_lineage')
+            lineage_counts = DataCleaner.issue_counts(lineage)
+            
             col1, col2 = st.columns(2)
             with col1:
-                issue_counts = issues_df.groupby('issue_type').size().reset_index(name='count')
-                fig = px.bar(issue_counts, x='count', y='issue_type', orientation='h', title='Issues by Type', color='count', color_continuous_scale=['#06b6d4', '#8b5cf6'])
+                issue_counts = lineage_counts.groupby('issue_type', as_index=False)['count'].sum().sort_values('count')
+                fig = px.bar(issue_counts, x='count', y='issue_type', orientation='h', title='Affected Rows by Issue Type', color='count', color_continuous_scale=['#06b6d4', '#8b5cf6'])
                 fig = style_plotly_chart_themed(fig)
                 fig.update_layout(coloraxis_showscale=False)
                 st.plotly_chart(fig, use_container_width=True)
             
             with col2:
-                table_counts = issues_df.groupby('table').size().reset_index(name='count')
-                fig = px.pie(table_counts, values='count', names='table', title='Issues by Table', color_discrete_sequence=['#06b6d4', '#3b82f6', '#8b5cf6', '#ec4899'], hole=0.45)
+                table_counts = lineage_counts.groupby('table', as_index=False)['count'].sum()
+                fig = px.pie(table_counts, values='count', names='table', title='Affected Rows by Table', color_discrete_sequence=['#06b6d4', '#3b82f6', '#8b5cf6', '#ec4899'], hole=0.45)
                 fig = style_plotly_chart_themed(fig)
                 st.plotly_chart(fig, use_container_width=True)
             
@@ -2170,6 +2485,18 @@ def show_cleaner_page():
             
             csv = issues_df.to_csv(index=False)
             st.download_button("📥 Download Issues Log", data=csv, file_name="issues_log.csv", mime="text/csv")
+            
+            if len(lineage_counts) > 0:
+                st.markdown("<br>", unsafe_allow_html=True)
+                st.markdown('<p class="section-title section-title-pink">🔎 Drill Down to Affected Rows</p>', unsafe_allow_html=True)
+                options = list(lineage_counts.itertuples(index=False))
+                choice = st.selectbox("Issue", range(len(options)), format_func=lambda k: f"{options[k].table} · {options[k].issue_type} ({options[k].count:,} rows, {options[k].action.lower()})", key="issue_drilldown")
+                picked = options[choice]
+                rows = DataCleaner.issue_rows(lineage, picked.table, picked.issue_type)
+                raw_df = st.session_state.get(f"raw_{picked.table}")
+                if raw_df is not None:
+                    st.caption(f"Showing {min(len(rows), 500):,} of {len(rows):,} raw rows (index = row position in the uploaded file)")
+                    st.dataframe(raw_df.iloc[rows[:500]], use_container_width=True)
         else:
             st.markdown(create_success_card("No major issues found!"), unsafe_allow_html=True)
     
@@ -2191,6 +2518,7 @@ def show_simulator_page():
     sales_df = st.session_state.clean_sales if st.session_state.is_cleaned else st.session_state.raw_sales
     stores_df = st.session_state.clean_stores if st.session_state.is_cleaned else st.session_state.raw_stores
     products_df = st.session_state.clean_products if st.session_state.is_cleaned else st.session_state.raw_products
+    inventory_df = st.session_state.clean_inventory if st.session_state.is_cleaned else st.session_state.raw_inventory
     
     st.markdown("---")
     st.markdown('<p class="section-title section-title-cyan">⚙️ Campaign Parameters</p>', unsafe_allow_html=True)
@@ -2201,11 +2529,16 @@ def show_simulator_page():
         st.markdown('<p style="color: var(--accent-cyan); font-weight: 700;">💰 Pricing</p>', unsafe_allow_html=True)
         discount_pct = st.slider("Discount %", 0, 50, 15)
         promo_budget = st.number_input("Promo Budget (AED)", 1000, 500000, 25000, step=5000)
+        use_fitted_elasticity = st.checkbox("📈 Fitted elasticity", value=False, help="Estimate discount elasticity from the sales history instead of the category defaults")
     
     with col2:
         st.markdown('<p style="color: var(--accent-purple); font-weight: 700;">📊 Constraints</p>', unsafe_allow_html=True)
         margin_floor = st.slider("Margin Floor %", 0, 50, 15)
         campaign_days = st.slider("Campaign Days", 1, 30, 7)
+        seasonality = st.checkbox("📅 Weekday seasonality", value=False, help="Build the baseline from the weekday mix of the campaign window instead of the flat daily average")
+        constrain_inventory = st.checkbox("📦 Constrain by inventory", value=False, disabled=inventory_df is None, help="Cap expected sales at stock on hand for the targeted SKU-store pairs")
+        run_monte_carlo = st.checkbox("🎲 Uncertainty analysis", value=False, help="Monte Carlo over elasticity, baseline demand and cost")
+        n_draws = st.select_slider("Draws", options=[1000, 5000, 10000, 50000], value=10000, disabled=not run_monte_carlo)
     
     with col3:
         st.markdown('<p style="color: var(--accent-pink); font-weight: 700;">🎯 Targeting</p>', unsafe_allow_html=True)
@@ -2218,18 +2551,30 @@ def show_simulator_page():
         channel = st.selectbox("Target Channel", channels)
         category = st.selectbox("Target Category", categories)
     
+    if use_fitted_elasticity:
+        with st.expander("📈 Fitted Elasticities", expanded=False):
+            fitted = ElasticityEstimator().fit(sales_df, products_df, stores_df, by_city_channel=city != 'All' and channel != 'All')
+            if len(fitted) > 0:
+                st.dataframe(fitted.round(3), use_container_width=True, hide_index=True)
+                st.caption("📌 Log-log fit of quantity on discount, shrunk towards the category defaults; segments with little discount variation keep their default.")
+            else:
+                st.info("Not enough discount and quantity data to fit elasticities; category defaults will be used.")
+    
     st.markdown("---")
     
     col1, col2, col3 = st.columns([1, 2, 1])
     with col2:
         run_simulation = st.button("🚀 Run Simulation", use_container_width=True, type="primary")
+        live_update = st.checkbox("⚡ Live update", value=False, help="Recompute results whenever a parameter changes (uncertainty analysis still runs on button press)")
     
-    if run_simulation:
+    if run_simulation or live_update:
         with st.spinner("🔄 Running..."):
             try:
-                sim = Simulator()
-                results = sim.simulate_campaign(sales_df, stores_df, products_df, discount_pct=discount_pct, promo_budget=promo_budget, margin_floor=margin_floor, city=city, channel=channel, category=category, campaign_days=campaign_days)
+                sim = Simulator(use_fitted_elasticity=use_fitted_elasticity)
+                results = sim.simulate_campaign(sales_df, stores_df, products_df, discount_pct=discount_pct, promo_budget=promo_budget, margin_floor=margin_floor, city=city, channel=channel, category=category, campaign_days=campaign_days, inventory_df=inventory_df if constrain_inventory else None, seasonality=seasonality)
                 st.session_state.sim_results = results
+                # Monte Carlo results are only valid for the parameters of the last button press
+                st.session_state.sim_mc_results = sim.simulate_campaign_monte_carlo(sales_df, stores_df, products_df, discount_pct=discount_pct, promo_budget=promo_budget, margin_floor=margin_floor, city=city, channel=channel, category=category, campaign_days=campaign_days, n_draws=n_draws) if run_simulation and run_monte_carlo else None
             except Exception as e:
                 st.error(f"❌ Error: {str(e)}")
     
@@ -2280,6 +2625,68 @@ def show_simulator_page():
                 fig = style_plotly_chart_themed(fig)
                 fig.update_layout(showlegend=False)
                 st.plotly_chart(fig, use_container_width=True)
+            
+            if comparison.get('baseline_window_days'):
+                basis = "weekday averages" if comparison.get('seasonality') else "the daily average"
+                st.caption(f"📌 Baseline from {comparison['baseline_window_days']} days of segment sales, using {basis}.")
+            
+            inventory = results.get('inventory')
+            if inventory:
+                st.markdown("---")
+                st.markdown('<p class="section-title section-title-orange">📦 Inventory Feasibility</p>', unsafe_allow_html=True)
+                
+                col1, col2, col3, col4 = st.columns(4)
+                with col1:
+                    st.markdown(create_metric_card("Fill Rate", f"{inventory['fill_rate_pct']:.1f}%", color="green" if inventory['fill_rate_pct'] >= 95 else "orange"), unsafe_allow_html=True)
+                with col2:
+                    st.markdown(create_metric_card("Lost Units", f"{inventory['lost_units']:,.0f}", color="pink"), unsafe_allow_html=True)
+                with col3:
+                    st.markdown(create_metric_card("Revenue at Risk", format_currency(inventory['revenue_at_risk']), color="orange"), unsafe_allow_html=True)
+                with col4:
+                    st.markdown(create_metric_card("Stockout Pairs", f"{inventory['stockout_pairs']:,}", color="purple"), unsafe_allow_html=True)
+                
+                stockouts = inventory.get('stockouts')
+                if stockouts is not None and len(stockouts) > 0:
+                    st.dataframe(stockouts.round(1), use_container_width=True, hide_index=True)
+                    st.caption("📌 SKU-store pairs that would stock out during the campaign, largest shortfall first.")
+                else:
+                    st.markdown(create_success_card("Stock on hand covers the lifted demand for every targeted SKU-store pair."), unsafe_allow_html=True)
+                if inventory.get('untracked_pairs', 0) > 0:
+                    st.caption(f"ℹ️ {inventory['untracked_pairs']:,} targeted SKU-store pairs have no inventory record and are treated as unconstrained.")
+            
+            mc_results = st.session_state.get('sim_mc_results')
+            if mc_results and mc_results.get('percentiles'):
+                st.markdown("---")
+                st.markdown('<p class="section-title section-title-purple">🎲 Uncertainty Range</p>', unsafe_allow_html=True)
+                
+                pct = mc_results['percentiles']
+                col1, col2, col3, col4 = st.columns(4)
+                with col1:
+                    st.markdown(create_metric_card("Net Profit P50", format_currency(pct['net_profit']['p50']), color="green"), unsafe_allow_html=True)
+                with col2:
+                    st.markdown(create_metric_card("Net Profit P10-P90 (AED)", f"{pct['net_profit']['p10'] / 1000:,.0f}K-{pct['net_profit']['p90'] / 1000:,.0f}K", color="teal"), unsafe_allow_html=True)
+                with col3:
+                    st.markdown(create_metric_card("Margin P50", f"{pct['margin_pct']['p50']:.1f}%", color="purple"), unsafe_allow_html=True)
+                with col4:
+                    st.markdown(create_metric_card("P(Margin < Floor)", f"{mc_results['prob_below_margin_floor'] * 100:.1f}%", color="pink" if mc_results['prob_below_margin_floor'] > 0.1 else "green"), unsafe_allow_html=True)
+                
+                col1, col2 = st.columns(2)
+                with col1:
+                    labels = {'revenue': 'Revenue (AED)', 'net_profit': 'Net Profit (AED)', 'margin_pct': 'Margin %', 'roi_pct': 'ROI %'}
+                    pct_table = pd.DataFrame([{'Metric': labels[name], 'P10': q['p10'], 'P50': q['p50'], 'P90': q['p90']} for name, q in pct.items()])
+                    st.dataframe(pct_table.round(1), use_container_width=True, hide_index=True)
+                    for w in mc_results.get('warnings', []):
+                        st.warning(w)
+                
+                with col2:
+                    fig = go.Figure(go.Histogram(x=mc_results['samples']['net_profit'], nbinsx=60, marker_color='#8b5cf6'))
+                    for label in ['p10', 'p50', 'p90']:
+                        fig.add_vline(x=pct['net_profit'][label], line_dash="dash", line_color="#f59e0b", annotation_text=label.upper())
+                    fig = style_plotly_chart_themed(fig, height=320)
+                    fig.update_layout(title="Net Profit Distribution", xaxis_title="Net Profit (AED)", yaxis_title="Draws", showlegend=False)
+                    st.plotly_chart(fig, use_container_width=True)
+                
+                st.caption(f"📌 {mc_results['n_draws']:,} draws, baseline bootstrapped from {mc_results['observed_days']} observed days.")
     
     show_footer()
 
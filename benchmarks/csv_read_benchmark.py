@@ -0,0 +1,77 @@
+"""
+CSV Read Benchmark - UAE Pulse Simulator
+Compares default pd.read_csv (plus the coercions the modules apply later)
+against schema-driven typed reads, on the sample files scaled up.
+
+Usage (from the repository root):
+    python benchmarks/csv_read_benchmark.py [scale]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.utils import SAMPLE_DATA_FILES, read_typed_csv, read_csv_files, CSV_ENGINE
+from modules.validator import FileValidator
+
+
+def scale_file(path, out_dir, scale):
+    """Write a copy of a CSV with its data rows repeated scale times."""
+    with open(path) as f:
+        header, body = f.read().split('\n', 1)
+    if not body.endswith('\n'):
+        body += '\n'
+    out_path = os.path.join(out_dir, os.path.basename(path))
+    with open(out_path, 'w') as f:
+        f.write(header + '\n')
+        for _ in range(scale):
+            f.write(body)
+    return out_path
+
+
+def default_read(path, file_type):
+    """Untyped read followed by the coercions downstream code performs."""
+    df = pd.read_csv(path)
+    schema = FileValidator.read_schema(file_type, df.columns)
+    for col in schema['numeric']:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+    for col in schema['dates']:
+        df[col] = pd.to_datetime(df[col], errors='coerce', format='mixed')
+    return df
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main(scale=100):
+    with tempfile.TemporaryDirectory() as tmp:
+        files = {name: scale_file(path, tmp, scale) for name, path in SAMPLE_DATA_FILES.items()}
+
+        print(f"Scale: {scale}x   engine: {CSV_ENGINE}   cpus: {os.cpu_count()}")
+        print(f"{'file':<12}{'rows':>12}{'MB':>10}{'default (s)':>14}{'typed (s)':>12}")
+
+        default_total = 0.0
+        typed_total = 0.0
+        for name, path in files.items():
+            df, default_seconds = timed(default_read, path, name)
+            _, typed_seconds = timed(read_typed_csv, path, name)
+            default_total += default_seconds
+            typed_total += typed_seconds
+            size_mb = os.path.getsize(path) / (1024 * 1024)
+            print(f"{name:<12}{len(df):>12,}{size_mb:>10.1f}{default_seconds:>14.2f}{typed_seconds:>12.2f}")
+
+        _, timings = read_csv_files(files)
+        print(f"{'sequential':<34}{default_total:>14.2f}{typed_total:>12.2f}")
+        print(f"{'concurrent typed (read_csv_files)':<48}{timings['total']:>12.2f}")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100)
@@ -6,6 +6,12 @@
 
 from .cleaner import DataCleaner
 from .simulator import Simulator
+from .inventory import InventoryEngine
+from .elasticity import ElasticityEstimator
+from .jobs import JobRunner
+from .profiler import DataProfiler
+from .rules import RuleEngine
+from .keys import KeyIndex
 from .utils import *
 
-__all__ = ['DataCleaner', 'Simulator']
+__all__ = ['DataCleaner', 'Simulator', 'InventoryEngine', 'ElasticityEstimator', 'JobRunner', 'DataProfiler', 'RuleEngine', 'KeyIndex']
@@ -0,0 +1,185 @@
+"""
+Elasticity Estimator Module - UAE Pulse Simulator
+Fits discount elasticities per category (optionally per city x channel x category).
+
+Model, per group:
+    log(qty) = a + b * log(1 - discount_pct / 100)
+    elasticity = -b   (demand lift % per 1% discount, same scale as the simulator)
+
+All groups are fitted at once from bincount sums over grouped arrays, then each
+estimate is shrunk towards its prior (SIMULATOR_CONFIG['category_elasticity'] for
+categories, the category fit for city x channel cells) by inverse-variance weighting.
+Groups with too few observations or no discount variation keep their prior.
+"""
+
+import pandas as pd
+import numpy as np
+
+from .utils import SIMULATOR_CONFIG, dataset_fingerprint, FingerprintCache
+from .schema import bind
+
+
+class ElasticityEstimator:
+    """Fit and look up discount elasticities from historical sales."""
+
+    # Fits are shared across instances and reused per dataset fingerprint
+    _fit_cache = FingerprintCache(max_entries=4)
+
+    def __init__(self, prior_elasticity=None, default_elasticity=None, prior_sd=None,
+                 min_observations=None, max_elasticity=None):
+        """Initialize estimator; unset parameters come from SIMULATOR_CONFIG."""
+        fit_config = SIMULATOR_CONFIG['elasticity_fit']
+        self.prior_elasticity = dict(prior_elasticity or SIMULATOR_CONFIG['category_elasticity'])
+        self.default_elasticity = default_elasticity if default_elasticity is not None else SIMULATOR_CONFIG['default_elasticity']
+        self.prior_sd = prior_sd if prior_sd is not None else fit_config['prior_sd']
+        self.min_observations = min_observations if min_observations is not None else fit_config['min_observations']
+        self.max_elasticity = max_elasticity if max_elasticity is not None else fit_config['max_elasticity']
+
+    def _dimension_labels(self, fact_keys, dim_df, key_role, attr_role):
+        """Gather a dimension attribute (by column role) for each fact row without merging frames."""
+        key_col = bind(dim_df).get(key_role)
+        attr_col = bind(dim_df).get(attr_role)
+        if not key_col or not attr_col:
+            return np.full(len(fact_keys), 'Unknown', dtype=object)
+
+        # Resolve each distinct key once, then broadcast back to the rows
+        codes, unique_keys = pd.factorize(fact_keys)
+        dim = dim_df[[key_col, attr_col]].drop_duplicates(subset=[key_col])
+        positions = pd.Index(dim[key_col]).get_indexer(unique_keys)
+        values = dim[attr_col].astype(object).to_numpy()
+        unique_labels = np.where(positions >= 0, values[positions], 'Unknown')
+        unique_labels = np.append(np.where(pd.isna(unique_labels), 'Unknown', unique_labels), 'Unknown')
+        return unique_labels[codes]
+
+    def _prepare(self, sales_df, products_df, stores_df, by_city_channel):
+        """Return (x, y, group label arrays) for every usable sales row."""
+        columns = bind(sales_df)
+        sku_col = columns.get('sku')
+        qty_col = columns.get('qty')
+        discount_col = columns.get('discount_pct')
+        if not sku_col or not qty_col or not discount_col:
+            return None
+
+        qty = pd.to_numeric(sales_df[qty_col], errors='coerce').to_numpy(dtype=float)
+        discount = pd.to_numeric(sales_df[discount_col], errors='coerce').fillna(0).to_numpy(dtype=float)
+        usable = (qty > 0) & (discount >= 0) & (discount < 95)
+
+        labels = {'category': self._dimension_labels(sales_df[sku_col][usable], products_df, 'sku', 'category')}
+        if by_city_channel and stores_df is not None:
+            store_col = columns.get('store_id')
+            if store_col:
+                store_keys = sales_df[store_col][usable]
+                for attr in ['city', 'channel']:
+                    labels[attr] = self._dimension_labels(store_keys, stores_df, 'store_id', attr)
+
+        x = np.log1p(-discount[usable] / 100)
+        y = np.log(qty[usable])
+        return x, y, labels
+
+    def _grouped_ols(self, codes, n_groups, x, y):
+        """Slope, standard error and count per group from bincount sums."""
+        n = np.bincount(codes, minlength=n_groups).astype(float)
+        sx = np.bincount(codes, weights=x, minlength=n_groups)
+        sy = np.bincount(codes, weights=y, minlength=n_groups)
+        sxx = np.bincount(codes, weights=x * x, minlength=n_groups)
+        sxy = np.bincount(codes, weights=x * y, minlength=n_groups)
+        syy = np.bincount(codes, weights=y * y, minlength=n_groups)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cxx = sxx - sx * sx / n
+            cxy = sxy - sx * sy / n
+            cyy = syy - sy * sy / n
+            slope = cxy / cxx
+            residual_var = np.maximum(cyy - slope * cxy, 0) / (n - 2)
+            std_error = np.sqrt(residual_var / cxx)
+
+        informative = (n >= max(self.min_observations, 3)) & (cxx > 1e-12) & np.isfinite(std_error)
+        return slope, std_error, n, informative
+
+    def _shrink(self, raw, std_error, prior, informative):
+        """Inverse-variance blend of the raw estimate and its prior, clipped to a sane range."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            data_weight = np.where(informative, 1.0 / np.maximum(std_error, 1e-9) ** 2, 0.0)
+        prior_weight = 1.0 / self.prior_sd ** 2
+        blended = (prior_weight * prior + data_weight * np.where(informative, raw, 0.0)) / (prior_weight + data_weight)
+        return np.clip(blended, 0.0, self.max_elasticity)
+
+    def _fit_level(self, x, y, keys, names, prior_for):
+        """Fit one grouping level; keys is a list of label arrays named by names."""
+        level_codes, level_values = zip(*[pd.factorize(k) for k in keys])
+        flat = np.ravel_multi_index(level_codes, [len(v) for v in level_values])
+        codes, group_ids = pd.factorize(flat, sort=True)
+        slope, std_error, n, informative = self._grouped_ols(codes, len(group_ids), x, y)
+
+        positions = np.unravel_index(group_ids, [len(v) for v in level_values])
+        groups = pd.DataFrame({name: np.asarray(values, dtype=object)[pos]
+                               for name, values, pos in zip(names, level_values, positions)})
+        prior = np.array([prior_for(row) for row in groups.itertuples(index=False, name=None)], dtype=float)
+        raw = -slope
+        groups['n_obs'] = n.astype(int)
+        groups['raw_elasticity'] = np.where(informative, raw, np.nan)
+        groups['std_error'] = np.where(informative, std_error, np.nan)
+        groups['prior_elasticity'] = prior
+        groups['elasticity'] = self._shrink(raw, std_error, prior, informative)
+        return groups
+
+    def fit(self, sales_df, products_df, stores_df=None, by_city_channel=False):
+        """Fit elasticities (cached per dataset fingerprint).
+
+        Returns a DataFrame with category (plus city, channel when by_city_channel)
+        and n_obs, raw_elasticity, std_error, prior_elasticity, elasticity. A pooled
+        row with category 'All' is always included.
+        """
+        key = (dataset_fingerprint(sales_df, products_df, stores_df if by_city_channel else None),
+               by_city_channel, self.prior_sd, self.min_observations, self.max_elasticity,
+               self.default_elasticity, tuple(sorted(self.prior_elasticity.items())))
+        cached = self._fit_cache.get(key)
+        if cached is not None:
+            return cached
+
+        try:
+            fitted = self._fit(sales_df, products_df, stores_df, by_city_channel)
+        except Exception as e:
+            print(f"Error in ElasticityEstimator.fit: {e}")
+            return pd.DataFrame()
+
+        return self._fit_cache.put(key, fitted)
+
+    def _fit(self, sales_df, products_df, stores_df, by_city_channel):
+        prepared = self._prepare(sales_df, products_df, stores_df, by_city_channel)
+        if prepared is None or len(prepared[0]) == 0:
+            return pd.DataFrame()
+        x, y, labels = prepared
+
+        pooled = self._fit_level(x, y, [np.full(len(x), 'All', dtype=object)], ['category'],
+                                 lambda g: self.default_elasticity)
+        categories = self._fit_level(x, y, [labels['category']], ['category'],
+                                     lambda g: self.prior_elasticity.get(g[0], self.default_elasticity))
+        fitted = pd.concat([pooled, categories], ignore_index=True)
+
+        if by_city_channel and 'city' in labels and 'channel' in labels:
+            category_fit = dict(zip(fitted['category'], fitted['elasticity']))
+            cells = self._fit_level(x, y, [labels['category'], labels['city'], labels['channel']],
+                                    ['category', 'city', 'channel'],
+                                    lambda g: category_fit.get(g[0], self.default_elasticity))
+            fitted['city'] = 'All'
+            fitted['channel'] = 'All'
+            fitted = pd.concat([fitted, cells], ignore_index=True)
+
+        return fitted
+
+    def lookup(self, fitted, category='All', city='All', channel='All'):
+        """Return the most specific fitted elasticity for a campaign segment."""
+        if fitted is None or len(fitted) == 0:
+            return self.prior_elasticity.get(category, self.default_elasticity) if category != 'All' else self.default_elasticity
+
+        if 'city' in fitted.columns and city != 'All' and channel != 'All' and category != 'All':
+            cell = fitted[(fitted['category'] == category) & (fitted['city'] == city) & (fitted['channel'] == channel)]
+            if len(cell) > 0:
+                return float(cell['elasticity'].iloc[0])
+
+        level = fitted if 'city' not in fitted.columns else fitted[fitted['city'] == 'All']
+        row = level[level['category'] == category]
+        if len(row) > 0:
+            return float(row['elasticity'].iloc[0])
+        return self.prior_elasticity.get(category, self.default_elasticity) if category != 'All' else self.default_elasticity
@@ -0,0 +1,152 @@
+"""
+Excel Ingestion Module - UAE Pulse Simulator
+Reads multi-sheet .xlsx workbooks into the products/stores/sales/inventory
+tables.
+
+Workbooks are opened with openpyxl in read-only mode, which streams each
+sheet's XML instead of building the workbook DOM. Each sheet is mapped to a
+table from its header (FileValidator._detect_file_type) and its rows are
+converted in batches to typed columns with the table's read schema, so at
+most BATCH_ROWS rows are held as Python objects at a time. Sheets that map
+to the same table (e.g. sales split across sheets at Excel's row limit)
+are concatenated.
+"""
+
+import time
+
+import pandas as pd
+
+from .utils import CONFIG, parse_dates_lenient
+from .validator import FileValidator
+from .schema import normalize_column
+
+
+BATCH_ROWS = 50000
+
+_NULL_TOKENS = set(CONFIG['null_representations'])
+
+
+def _open_workbook(source):
+    """Workbook in streaming read-only mode (cell values, not formulas)."""
+    from openpyxl import load_workbook
+
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    return load_workbook(source, read_only=True, data_only=True)
+
+
+def _read_header(rows):
+    """Column names from the first non-empty row; trailing blank header cells are dropped."""
+    for row in rows:
+        cells = list(row)
+        while cells and cells[-1] is None:
+            cells.pop()
+        if cells:
+            return [str(cell).strip() if cell is not None else f'Unnamed: {i}' for i, cell in enumerate(cells)]
+    return None
+
+
+def _sheet_table(header):
+    """Table a sheet holds, detected from its header, or None."""
+    if not header:
+        return None
+    return FileValidator._detect_file_type([normalize_column(col) for col in header])
+
+
+def detect_sheets(source):
+    """{sheet title: table or None} from each sheet's header row only."""
+    workbook = _open_workbook(source)
+    try:
+        return {sheet.title: _sheet_table(_read_header(sheet.iter_rows(values_only=True)))
+                for sheet in workbook.worksheets}
+    finally:
+        workbook.close()
+        if hasattr(source, 'seek'):
+            source.seek(0)
+
+
+def _typed_column(values, kind):
+    """One batch of cell values as a typed column, like read_typed_csv would read it."""
+    column = pd.Series(values, dtype=object)
+    nulls = column.isin(_NULL_TOKENS).to_numpy()
+    if nulls.any():
+        column[nulls] = None
+
+    if kind in ('id', 'text'):
+        return column.astype('str')
+    if kind == 'numeric':
+        return pd.to_numeric(column, errors='coerce')
+    if kind == 'datetime':
+        return parse_dates_lenient(column)
+    return column.infer_objects()
+
+
+def _typed_batch(rows, header, kinds):
+    """A batch of row tuples as a DataFrame of typed columns."""
+    width = len(header)
+    rows = [row[:width] if len(row) >= width else row + (None,) * (width - len(row)) for row in rows]
+    columns = zip(*rows) if rows else [()] * width
+    return pd.DataFrame({col: _typed_column(values, kinds[col]) for col, values in zip(header, columns)})
+
+
+def _read_rows(rows, header, table, batch_rows):
+    """Stream a sheet's data rows (after its header) into one typed frame."""
+    schema = FileValidator.read_schema(table, header)
+    kinds = {col: 'text' if col in schema['dtype'] else None for col in header}
+    kinds.update({col: 'numeric' for col in schema['numeric']})
+    kinds.update({col: 'datetime' for col in schema['dates']})
+
+    batches, batch = [], []
+    for row in rows:
+        # Blank rows are skipped, as read_csv skips blank lines
+        if all(cell is None for cell in row):
+            continue
+        batch.append(row)
+        if len(batch) >= batch_rows:
+            batches.append(_typed_batch(batch, header, kinds))
+            batch = []
+    if batch or not batches:
+        batches.append(_typed_batch(batch, header, kinds))
+
+    df = pd.concat(batches, ignore_index=True) if len(batches) > 1 else batches[0]
+    # Untyped columns may mix inferred types across batches
+    untyped = [col for col in header if kinds[col] is None and df[col].dtype == object]
+    for col in untyped:
+        df[col] = df[col].infer_objects()
+    return df
+
+
+def read_excel_workbook(source, batch_rows=BATCH_ROWS):
+    """Read the products/stores/sales/inventory sheets of an .xlsx workbook.
+
+    source is a path or file object. Returns (frames, report): frames maps
+    each detected table to its typed frame; report maps each sheet title to
+    {'table', 'rows', 'seconds', 'rows_per_sec'} (table None for sheets that
+    were skipped) and holds the workbook totals under 'total'.
+    """
+    start = time.perf_counter()
+    parts, report = {}, {}
+    workbook = _open_workbook(source)
+    try:
+        for sheet in workbook.worksheets:
+            sheet_start = time.perf_counter()
+            sheet_rows = sheet.iter_rows(values_only=True)
+            header = _read_header(sheet_rows)
+            table = _sheet_table(header)
+            rows = 0
+            if table is not None:
+                df = _read_rows(sheet_rows, header, table, batch_rows)
+                parts.setdefault(table, []).append(df)
+                rows = len(df)
+            seconds = time.perf_counter() - sheet_start
+            report[sheet.title] = {'table': table, 'rows': rows, 'seconds': seconds,
+                                   'rows_per_sec': rows / seconds if seconds > 0 else 0.0}
+    finally:
+        workbook.close()
+
+    frames = {table: pd.concat(dfs, ignore_index=True) if len(dfs) > 1 else dfs[0] for table, dfs in parts.items()}
+    seconds = time.perf_counter() - start
+    rows = sum(len(df) for df in frames.values())
+    report['total'] = {'table': None, 'rows': rows, 'seconds': seconds,
+                       'rows_per_sec': rows / seconds if seconds > 0 else 0.0}
+    return frames, report
@@ -0,0 +1,102 @@
+"""
+Fuzzy Matching Module - UAE Pulse Simulator
+Resolves dirty text values (typos, spacing, Unicode variants) against a
+canonical vocabulary, e.g. the cities, channels and categories in
+config/text_mappings.json.
+
+Values are NFKC-normalized and casefolded, so Arabic/Devanagari
+presentation forms and full-width Latin compare equal to their plain
+forms; common Arabic letter variants are folded too. Candidate aliases
+come from a character trigram index and are scored by optimal string
+alignment distance (a swapped letter pair counts as one edit). Results
+are memoized per raw value, so cost follows the number of distinct
+values, not rows.
+"""
+
+import unicodedata
+from collections import Counter, defaultdict
+
+
+# Arabic letter variants commonly typed interchangeably (hamza forms of alef,
+# alef maksura, taa marbuta), plus tatweel and short-vowel marks
+_ARABIC_FOLD = str.maketrans({'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ى': 'ي', 'ة': 'ه', 'ـ': None,
+                              **{chr(c): None for c in range(0x064B, 0x0653)}})
+
+
+def normalize_text(value):
+    """NFKC-normalized, casefolded text with Arabic variants folded and whitespace collapsed."""
+    return ' '.join(unicodedata.normalize('NFKC', str(value)).casefold().translate(_ARABIC_FOLD).split())
+
+
+def edit_distance(a, b):
+    """Optimal string alignment distance (Levenshtein plus adjacent transpositions)."""
+    if len(a) < len(b):
+        a, b = b, a
+    before, previous = None, list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i] + [0] * len(b)
+        for j, char_b in enumerate(b, 1):
+            cost = 0 if char_a == char_b else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if before is not None and i > 1 and j > 1 and char_a == b[j - 2] and a[i - 2] == char_b:
+                current[j] = min(current[j], before[j - 2] + 1)
+        before, previous = previous, current
+    return previous[len(b)]
+
+
+class FuzzyMatcher:
+    """Trigram-indexed fuzzy lookup of raw values against canonical values."""
+
+    NGRAM = 3
+    MAX_CANDIDATES = 20
+    MAX_MEMO = 100000
+
+    def __init__(self, aliases, min_confidence=0.8):
+        """aliases maps raw variants (and the canonical values themselves) to canonical values."""
+        self.min_confidence = min_confidence
+        self.aliases = {}
+        for alias, canonical in aliases.items():
+            self.aliases.setdefault(normalize_text(alias), canonical)
+
+        self.index = defaultdict(set)
+        for alias in self.aliases:
+            for gram in self._ngrams(alias):
+                self.index[gram].add(alias)
+        self._memo = {}
+
+    def _ngrams(self, text):
+        """Character n-grams, padded so short words still share grams."""
+        padded = ' ' * (self.NGRAM - 1) + text + ' '
+        return {padded[i:i + self.NGRAM] for i in range(len(padded) - self.NGRAM + 1)}
+
+    def match(self, value):
+        """(canonical value, confidence in [0, 1]); canonical is None below min_confidence.
+
+        Exact matches after normalization have confidence 1.0. Ties between
+        different canonical values are treated as no match.
+        """
+        cached = self._memo.get(value)
+        if cached is None:
+            if len(self._memo) >= self.MAX_MEMO:
+                self._memo.clear()
+            cached = self._memo[value] = self._match(normalize_text(value))
+        return cached
+
+    def _match(self, text):
+        if not text:
+            return None, 0.0
+        if text in self.aliases:
+            return self.aliases[text], 1.0
+
+        shared = Counter(alias for gram in self._ngrams(text) for alias in self.index.get(gram, ()))
+        best_score, best = 0.0, set()
+        for alias, _ in shared.most_common(self.MAX_CANDIDATES):
+            score = 1 - edit_distance(text, alias) / max(len(text), len(alias))
+            if score > best_score:
+                best_score, best = score, {self.aliases[alias]}
+            elif score == best_score:
+                best.add(self.aliases[alias])
+
+        if best_score >= self.min_confidence and len(best) == 1:
+            return best.pop(), round(best_score, 3)
+        return None, round(best_score, 3)
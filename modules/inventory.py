@@ -0,0 +1,267 @@
+"""
+Inventory Engine Module - UAE Pulse Simulator
+Days-of-cover, stockout projection and reorder planning per SKU x store.
+
+For every SKU x store pair in the latest inventory snapshot:
+- daily_velocity = units sold / observed sales window (days)
+- days_of_cover = stock_on_hand / daily_velocity
+- projected_stockout_date = snapshot_date + days_of_cover
+- reorder trigger = max(reorder_point, daily_velocity x lead_time_days)
+- reorder_qty = trigger + daily_velocity x target_cover_days - stock (when triggered)
+"""
+
+import pandas as pd
+import numpy as np
+
+from .utils import dataset_fingerprint, FingerprintCache
+from .schema import bind
+
+
+class InventoryEngine:
+    """Vectorized inventory health and replenishment planning."""
+
+    RISK_LEVELS = ['Critical', 'High', 'Medium', 'OK']
+
+    # Plans are shared across instances so reruns reuse them per dataset version
+    _plan_cache = FingerprintCache(max_entries=4)
+
+    def __init__(self, target_cover_days=14, default_lead_time=3, default_reorder_point=10):
+        """Initialize engine with replenishment policy defaults."""
+        self.target_cover_days = target_cover_days
+        self.default_lead_time = default_lead_time
+        self.default_reorder_point = default_reorder_point
+        self.default_window_days = 30
+
+    def _get_sku_column(self, df):
+        return bind(df).get('sku')
+
+    def _get_store_column(self, df):
+        return bind(df).get('store_id')
+
+    def calculate_sales_velocity(self, sales_df):
+        """Return (velocity DataFrame [_sku, _store, daily_velocity], window_days, last_sale_date)."""
+        sku_col = self._get_sku_column(sales_df)
+        store_col = self._get_store_column(sales_df)
+        qty_col = bind(sales_df).get('qty')
+        date_col = bind(sales_df).get('order_time')
+        status_col = bind(sales_df).get('payment_status')
+
+        empty = pd.DataFrame({'_sku': pd.Series(dtype=object), '_store': pd.Series(dtype=object),
+                              'daily_velocity': pd.Series(dtype=float)})
+        if sales_df is None or len(sales_df) == 0 or not sku_col or not store_col:
+            return empty, self.default_window_days, None
+
+        qty = pd.to_numeric(sales_df[qty_col], errors='coerce').fillna(0) if qty_col else pd.Series(1.0, index=sales_df.index)
+
+        # Failed payments never ship, so they don't deplete stock
+        shipped = np.ones(len(sales_df), dtype=bool)
+        if status_col:
+            shipped = (sales_df[status_col].astype(str).str.strip().str.lower() != 'failed').to_numpy()
+
+        window_days = self.default_window_days
+        last_sale_date = None
+        if date_col:
+            dates = sales_df[date_col]
+            if not pd.api.types.is_datetime64_any_dtype(dates):
+                dates = pd.to_datetime(dates, errors='coerce', format='mixed')
+            if dates.notna().any():
+                first, last = dates.min(), dates.max()
+                window_days = max(1, (last.normalize() - first.normalize()).days + 1)
+                last_sale_date = last.normalize()
+
+        units = pd.DataFrame({
+            '_sku': sales_df[sku_col].to_numpy()[shipped],
+            '_store': sales_df[store_col].to_numpy()[shipped],
+            '_units': qty.to_numpy()[shipped]
+        })
+        velocity = units.groupby(['_sku', '_store'], sort=False)['_units'].sum().reset_index()
+        velocity['daily_velocity'] = velocity['_units'] / window_days
+
+        return velocity[['_sku', '_store', 'daily_velocity']], window_days, last_sale_date
+
+    def _latest_snapshot(self, inventory_df, sku_col, store_col):
+        """Keep the most recent snapshot row for each SKU x store pair."""
+        snap_col = bind(inventory_df).get('snapshot_date')
+        stock_col = bind(inventory_df).get('stock_on_hand')
+        reorder_col = bind(inventory_df).get('reorder_point')
+        lead_col = bind(inventory_df).get('lead_time_days')
+
+        inv = pd.DataFrame({
+            '_sku': inventory_df[sku_col].to_numpy(),
+            '_store': inventory_df[store_col].to_numpy(),
+            'stock_on_hand': pd.to_numeric(inventory_df[stock_col], errors='coerce').fillna(0).clip(lower=0).to_numpy() if stock_col else 0.0,
+            'reorder_point': pd.to_numeric(inventory_df[reorder_col], errors='coerce').fillna(self.default_reorder_point).to_numpy() if reorder_col else float(self.default_reorder_point),
+            'lead_time_days': pd.to_numeric(inventory_df[lead_col], errors='coerce').fillna(self.default_lead_time).to_numpy() if lead_col else float(self.default_lead_time),
+        })
+
+        if snap_col:
+            snapshot = inventory_df[snap_col]
+            if not pd.api.types.is_datetime64_any_dtype(snapshot):
+                snapshot = pd.to_datetime(snapshot, errors='coerce')
+            inv['snapshot_date'] = snapshot.to_numpy()
+            inv = inv.sort_values('snapshot_date', kind='stable', na_position='first')
+            inv = inv.drop_duplicates(subset=['_sku', '_store'], keep='last')
+        else:
+            inv['snapshot_date'] = pd.NaT
+            inv = inv.drop_duplicates(subset=['_sku', '_store'], keep='last')
+
+        return inv
+
+    def latest_stock(self, inventory_df):
+        """Return latest stock per SKU x store as a DataFrame [_sku, _store, stock_on_hand] (cached)."""
+        key = ('latest_stock', dataset_fingerprint(inventory_df))
+        cached = self._plan_cache.get(key)
+        if cached is not None:
+            return cached
+
+        sku_col = self._get_sku_column(inventory_df)
+        store_col = self._get_store_column(inventory_df)
+        if not sku_col or not store_col:
+            return pd.DataFrame(columns=['_sku', '_store', 'stock_on_hand'])
+
+        inv = self._latest_snapshot(inventory_df, sku_col, store_col)
+        return self._plan_cache.put(key, inv[['_sku', '_store', 'stock_on_hand']].reset_index(drop=True))
+
+    def allocate_campaign_demand(self, pair_demand, pair_stock, pair_price, demand_multiplier=1.0):
+        """Cap campaign demand at available stock for each SKU x store pair.
+        
+        pair_demand, pair_stock and pair_price are aligned per-pair arrays; a NaN
+        stock means the pair is not tracked in inventory and is left unconstrained.
+        demand_multiplier may be a scalar or an array of scenarios (e.g. 1 + lift
+        for a discount grid); totals come back with the multiplier's shape.
+        """
+        multiplier = np.asarray(demand_multiplier, dtype=float)
+        demand = np.multiply.outer(multiplier, np.asarray(pair_demand, dtype=float))
+        stock = np.asarray(pair_stock, dtype=float)
+        stock = np.where(np.isnan(stock), np.inf, stock)
+
+        fulfilled = np.minimum(demand, stock)
+        lost = demand - fulfilled
+
+        return {
+            'demand_units': demand.sum(axis=-1),
+            'fulfilled_units': fulfilled.sum(axis=-1),
+            'lost_units': lost.sum(axis=-1),
+            'revenue_at_risk': (lost * np.asarray(pair_price, dtype=float)).sum(axis=-1),
+            'stockout_pairs': (lost > 0).sum(axis=-1),
+            'lost_by_pair': lost
+        }
+
+    def build_plan(self, sales_df, inventory_df):
+        """Return the ranked inventory plan for every SKU x store pair (cached per dataset)."""
+        if inventory_df is None or len(inventory_df) == 0:
+            return pd.DataFrame()
+
+        key = (dataset_fingerprint(sales_df, inventory_df),
+               self.target_cover_days, self.default_lead_time, self.default_reorder_point)
+        cached = self._plan_cache.get(key)
+        if cached is not None:
+            return cached
+
+        try:
+            plan = self._compute_plan(sales_df, inventory_df)
+        except Exception as e:
+            print(f"Error in build_plan: {e}")
+            return pd.DataFrame()
+
+        return self._plan_cache.put(key, plan)
+
+    def _compute_plan(self, sales_df, inventory_df):
+        """Compute cover, stockout dates and reorder quantities in one vectorized pass."""
+        sku_col = self._get_sku_column(inventory_df)
+        store_col = self._get_store_column(inventory_df)
+        if not sku_col or not store_col:
+            return pd.DataFrame()
+
+        inv = self._latest_snapshot(inventory_df, sku_col, store_col)
+        velocity, window_days, last_sale_date = self.calculate_sales_velocity(sales_df)
+
+        plan = inv.merge(velocity, on=['_sku', '_store'], how='left')
+        plan['daily_velocity'] = plan['daily_velocity'].fillna(0.0)
+
+        stock = plan['stock_on_hand'].to_numpy(dtype=float)
+        vel = plan['daily_velocity'].to_numpy(dtype=float)
+        lead = plan['lead_time_days'].to_numpy(dtype=float)
+        reorder_point = plan['reorder_point'].to_numpy(dtype=float)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cover = np.where(vel > 0, stock / vel, np.inf)
+
+        # Stockout dates project forward from the snapshot (or last sale when undated)
+        as_of = plan['snapshot_date']
+        if as_of.isna().all() and last_sale_date is not None:
+            as_of = pd.Series(last_sale_date, index=plan.index)
+        # Beyond ten years of cover a stockout date is meaningless (and overflows)
+        finite = cover <= 3650
+        offsets = pd.to_timedelta(np.where(finite, cover, 0.0), unit='D')
+        stockout_date = (pd.to_datetime(as_of) + offsets).dt.normalize()
+        stockout_date[~finite] = pd.NaT
+
+        lead_time_demand = vel * lead
+        trigger = np.maximum(reorder_point, lead_time_demand)
+        needs_reorder = stock <= trigger
+        order_up_to = trigger + vel * self.target_cover_days
+        reorder_qty = np.where(needs_reorder, np.ceil(np.maximum(order_up_to - stock, 0)), 0)
+
+        slack = cover - lead
+        risk_code = np.select(
+            [(stock <= 0) | (slack < 0), needs_reorder, cover < lead + self.target_cover_days],
+            [0, 1, 2],
+            default=3
+        )
+
+        plan['days_of_cover'] = cover
+        plan['projected_stockout_date'] = stockout_date
+        plan['lead_time_demand'] = lead_time_demand
+        plan['needs_reorder'] = needs_reorder
+        plan['reorder_qty'] = reorder_qty.astype(np.int64)
+        plan['cover_slack_days'] = slack
+        plan['risk_level'] = pd.Categorical.from_codes(risk_code, categories=self.RISK_LEVELS, ordered=True)
+
+        # Rank: risk tier, then least slack, then least stock
+        order = np.lexsort((stock, np.where(np.isfinite(slack), slack, np.finfo(float).max), risk_code))
+        plan = plan.iloc[order].reset_index(drop=True)
+        plan['risk_rank'] = np.arange(1, len(plan) + 1)
+        plan.attrs['window_days'] = window_days
+
+        plan = plan.rename(columns={'_sku': 'sku', '_store': 'store_id'})
+        return plan[['risk_rank', 'sku', 'store_id', 'stock_on_hand', 'reorder_point', 'lead_time_days',
+                     'daily_velocity', 'days_of_cover', 'projected_stockout_date', 'lead_time_demand',
+                     'needs_reorder', 'reorder_qty', 'cover_slack_days', 'risk_level', 'snapshot_date']]
+
+    def summarize(self, plan):
+        """Return headline inventory metrics from a plan."""
+        if plan is None or len(plan) == 0:
+            return {'pairs': 0, 'needs_reorder': 0, 'stockout_before_replenishment': 0,
+                    'zero_stock': 0, 'total_reorder_units': 0, 'median_days_of_cover': 0}
+
+        cover = plan['days_of_cover'].to_numpy()
+        finite_cover = cover[np.isfinite(cover)]
+        return {
+            'pairs': len(plan),
+            'needs_reorder': int(plan['needs_reorder'].sum()),
+            'stockout_before_replenishment': int((plan['cover_slack_days'] < 0).sum()),
+            'zero_stock': int((plan['stock_on_hand'] <= 0).sum()),
+            'total_reorder_units': int(plan['reorder_qty'].sum()),
+            'median_days_of_cover': float(np.median(finite_cover)) if len(finite_cover) else float('inf')
+        }
+
+    def coverage_by(self, plan, dimension_df, key_col, dimension):
+        """Aggregate days of cover (total stock / total daily velocity) by a dimension."""
+        if plan is None or len(plan) == 0 or dimension_df is None or dimension not in dimension_df.columns:
+            return pd.DataFrame(columns=[dimension, 'stock', 'daily_velocity', 'days_of_cover'])
+
+        lookup = dimension_df[[key_col, dimension]].drop_duplicates(subset=[key_col])
+        plan_key = 'sku' if key_col in ('sku', 'product_id') else 'store_id'
+        labels = pd.Index(lookup[key_col]).get_indexer(plan[plan_key])
+        dims = np.where(labels >= 0, lookup[dimension].to_numpy()[labels], 'Unknown')
+
+        grouped = pd.DataFrame({
+            dimension: dims,
+            'stock': plan['stock_on_hand'].to_numpy(),
+            'daily_velocity': plan['daily_velocity'].to_numpy()
+        }).groupby(dimension, sort=False).sum().reset_index()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            grouped['days_of_cover'] = np.where(grouped['daily_velocity'] > 0,
+                                                grouped['stock'] / grouped['daily_velocity'], np.inf)
+        return grouped
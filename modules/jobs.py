@@ -0,0 +1,128 @@
+"""
+Job Runner Module - UAE Pulse Simulator
+Runs long tasks (e.g. cleaning) on a shared background thread pool.
+
+Jobs report progress through a callback and are polled by id, so the
+Streamlit script thread never blocks on the work itself. Cancellation is
+cooperative: the next progress report after cancel() stops the job.
+"""
+
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+class JobCancelled(Exception):
+    """Raised inside a job when cancellation was requested."""
+
+
+class JobRunner:
+    """Submit, poll and cancel background jobs."""
+
+    # One pool per server process, shared by every session
+    _executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='uae-pulse-job')
+    _jobs = {}
+    _lock = threading.Lock()
+    _max_finished_jobs = 20
+
+    def submit(self, fn, *args, label='Job', **kwargs):
+        """Run fn(*args, progress_callback=..., **kwargs) in the background; returns a job id."""
+        job_id = uuid.uuid4().hex
+        job = {
+            'id': job_id,
+            'label': label,
+            'status': 'queued',
+            'stage': 'Queued',
+            'rows_processed': 0,
+            'total_rows': 0,
+            'progress': 0.0,
+            'result': None,
+            'error': None,
+            'submitted_at': time.time(),
+            'started_at': None,
+            'finished_at': None,
+            'cancel_event': threading.Event()
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+            self._prune()
+
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return job_id
+
+    def _run(self, job, fn, args, kwargs):
+        """Worker body: execute fn and record its outcome on the job."""
+        def progress_callback(stage, rows_processed, total_rows):
+            if job['cancel_event'].is_set():
+                raise JobCancelled()
+            with self._lock:
+                job['stage'] = stage
+                job['rows_processed'] = rows_processed
+                job['total_rows'] = total_rows
+                job['progress'] = min(rows_processed / total_rows, 1.0) if total_rows > 0 else 0.0
+
+        with self._lock:
+            if job['cancel_event'].is_set():
+                job['status'] = 'cancelled'
+                job['finished_at'] = time.time()
+                return
+            job['status'] = 'running'
+            job['started_at'] = time.time()
+
+        try:
+            result = fn(*args, progress_callback=progress_callback, **kwargs)
+            status, error = 'done', None
+        except JobCancelled:
+            result, status, error = None, 'cancelled', None
+        except Exception as e:
+            print(f"Error in job {job['label']}: {e}")
+            result, status, error = None, 'failed', str(e)
+
+        with self._lock:
+            job['result'] = result
+            job['status'] = status
+            job['error'] = error
+            job['finished_at'] = time.time()
+            if status == 'done':
+                job['progress'] = 1.0
+                job['stage'] = 'Done'
+
+    def _prune(self):
+        """Forget the oldest finished jobs (caller holds the lock)."""
+        finished = [j for j in self._jobs.values() if j['finished_at'] is not None]
+        finished.sort(key=lambda j: j['finished_at'])
+        for job in finished[:max(0, len(finished) - self._max_finished_jobs)]:
+            del self._jobs[job['id']]
+
+    def status(self, job_id):
+        """Snapshot of a job's state (without the result), or None for unknown ids."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            snapshot = {k: v for k, v in job.items() if k not in ('result', 'cancel_event')}
+
+        end = snapshot['finished_at'] or time.time()
+        snapshot['elapsed_seconds'] = end - snapshot['started_at'] if snapshot['started_at'] else 0.0
+        return snapshot
+
+    def result(self, job_id, pop=True):
+        """Result of a finished job; with pop, the job is forgotten afterwards."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job['finished_at'] is None:
+                return None
+            if pop:
+                del self._jobs[job_id]
+            return job['result']
+
+    def cancel(self, job_id):
+        """Request cancellation; returns False if the job is unknown or already finished."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job['finished_at'] is not None:
+                return False
+            job['cancel_event'].set()
+            job['stage'] = 'Cancelling...'
+            return True
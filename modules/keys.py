@@ -0,0 +1,158 @@
+"""
+Key Interning Module - UAE Pulse Simulator
+Interns the sku, store_id and order_id join keys into integer codes shared
+by all four tables.
+
+At load time each key column becomes a pandas Categorical over one
+vocabulary per key (KeyIndex), so a code means the same key in products,
+stores, sales and inventory. Joins then index arrays by code
+(cost[sku_codes]) and foreign key checks are a boolean mask lookup;
+strings are only hashed once, while interning. DimensionLookup uses the
+same positions to enrich fact rows with store/product attributes.
+"""
+
+import numpy as np
+import pandas as pd
+
+from .schema import bind
+
+
+# Join keys interned by KeyIndex, as column roles of utils.COLUMN_SCHEMA
+KEYS = ('sku', 'store_id', 'order_id')
+
+
+def find_key_column(df, key):
+    """Name of a table's column for a join key (as bound by schema.bind), or None."""
+    return bind(df).get(key)
+
+
+def is_interned(values):
+    """Whether a Series or array holds interned (categorical) keys."""
+    return isinstance(getattr(values, 'dtype', None), pd.CategoricalDtype)
+
+
+def shared_vocabulary(left, right):
+    """Whether two key columns are interned with the same codes."""
+    if not (is_interned(left) and is_interned(right)):
+        return False
+    return left.dtype is right.dtype or left.dtype.categories.equals(right.dtype.categories)
+
+
+def key_codes(values):
+    """int32 codes of interned keys (-1 for missing)."""
+    codes = values.cat.codes if isinstance(values, pd.Series) else values.codes
+    return np.asarray(codes, dtype=np.int32)
+
+
+def key_positions(keys, dim_keys):
+    """Position in dim_keys of each value in keys (first occurrence), -1 where absent.
+
+    When both are interned with the same vocabulary this is one array lookup
+    by code; otherwise the keys are hashed with a pandas Index.
+    """
+    if shared_vocabulary(keys, dim_keys):
+        codes, first = np.unique(key_codes(dim_keys), return_index=True)
+        # One extra slot so code -1 (missing) matches a missing dimension key
+        lookup = np.full(len(dim_keys.dtype.categories) + 1, -1, dtype=np.int64)
+        lookup[codes] = first
+        return lookup[key_codes(keys)]
+
+    # Look up each distinct key once, then broadcast by the factorized codes
+    codes, uniques = pd.factorize(keys, use_na_sentinel=False)
+    dim = pd.Index(dim_keys)
+    first = ~dim.duplicated()
+    found = dim[first].get_indexer(uniques)
+    return np.where(found >= 0, np.flatnonzero(first)[found], -1)[codes]
+
+
+class DimensionLookup:
+    """Attributes of a unique-keyed dimension table (stores, products) gathered per fact row.
+
+    Stands in for a left merge of a fact table onto the dimension: each
+    fact key's dimension position is resolved once (by code for interned
+    keys) and every attribute is a take at those positions, so no merged
+    frame is built. Duplicate dimension keys resolve to their first row.
+    """
+
+    def __init__(self, dim_df, key_col):
+        self.dim_df = dim_df
+        self.key_col = key_col
+
+    def positions(self, keys):
+        """Dimension row of each fact key, -1 where the key is not in the dimension."""
+        return key_positions(keys, self.dim_df[self.key_col])
+
+    def take(self, positions, col):
+        """Values of a dimension column at positions (NA where -1)."""
+        return pd.api.extensions.take(self.dim_df[col].array, positions, allow_fill=True)
+
+    def gather(self, keys, columns):
+        """{name: values} per fact key for columns {name: dimension column}."""
+        positions = self.positions(keys)
+        return {name: self.take(positions, col) for name, col in columns.items()}
+
+
+class KeyIndex:
+    """One vocabulary per join key, shared by every table interned with it."""
+
+    def __init__(self, vocabularies):
+        """vocabularies maps a key to its distinct values (position = code)."""
+        self.dtypes = {key: pd.CategoricalDtype(pd.Index(values)) for key, values in vocabularies.items()}
+
+    @classmethod
+    def build(cls, frames):
+        """Vocabularies from the key columns of all frames, in order of first appearance."""
+        index, _ = cls._build(frames)
+        return index
+
+    @classmethod
+    def _build(cls, frames):
+        """KeyIndex plus each key column's factorization, so interning hashes every column once."""
+        vocabularies, factorized = {}, {}
+        for key in KEYS:
+            uniques = []
+            for i, df in enumerate(frames):
+                col = find_key_column(df, key) if df is not None else None
+                if col is not None:
+                    factorized[i, key] = pd.factorize(df[col])
+                    uniques.append(np.asarray(factorized[i, key][1], dtype=object))
+            if uniques:
+                vocabularies[key] = pd.unique(np.concatenate(uniques))
+        return cls(vocabularies), factorized
+
+    def intern(self, df, factorized=None):
+        """Shallow copy of a frame with its key columns converted to shared codes.
+
+        factorized optionally holds {key: (codes, uniques)} of the frame's key
+        columns, so only the distinct values are looked up.
+        """
+        if df is None:
+            return None
+        df = df.copy(deep=False)
+        for key, dtype in self.dtypes.items():
+            col = find_key_column(df, key)
+            if col is None:
+                continue
+            if factorized is not None and key in factorized:
+                codes, uniques = factorized[key]
+                lookup = np.append(dtype.categories.get_indexer(uniques), -1).astype(np.int32)
+                df[col] = pd.Series(pd.Categorical.from_codes(lookup[codes], dtype=dtype), index=df.index)
+            else:
+                df[col] = df[col].astype(dtype)
+        return df
+
+    def size(self, key):
+        """Number of distinct values (codes) of a key."""
+        return len(self.dtypes[key].categories) if key in self.dtypes else 0
+
+
+def intern_keys(frames):
+    """Intern the join keys of named frames ({name: df}) with one shared KeyIndex.
+
+    Returns (interned frames, key index).
+    """
+    names = list(frames)
+    index, factorized = KeyIndex._build([frames[name] for name in names])
+    interned = {name: index.intern(frames[name], {key: f for (i, key), f in factorized.items() if i == n})
+                for n, name in enumerate(names)}
+    return interned, index
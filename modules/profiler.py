@@ -0,0 +1,243 @@
+"""
+Data Profiler Module - UAE Pulse Simulator
+Per-column profiles (nulls, distinct counts, numeric stats, top values,
+histograms) computed in one pass per table.
+
+Every column keeps a small mergeable accumulator, so a table can be fed as
+one DataFrame or as chunks (e.g. pd.read_csv(..., chunksize=...)) and gives
+the same kind of result:
+- distinct counts are exact up to KMV_SIZE values, then a K-minimum-values
+  sketch estimate (~3% error)
+- quantiles and histograms come from a uniform bottom-k sample of SAMPLE_SIZE
+  values (exact when the column has fewer non-null values)
+- top values are exact for low-cardinality columns, approximate otherwise
+"""
+
+import os
+
+import pandas as pd
+import numpy as np
+
+from .utils import dataset_fingerprint, FingerprintCache
+
+
+class _ColumnAccumulator:
+    """Mergeable single-column statistics."""
+
+    def __init__(self, name, kmv_size, sample_size, top_k, rng):
+        self.name = name
+        self.kmv_size = kmv_size
+        self.sample_size = sample_size
+        self.top_k = top_k
+        self.rng = rng
+
+        self.kind = None
+        self.dtype = None
+        self.count = 0
+        self.null_count = 0
+        self.hashes = np.empty(0, dtype=np.uint64)
+        self.kmv_saturated = False
+        self.value_counts = {}
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.min = None
+        self.max = None
+        self.sample = np.empty(0)
+        self.sample_keys = np.empty(0)
+
+    def _kind(self, series):
+        if pd.api.types.is_bool_dtype(series):
+            return 'boolean'
+        if pd.api.types.is_numeric_dtype(series):
+            return 'numeric'
+        if pd.api.types.is_datetime64_any_dtype(series):
+            return 'datetime'
+        return 'text'
+
+    def update(self, series):
+        """Fold one chunk of the column into the accumulator."""
+        if self.kind is None:
+            self.kind = self._kind(series)
+            self.dtype = str(series.dtype)
+
+        nulls = series.isna().to_numpy()
+        self.count += len(series)
+        self.null_count += int(nulls.sum())
+        if nulls.all():
+            return
+
+        # Distinct values and their counts from one factorize pass
+        codes, uniques = pd.factorize(series)
+        counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+        self._update_distinct(uniques)
+        self._update_top(uniques, counts)
+
+        if self.kind in ('numeric', 'datetime'):
+            values = series.to_numpy()
+            if self.kind == 'datetime':
+                values = values.astype('datetime64[ns]').astype(np.int64)
+                valid = ~nulls
+            else:
+                values = values.astype(float)
+                valid = ~nulls & np.isfinite(values)
+            values = values[valid]
+            if len(values) == 0:
+                return
+            chunk_min, chunk_max = values.min(), values.max()
+            self.min = chunk_min if self.min is None else min(self.min, chunk_min)
+            self.max = chunk_max if self.max is None else max(self.max, chunk_max)
+            if self.kind == 'numeric':
+                self.total += float(values.sum())
+                self.total_sq += float(np.square(values).sum())
+            self._update_sample(values)
+
+    def _update_distinct(self, uniques):
+        """Keep the kmv_size smallest 64-bit hashes of the distinct values."""
+        hashes = pd.util.hash_array(np.asarray(uniques, dtype=object), categorize=False)
+        if len(hashes) > self.kmv_size:
+            self.kmv_saturated = True
+            hashes = np.partition(hashes, self.kmv_size)[:self.kmv_size]
+        merged = np.union1d(self.hashes, hashes)
+        if len(merged) > self.kmv_size:
+            self.kmv_saturated = True
+            merged = merged[:self.kmv_size]
+        self.hashes = merged
+
+    def _update_top(self, uniques, counts):
+        """Merge this chunk's most frequent values (capped so memory stays bounded)."""
+        keep = min(len(counts), max(self.top_k * 20, 200))
+        top = np.argpartition(counts, -keep)[-keep:] if keep < len(counts) else np.arange(len(counts))
+        labels = np.asarray(uniques.take(top), dtype=object)
+        for value, count in zip(labels, counts[top]):
+            self.value_counts[value] = self.value_counts.get(value, 0) + int(count)
+        if len(self.value_counts) > 4 * keep:
+            ranked = sorted(self.value_counts.items(), key=lambda item: item[1], reverse=True)[:2 * keep]
+            self.value_counts = dict(ranked)
+
+    def _update_sample(self, values):
+        """Bottom-k sampling: each value gets a random key, the smallest keys are kept."""
+        keys = self.rng.random(len(values))
+        if len(values) > self.sample_size:
+            keep = np.argpartition(keys, self.sample_size)[:self.sample_size]
+            values, keys = values[keep], keys[keep]
+        self.sample = np.concatenate([self.sample, values.astype(float)])
+        self.sample_keys = np.concatenate([self.sample_keys, keys])
+        if len(self.sample) > self.sample_size:
+            keep = np.argpartition(self.sample_keys, self.sample_size)[:self.sample_size]
+            self.sample, self.sample_keys = self.sample[keep], self.sample_keys[keep]
+
+    def distinct(self):
+        """(distinct count, is_estimate)."""
+        if not self.kmv_saturated:
+            return len(self.hashes), False
+        kth = float(self.hashes[-1]) / float(np.iinfo(np.uint64).max)
+        return int(round((self.kmv_size - 1) / kth)), True
+
+    def result(self, bins):
+        """Final profile row and histogram for the column."""
+        non_null = self.count - self.null_count
+        distinct, estimated = self.distinct() if non_null > 0 else (0, False)
+        distinct = min(distinct, non_null)
+        top = sorted(self.value_counts.items(), key=lambda item: item[1], reverse=True)[:self.top_k]
+
+        row = {
+            'column': self.name,
+            'dtype': self.dtype,
+            'kind': self.kind,
+            'rows': self.count,
+            'null_count': self.null_count,
+            'null_pct': (self.null_count / self.count * 100) if self.count > 0 else 0.0,
+            'distinct': distinct,
+            'distinct_estimated': estimated,
+            'min': None, 'max': None, 'mean': None, 'std': None,
+            'p25': None, 'p50': None, 'p75': None,
+            'top_values': ', '.join(f"{value} ({count:,})" for value, count in top)
+        }
+
+        histogram = None
+        if self.kind in ('numeric', 'datetime') and len(self.sample) > 0:
+            p25, p50, p75 = np.percentile(self.sample, [25, 50, 75])
+            counts, edges = np.histogram(self.sample, bins=bins, range=(float(self.min), float(self.max)))
+            # Scale sample counts to the full column
+            counts = counts * (non_null / len(self.sample))
+            if self.kind == 'numeric':
+                mean = self.total / non_null
+                row.update({
+                    'min': float(self.min), 'max': float(self.max), 'mean': mean,
+                    'std': float(np.sqrt(max(self.total_sq / non_null - mean ** 2, 0.0))),
+                    'p25': float(p25), 'p50': float(p50), 'p75': float(p75)
+                })
+            else:
+                to_ts = lambda v: pd.Timestamp(int(v))
+                row.update({'min': to_ts(self.min), 'max': to_ts(self.max),
+                            'p25': to_ts(p25), 'p50': to_ts(p50), 'p75': to_ts(p75)})
+                edges = pd.to_datetime(edges.astype(np.int64))
+            histogram = {'counts': counts, 'edges': edges}
+
+        return row, histogram
+
+
+class DataProfiler:
+    """Single-pass column profiler for whole or chunked tables."""
+
+    KMV_SIZE = 4096
+    SAMPLE_SIZE = 200000
+
+    # Profiles are shared across instances and reused per dataset fingerprint
+    _profile_cache = FingerprintCache(max_entries=8)
+
+    def __init__(self, top_k=5, bins=20, seed=0):
+        """Initialize profiler."""
+        self.top_k = top_k
+        self.bins = bins
+        self.seed = seed
+
+    def profile(self, df):
+        """Profile a DataFrame (cached per dataset fingerprint)."""
+        if df is None:
+            return None
+        key = ('frame', dataset_fingerprint(df), self.top_k, self.bins, self.seed)
+        cached = self._profile_cache.get(key)
+        if cached is not None:
+            return cached
+        return self._profile_cache.put(key, self.profile_chunks([df]))
+
+    def profile_csv(self, path, chunksize=1000000, **read_kwargs):
+        """Profile a CSV file in chunks (cached per path, size and modification time)."""
+        stat = os.stat(path)
+        key = ('csv', os.path.abspath(path), stat.st_size, stat.st_mtime, chunksize, self.top_k, self.bins, self.seed)
+        cached = self._profile_cache.get(key)
+        if cached is not None:
+            return cached
+        chunks = pd.read_csv(path, chunksize=chunksize, **read_kwargs)
+        return self._profile_cache.put(key, self.profile_chunks(chunks))
+
+    def profile_chunks(self, chunks):
+        """Profile an iterable of DataFrame chunks sharing the same columns.
+
+        Returns {'rows', 'columns' (one row per column), 'histograms' {column: {'counts', 'edges'}}}.
+        """
+        try:
+            rng = np.random.default_rng(self.seed)
+            accumulators = {}
+            rows = 0
+            for chunk in chunks:
+                rows += len(chunk)
+                for col in chunk.columns:
+                    if col not in accumulators:
+                        accumulators[col] = _ColumnAccumulator(col, self.KMV_SIZE, self.SAMPLE_SIZE, self.top_k, rng)
+                    accumulators[col].update(chunk[col])
+
+            profile_rows = []
+            histograms = {}
+            for col, accumulator in accumulators.items():
+                row, histogram = accumulator.result(self.bins)
+                profile_rows.append(row)
+                if histogram is not None:
+                    histograms[col] = histogram
+
+            return {'rows': rows, 'columns': pd.DataFrame(profile_rows), 'histograms': histograms}
+
+        except Exception as e:
+            print(f"Error in DataProfiler.profile_chunks: {e}")
+            return {'rows': 0, 'columns': pd.DataFrame(), 'histograms': {}}
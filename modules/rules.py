@@ -0,0 +1,576 @@
+"""
+Rule Engine Module - UAE Pulse Simulator
+Runs the declarative cleaning rules in utils.CLEANING_RULES.
+
+The planner fuses every rule on the same column into one group, so each
+column is converted once: text rules (map, domain, boolean) run on the
+column's distinct values, value rules on a single coerced copy. Drops only
+clear bits of a per-table keep-mask; the cleaned table is built with one
+take at the end, so adding a rule never adds a full-table pass.
+
+Runs are split into a DAG of memoized stages per table:
+    clean:{table}  <- raw table fingerprint + the table's rules
+    keys:{table}   <- clean:{table} + clean of each referenced table
+    output:{table} <- the table's last stage
+so disabling or re-parameterizing one rule re-runs only the stages
+downstream of it (e.g. a sales rule never re-cleans products).
+"""
+
+import copy
+import hashlib
+import json
+
+import numpy as np
+import pandas as pd
+
+from .utils import CLEANING_RULES, classify_tokens, parse_dates_lenient, dataset_fingerprint, FingerprintCache
+from .keys import shared_vocabulary, key_positions
+
+
+TEXT_RULES = ('map', 'domain', 'boolean')
+
+# Lineage action and cleaner stat per rule type ('action_code' overrides the action)
+RULE_ACTIONS = {
+    'domain': 'DROPPED', 'datetime': 'DROPPED', 'year_range': 'DROPPED', 'foreign_key': 'DROPPED',
+    'boolean': 'DEFAULTED', 'fill': 'DEFAULTED', 'replace_negative': 'DEFAULTED',
+    'cap': 'CAPPED', 'impute_missing': 'IMPUTED', 'upper_bound': 'IMPUTED', 'dedup': 'DEDUPLICATED'
+}
+RULE_STATS = {
+    'domain': 'invalid_dropped', 'datetime': 'invalid_dropped', 'year_range': 'invalid_dropped',
+    'foreign_key': 'invalid_dropped', 'boolean': 'missing_values_fixed', 'fill': 'missing_values_fixed',
+    'impute_missing': 'missing_values_fixed', 'replace_negative': 'outliers_fixed', 'cap': 'outliers_fixed',
+    'upper_bound': 'outliers_fixed', 'dedup': 'duplicates_removed'
+}
+
+
+def rule_issue_types(rules=CLEANING_RULES):
+    """Issue types in declaration order (table rules, then foreign keys)."""
+    issue_types = []
+    declared = [rule for table in rules['tables'].values() for rule in table['rules']] + rules['foreign_keys']
+    for rule in declared:
+        for key in ('issue', 'fuzzy_issue'):
+            if key in rule and rule[key] not in issue_types:
+                issue_types.append(rule[key])
+    return issue_types
+
+
+def rule_id(table, rule):
+    """Stable id of a configured rule, e.g. 'sales:OUTLIER_QTY'."""
+    return f"{table}:{rule.get('issue') or rule.get('flag')}"
+
+
+def rule_catalog(rules=CLEANING_RULES):
+    """(rule id, table, rule) for every configured rule, foreign keys last."""
+    catalog = [(rule_id(table, rule), table, rule)
+               for table, config in rules['tables'].items() for rule in config['rules']]
+    catalog += [(rule_id(fk['table'], fk), fk['table'], dict(fk, type='foreign_key')) for fk in rules['foreign_keys']]
+    return catalog
+
+
+def configure_rules(rules=CLEANING_RULES, disabled=None, overrides=None):
+    """Copy of rules without the disabled rule ids and with {rule id: {param: value}} overrides applied."""
+    disabled = set(disabled or [])
+    overrides = overrides or {}
+
+    def configured(table, rule):
+        return dict(rule, **overrides.get(rule_id(table, rule), {}))
+
+    configured_rules = copy.deepcopy(rules)
+    for table, config in configured_rules['tables'].items():
+        config['rules'] = [configured(table, rule) for rule in config['rules'] if rule_id(table, rule) not in disabled]
+    configured_rules['foreign_keys'] = [configured(fk['table'], fk) for fk in configured_rules['foreign_keys']
+                                        if rule_id(fk['table'], fk) not in disabled]
+    return configured_rules
+
+
+def _digest(obj):
+    """Short digest of a JSON-serializable config, for stage keys."""
+    return hashlib.blake2b(json.dumps(obj, sort_keys=True, default=str).encode(), digest_size=16).hexdigest()
+
+
+def rule_fix_flags(rules=CLEANING_RULES):
+    """{fix flag: table} in declaration order."""
+    return {rule['flag']: table
+            for table, config in rules['tables'].items()
+            for rule in config['rules'] if 'flag' in rule}
+
+
+class RuleEngine:
+    """Plan and run the configured cleaning rules, logging through a DataCleaner."""
+
+    # Stage outputs are shared across instances and reused per stage key
+    _stage_cache = FingerprintCache(max_entries=32)
+    # Sort order and duplicates per dedup rule, keyed by the kept rows it saw
+    _dedup_cache = FingerprintCache(max_entries=8)
+
+    def __init__(self, cleaner, rules=None, disabled=None, overrides=None):
+        """Initialize engine; disabled rule ids are skipped, overrides replace rule parameters."""
+        self.cleaner = cleaner
+        self.rules = configure_rules(rules if rules is not None else CLEANING_RULES, disabled, overrides)
+
+    def plan(self, table):
+        """Steps for a table as (column, rules) groups; dedup rules run alone with column None.
+
+        A column's rules are fused into one group at the position of its first
+        rule. A dedup closes the open groups, so rules declared after it see
+        its drops.
+        """
+        steps = []
+        groups = {}
+        for rule in self.rules['tables'][table]['rules']:
+            if rule['type'] == 'dedup':
+                steps.append((None, [rule]))
+                groups = {}
+                continue
+            if rule['column'] not in groups:
+                groups[rule['column']] = (rule['column'], [])
+                steps.append(groups[rule['column']])
+            groups[rule['column']][1].append(rule)
+        return steps
+
+    def run(self, frames, apply=True, progress_callback=None):
+        """Clean {table: raw frame}; returns {table: cleaned frame}.
+
+        With apply=False only the issues, lineage and cleaning_report are
+        produced (cleaned frames are None). progress_callback(stage,
+        rows_processed, total_rows) is called before each step of a table's
+        plan, after each table and after each table's foreign key checks;
+        raising from it stops the run. Stages already computed for the same
+        inputs and rules are reused; inputs are keyed by a digest of every
+        row (dataset_fingerprint), so an edit anywhere in a table misses.
+        """
+        fk_tables = list(dict.fromkeys(fk['table'] for fk in self.rules['foreign_keys']))
+        total_rows = sum(len(df) for df in frames.values()) + sum(len(frames[t]) for t in fk_tables)
+        rows_processed = 0
+
+        def report(stage, rows):
+            nonlocal rows_processed
+            rows_processed += rows
+            if progress_callback is not None:
+                progress_callback(stage, rows_processed, total_rows)
+
+        def report_step(stage, rows):
+            """Progress within a table, without counting its rows as done."""
+            if progress_callback is not None:
+                progress_callback(stage, rows_processed + rows, total_rows)
+
+        report('Starting', 0)
+
+        mappings_key = _digest(self.cleaner.text_mappings)
+        keys = {}
+        states = {}
+        for table, df in frames.items():
+            keys[table] = ('clean', table, dataset_fingerprint(df), _digest(self.rules['tables'][table]), mappings_key)
+            states[table] = self._stage(keys[table], lambda: self._clean_table(table, df, keys[table][2], mappings_key,
+                                                                               report_step))
+            self._report_rows(states[table])
+            report(f'{table.capitalize()} cleaned', len(df))
+
+        # Foreign keys against the rows each referenced table keeps
+        fk_report = {fk['report_key']: 0 for fk in self.rules['foreign_keys'] if 'report_key' in fk}
+        if fk_report:
+            self.cleaner.cleaning_report['foreign_key_issues'] = fk_report
+        clean_keys = dict(keys)
+        for table in fk_tables:
+            fks = [fk for fk in self.rules['foreign_keys'] if fk['table'] == table]
+            keys[table] = ('keys', table, clean_keys[table], tuple(clean_keys[fk['ref_table']] for fk in fks), _digest(fks))
+            states[table] = self._stage(keys[table], lambda: self._check_keys(states[table], states, fks))
+            fk_report.update({k: v for k, v in states[table]['fk_counts'].items() if k in fk_report})
+            self._report_rows(states[table])
+            report(f'{table.capitalize()} keys validated', len(frames[table]))
+
+        if not apply:
+            return {table: None for table in states}
+        # Shallow copies: callers can add or change columns without touching the cache
+        return {table: self._stage(('output', keys[table]), lambda: self._materialize(state)).copy(deep=False)
+                for table, state in states.items()}
+
+    def _stage(self, key, compute):
+        """Memoized stage output; issues and stats logged by the stage are replayed on the cleaner."""
+        cached = self._stage_cache.get(key)
+        if cached is None:
+            cached = self._stage_cache.put(key, compute())
+        log = cached.get('log') if isinstance(cached, dict) else None
+        if log is not None:
+            self.cleaner.issues.extend(log.issues)
+            self.cleaner.lineage.extend(log.lineage)
+            for stat, value in log.stats.items():
+                self.cleaner.stats[stat] += value
+        return cached
+
+    def _new_log(self):
+        """Empty cleaner sharing this cleaner's text mappings, to collect one stage's issues."""
+        log = copy.copy(self.cleaner)
+        log._reset()
+        return log
+
+    def _clean_table(self, table, df, fingerprint, mappings_key, report_step=None):
+        """Stage: run a table's rules; returns its state.
+
+        report_step(stage, rows) is called before each plan step with the
+        table's rows prorated by the steps done, so long tables report
+        progress (and can be cancelled) while they are cleaned.
+        """
+        state = self._prepare(table, df)
+        state['inputs_key'] = (fingerprint, mappings_key)
+        steps = self.plan(table)
+        for i, (column, rules) in enumerate(steps):
+            if report_step is not None:
+                report_step(f"Cleaning {table}: {column or 'duplicates'}", len(df) * i // len(steps))
+            for rule in rules:
+                if column is None:
+                    self._dedup(state, rule)
+                elif column in state['names']:
+                    self._run_rule(state, state['names'][column], rule)
+        return state
+
+    def _check_keys(self, state, states, fks):
+        """Stage: foreign key checks on a copy of a cleaned table's state."""
+        state = dict(state, keep=state['keep'].copy(), log=self._new_log(), fk_counts={})
+        for fk in fks:
+            count = self._foreign_key(state, states[fk['ref_table']], fk)
+            if count is not None and 'report_key' in fk:
+                state['fk_counts'][fk['report_key']] = count
+        return state
+
+    # ------------------------------------------------------------------
+    # Table state
+    # ------------------------------------------------------------------
+
+    def _prepare(self, table, df):
+        """Normalized column names (no data copied), resolved rule columns and an all-kept mask."""
+        config = self.rules['tables'][table]
+        if not (isinstance(df.index, pd.RangeIndex) and df.index.start == 0 and df.index.step == 1):
+            df = df.reset_index(drop=True)
+        frame = df.set_axis(df.columns.str.strip().str.lower().str.replace(' ', '_'), axis=1)
+
+        for standard_name, variations in config.get('rename', {}).items():
+            for var in variations:
+                if var in frame.columns and standard_name not in frame.columns:
+                    frame = frame.rename(columns={var: standard_name})
+                    break
+
+        names = {col: col for col in frame.columns}
+        for name, candidates in config.get('columns', {}).items():
+            found = [col for col in candidates if col in frame.columns]
+            if found:
+                names[name] = found[0]
+
+        state = {
+            'table': table,
+            'frame': frame,
+            'names': names,
+            'keep': np.ones(len(frame), dtype=bool),
+            'order': None,
+            'flags': np.zeros(len(frame), dtype=np.uint32),
+            'columns': {},
+            'original_rows': len(frame),
+            'log': self._new_log()
+        }
+        for col in config.get('strip', []) + config.get('numeric', []):
+            if col in frame.columns:
+                self._column(state, col, text=col in config.get('strip', []))
+        return state
+
+    def _column(self, state, col, text=False):
+        """Working copy of a column, created on first use.
+
+        Text columns are held as factorize codes plus a Series of distinct
+        values; other columns as one Series that rules update in place.
+        """
+        if col in state['columns']:
+            return state['columns'][col]
+
+        config = self.rules['tables'][state['table']]
+        series = state['frame'][col]
+        if col in config.get('numeric', []):
+            series = pd.to_numeric(series, errors='coerce')
+        if text:
+            codes, uniques = pd.factorize(series, use_na_sentinel=False)
+            uniques = pd.Series(uniques, dtype=series.dtype)
+            if col in config.get('strip', []):
+                uniques = uniques.astype(str).str.strip()
+            column = {'codes': codes, 'uniques': uniques}
+        else:
+            # Rules write into this Series with .loc; the explicit copy keeps
+            # those writes off the caller's frame (free under copy-on-write)
+            column = {'values': series.copy()}
+        state['columns'][col] = column
+        return column
+
+    def _values(self, state, col):
+        """Current values of a column as a full-length Series."""
+        column = state['columns'].get(col)
+        if column is None:
+            return state['frame'][col]
+        if 'values' in column:
+            return column['values']
+        return pd.Series(column['uniques'].take(column['codes']).array)
+
+    def _take(self, state, col, positions):
+        """Current values of a column at row positions."""
+        column = state['columns'].get(col)
+        if column is None:
+            return state['frame'][col].take(positions).array
+        if 'values' in column:
+            return column['values'].take(positions).array
+        return column['uniques'].take(column['codes'][positions]).array
+
+    def _isin(self, state, col, values):
+        """Row mask of a column's current values found in values."""
+        column = state['columns'].get(col)
+        if column is not None and 'codes' in column:
+            return column['uniques'].isin(values).to_numpy()[column['codes']]
+        return self._values(state, col).isin(values).to_numpy()
+
+    def _positions(self, state):
+        """Kept row positions in the table's current row order."""
+        if state['order'] is None:
+            return np.flatnonzero(state['keep'])
+        return state['order'][state['keep'][state['order']]]
+
+    def _rows(self, state, mask):
+        """Positions of the rows in mask, in the table's current row order."""
+        if state['order'] is None:
+            return np.flatnonzero(mask)
+        return state['order'][mask[state['order']]]
+
+    def _kept_counts(self, column, keep):
+        """Kept rows per distinct value of a text column."""
+        return np.bincount(column['codes'][keep], minlength=len(column['uniques']))
+
+    def _report_rows(self, state):
+        """Original, final and dropped row counts for the cleaning report."""
+        final_rows = int(state['keep'].sum())
+        self.cleaner.cleaning_report[state['table']] = {
+            'original_rows': state['original_rows'],
+            'final_rows': final_rows,
+            'dropped_rows': state['original_rows'] - final_rows
+        }
+
+    def _log(self, state, rule, mask, value=None):
+        """Log a rule's affected rows, count them in the stats and set its fix flag."""
+        rows = self._rows(state, mask)
+        count = len(rows)
+        state['log']._log_issue(state['table'], f'{count} rows', rule['issue'],
+                                rule['detail'].format(count=count, value=value),
+                                rule['action'].format(count=count, value=value),
+                                rows=rows, action=rule.get('action_code', RULE_ACTIONS[rule['type']]))
+        state['log'].stats[RULE_STATS[rule['type']]] += count
+        if 'flag' in rule:
+            state['flags'][mask] |= np.uint32(self.cleaner.FIX_FLAGS[rule['flag']])
+        if RULE_ACTIONS[rule['type']] in ('DROPPED', 'DEDUPLICATED'):
+            state['keep'] &= ~mask
+
+    def _materialize(self, state):
+        """Cleaned table: one take of the kept rows, with the updated columns swapped in."""
+        frame = state['frame']
+        positions = self._positions(state)
+        updated = [col for col in frame.columns if col in state['columns']]
+
+        df = frame.drop(columns=updated).take(positions)
+        for col in updated:
+            df.insert(frame.columns.get_loc(col), col, self._take(state, col, positions))
+        df[self.cleaner.FIX_FLAG_COLUMN] = state['flags'][positions]
+        return df
+
+    # ------------------------------------------------------------------
+    # Rules
+    # ------------------------------------------------------------------
+
+    def _run_rule(self, state, col, rule):
+        """Apply one column rule against the rows kept so far."""
+        rule_type = rule['type']
+        column = self._column(state, col, text=rule_type in TEXT_RULES)
+        keep = state['keep']
+
+        if rule_type == 'map':
+            self._map(state, col, column, rule)
+
+        elif rule_type == 'domain':
+            self._domain(state, col, rule)
+
+        elif rule_type == 'boolean':
+            uniques = column['uniques']
+            labels, matched, missing = classify_tokens(uniques, {True: rule['true'], False: rule['false']},
+                                                       rule.get('missing', ()))
+            invalid = ~matched & ~missing
+            column['uniques'] = pd.Series(np.where(matched, labels, False).astype(bool), index=uniques.index)
+            mask = invalid[column['codes']] & keep
+            if mask.any():
+                self._log(state, rule, mask)
+
+        else:
+            values = column['values']
+
+            if rule_type == 'datetime':
+                if not pd.api.types.is_datetime64_any_dtype(values):
+                    values = column['values'] = parse_dates_lenient(values)
+                mask = values.isna().to_numpy() & keep
+                if mask.any():
+                    self._log(state, rule, mask)
+
+            elif rule_type == 'year_range':
+                years = values.dt.year.to_numpy(dtype=float)
+                mask = ((years < rule['min_year']) | (years > rule['max_year'])) & keep
+                if mask.any():
+                    self._log(state, rule, mask)
+
+            elif rule_type == 'fill':
+                mask = values.isna().to_numpy() & keep
+                if mask.any():
+                    column['values'] = values.fillna(rule['value'])
+                    self._log(state, rule, mask)
+
+            elif rule_type == 'replace_negative':
+                mask = (values < 0).to_numpy(dtype=bool) & keep
+                if mask.any():
+                    value = values[keep].median() if rule['value'] == 'median' else rule['value']
+                    values.loc[mask] = value
+                    self._log(state, rule, mask)
+
+            elif rule_type == 'cap':
+                threshold = values[keep].quantile(rule['quantile'])
+                mask = (values > threshold * rule['threshold']).to_numpy(dtype=bool) & keep
+                if mask.any():
+                    cap_value = threshold * rule['cap']
+                    values.loc[mask] = cap_value
+                    self._log(state, rule, mask, cap_value)
+
+            elif rule_type == 'impute_missing':
+                mask = values.isna().to_numpy() & keep
+                if mask.any():
+                    source = state['names'].get(rule.get('source'))
+                    if source is not None:
+                        values.loc[mask] = self._values(state, source)[mask] * rule['ratio']
+                    else:
+                        column['values'] = values.fillna(values[keep].median())
+                    self._log(state, rule, mask)
+
+            elif rule_type == 'upper_bound':
+                bound = state['names'].get(rule['bound'])
+                if bound is not None:
+                    bound_values = self._values(state, bound)
+                    mask = (values > bound_values).to_numpy(dtype=bool) & keep
+                    if mask.any():
+                        values.loc[mask] = bound_values[mask] * rule['ratio']
+                        self._log(state, rule, mask)
+
+            else:
+                raise ValueError(f"Unknown cleaning rule type: {rule_type}")
+
+    def _map(self, state, col, column, rule):
+        """Map distinct text values; standardized rows get the rule's fix flag."""
+        before = column['uniques']
+        if 'text_mappings' in rule:
+            mappings = self.cleaner.text_mappings.get(rule['text_mappings'], {})
+            # One lookup per distinct value gives both the mapped value and its confidence
+            results = [self.cleaner._lookup_text_value(x, mappings, rule['field'], rule.get('fuzzy')) for x in before]
+            after = pd.Series([mapped for mapped, _ in results], index=before.index, dtype=before.dtype)
+            confidence = np.array([conf for _, conf in results], dtype=float)
+            standardized = ~np.isnan(confidence)
+            if standardized.any():
+                kept = self._kept_counts(column, state['keep'])
+                state['log'].stats['text_standardized'] += int(kept[standardized].sum())
+            if 'fuzzy_issue' in rule:
+                self._log_fuzzy(state, col, column, rule, before, after, confidence)
+        else:
+            labels, matched, _ = classify_tokens(before, rule['tokens'])
+            text = before.map(lambda x: str(x).strip(), na_action='ignore')
+            if rule.get('fallback') == 'title':
+                text = text.map(str.title, na_action='ignore')
+            after = text.mask(matched, pd.Series(labels, index=before.index))
+            if 'missing' in rule:
+                after = after.mask(before.isna().to_numpy(), rule['missing'])
+
+        column['uniques'] = after
+        if 'flag' in rule:
+            changed = before.notna().to_numpy() & (after != before).to_numpy(dtype=bool)
+            if changed.any():
+                mask = changed[column['codes']] & state['keep']
+                state['flags'][mask] |= np.uint32(self.cleaner.FIX_FLAGS[rule['flag']])
+
+    def _log_fuzzy(self, state, col, column, rule, before, after, confidence):
+        """Log each fuzzy-matched value with its confidence and kept rows."""
+        fuzzy = confidence < 1.0
+        if not fuzzy.any():
+            return
+        rows = self._rows(state, fuzzy[column['codes']] & state['keep'])
+        row_codes = column['codes'][rows]
+        for code in np.flatnonzero(fuzzy):
+            matched_rows = rows[row_codes == code]
+            if len(matched_rows) > 0:
+                state['log']._log_issue(state['table'], f'{col}={before[code]}', rule['fuzzy_issue'],
+                                        f"'{before[code]}' matched '{after[code]}' (confidence {confidence[code]:.2f})",
+                                        f'Standardized {len(matched_rows)} rows', rows=matched_rows, action='STANDARDIZED')
+
+    def _domain(self, state, col, rule):
+        """Drop rows whose value is not in rule['valid'], logging each bad value with its rows."""
+        invalid_mask = ~self._isin(state, col, rule['valid']) & state['keep']
+        if not invalid_mask.any():
+            return
+
+        invalid_rows = self._rows(state, invalid_mask)
+        codes, invalid_values = pd.factorize(pd.Series(self._take(state, col, invalid_rows)), use_na_sentinel=False)
+        for code, val in enumerate(invalid_values):
+            rows = invalid_rows[codes == code]
+            state['log']._log_issue(state['table'], f'{col}={val}', rule['issue'],
+                                    f"{rule['label']} '{val}' not in {rule['valid']}",
+                                    f'Dropped {len(rows)} rows', rows=rows, action='DROPPED')
+        state['log'].stats['invalid_dropped'] += len(invalid_rows)
+        state['keep'] &= ~invalid_mask
+
+    def _dedup(self, state, rule):
+        """Drop duplicate keys among the kept rows, optionally sorting the table first."""
+        cols = [state['names'][col] for col in rule['columns'] if col in state['names']]
+        if len(cols) < rule.get('min_columns', len(rule['columns'])):
+            return
+
+        # Only the kept rows and the rules on the key/sort columns can change the
+        # result, so toggling e.g. a cap rule reuses the sort and duplicate scan
+        config = self.rules['tables'][state['table']]
+        touched = set(rule['columns']) | {rule.get('sort_by')}
+        key = (state['table'], state['inputs_key'], _digest(rule),
+               _digest([r for r in config['rules'] if r.get('column') in touched]),
+               _digest([col for col in config.get('strip', []) + config.get('numeric', []) if col in touched]),
+               hashlib.blake2b(np.packbits(state['keep']).tobytes(), digest_size=16).hexdigest(),
+               None if state['order'] is None else hashlib.blake2b(state['order'].tobytes(), digest_size=16).hexdigest())
+        cached = self._dedup_cache.get(key)
+        if cached is None:
+            positions = self._positions(state)
+            sort_col = state['names'].get(rule.get('sort_by'))
+            if sort_col is not None:
+                sorted_index = pd.Series(self._take(state, sort_col, positions)).sort_values(
+                    ascending=rule.get('ascending', True)).index.to_numpy()
+                positions = positions[sorted_index]
+
+            keys = pd.DataFrame({i: self._take(state, col, positions) for i, col in enumerate(cols)})
+            duplicated = keys.duplicated(keep=rule['keep']).to_numpy()
+            cached = self._dedup_cache.put(key, (positions if sort_col is not None else None, positions[duplicated]))
+
+        order, duplicate_rows = cached
+        if order is not None:
+            state['order'] = order
+        if len(duplicate_rows) > 0:
+            mask = np.zeros(len(state['keep']), dtype=bool)
+            mask[duplicate_rows] = True
+            self._log(state, rule, mask)
+
+    def _foreign_key(self, state, ref_state, fk):
+        """Drop rows whose key is missing from the referenced table's kept rows; returns the count."""
+        col = state['names'].get(fk['column'])
+        ref_col = ref_state['names'].get(fk['ref_column'])
+        if col is None or ref_col is None:
+            return None
+
+        ref_keys = self._take(ref_state, ref_col, self._positions(ref_state))
+        keys = self._values(state, col)
+        if shared_vocabulary(keys, ref_keys):
+            # Interned keys: a mask lookup by code
+            found = key_positions(keys, ref_keys) >= 0
+        else:
+            found = self._isin(state, col, pd.unique(pd.Series(ref_keys)))
+        mask = ~found & state['keep']
+        if mask.any():
+            self._log(state, dict(fk, type='foreign_key'), mask)
+        return int(mask.sum())
@@ -0,0 +1,77 @@
+"""
+Schema Binding Module - UAE Pulse Simulator
+Binds a DataFrame's columns to the canonical column roles of
+utils.COLUMN_SCHEMA (sku, qty, selling_price_aed, ...).
+
+A binding depends only on the column names, so it is resolved once per
+column set and memoized; modules ask for bind(df)['qty'] instead of probing
+alias lists on every call.
+"""
+
+import threading
+from collections import OrderedDict
+
+from .utils import COLUMN_SCHEMA, column_aliases
+
+
+def _role_aliases(table=None):
+    """{role: aliases} for one table, or merged across tables in table order."""
+    tables = [table] if table else list(COLUMN_SCHEMA)
+    merged = {}
+    for name in tables:
+        for role in COLUMN_SCHEMA[name]:
+            aliases = merged.setdefault(role, [])
+            aliases += [alias for alias in column_aliases(name, role) if alias not in aliases]
+    return merged
+
+
+_ROLE_ALIASES = {table: _role_aliases(table) for table in [None] + list(COLUMN_SCHEMA)}
+
+_MAX_BINDINGS = 256
+_bindings = OrderedDict()
+_bindings_lock = threading.Lock()
+
+
+def normalize_column(name):
+    """Column name as aliases are written: stripped, lowercased, spaces as underscores."""
+    return str(name).strip().lower().replace(' ', '_')
+
+
+def _bind_columns(columns, table):
+    """{role: column} for a column set; an exact alias beats a normalized match."""
+    present = set(columns)
+    normalized = {}
+    for col in columns:
+        normalized.setdefault(normalize_column(col), col)
+
+    binding = {}
+    for role, aliases in _ROLE_ALIASES[table].items():
+        for alias in aliases:
+            col = alias if alias in present else normalized.get(alias)
+            if col is not None:
+                binding[role] = col
+                break
+    return binding
+
+
+def bind(df, table=None):
+    """Column of each canonical role found in a frame, as {role: column name}.
+
+    With table, only that table's roles and aliases are used; otherwise the
+    roles of all tables (ambiguous aliases such as 'date' may then bind to
+    more than one role, so ask for the role the frame is expected to have).
+    Memoized per column set; treat the result as read-only.
+    """
+    key = (table, tuple(df.columns))
+    with _bindings_lock:
+        binding = _bindings.get(key)
+        if binding is not None:
+            _bindings.move_to_end(key)
+            return binding
+
+    binding = _bind_columns(key[1], table)
+    with _bindings_lock:
+        _bindings[key] = binding
+        if len(_bindings) > _MAX_BINDINGS:
+            _bindings.popitem(last=False)
+    return binding
@@ -7,68 +7,68 @@ Campaign simulation and KPI calculations
 import pandas as pd
 import numpy as np
 
+from .inventory import InventoryEngine
+from .elasticity import ElasticityEstimator
+from .utils import SIMULATOR_CONFIG, dataset_fingerprint, FingerprintCache
+from .schema import bind
+from .keys import is_interned, key_codes, key_positions, DimensionLookup
+
 
 class Simulator:
     """Campaign simulator with KPI calculations."""
     
-    def __init__(self):
-        """Initialize simulator with default elasticity values."""
-        self.category_elasticity = {
-            'Electronics': 1.8,
-            'Fashion': 2.0,
-            'Grocery': 1.2,
-            'Beauty': 1.6,
-            'Home': 1.4,
-            'Sports': 1.7
-        }
-        self.default_elasticity = 1.5
+    # Segment baselines are shared across instances and reused per dataset fingerprint
+    _baseline_cache = FingerprintCache(max_entries=32)
     
-    def _find_column(self, df, possible_names):
-        """Find a column from a list of possible names."""
-        for name in possible_names:
-            if name in df.columns:
-                return name
-        return None
+    def __init__(self, use_fitted_elasticity=False):
+        """Initialize simulator with default elasticity values.
+        
+        With use_fitted_elasticity, campaigns use elasticities fitted from the
+        sales history (shrunk towards the defaults) instead of the defaults.
+        """
+        self.category_elasticity = dict(SIMULATOR_CONFIG['category_elasticity'])
+        self.default_elasticity = SIMULATOR_CONFIG['default_elasticity']
+        self.use_fitted_elasticity = use_fitted_elasticity
     
     def _get_sku_column(self, df):
         """Find SKU column."""
-        return self._find_column(df, ['sku', 'SKU', 'product_id', 'ProductID', 'product_sku', 'item_id'])
+        return bind(df).get('sku')
     
     def _get_cost_column(self, df):
         """Find cost column."""
-        return self._find_column(df, ['unit_cost_aed', 'cost_aed', 'cost', 'unit_cost', 'cost_price', 'purchase_price', 'buying_price'])
+        return bind(df).get('unit_cost_aed')
     
     def _get_price_column(self, df):
         """Find selling price column."""
-        return self._find_column(df, ['selling_price_aed', 'selling_price', 'price', 'unit_price', 'sale_price'])
+        return bind(df).get('selling_price_aed')
     
     def _get_qty_column(self, df):
         """Find quantity column."""
-        return self._find_column(df, ['qty', 'quantity', 'units', 'qty_sold', 'units_sold'])
+        return bind(df).get('qty')
     
     def _get_date_column(self, df):
         """Find date column."""
-        return self._find_column(df, ['order_ts', 'order_date', 'date', 'timestamp', 'created_at', 'sale_date', 'transaction_date'])
+        return bind(df).get('order_time')
     
     def _get_order_column(self, df):
         """Find order ID column."""
-        return self._find_column(df, ['order_id', 'OrderID', 'transaction_id', 'invoice_id'])
+        return bind(df).get('order_id')
     
     def _get_store_column(self, df):
         """Find store ID column."""
-        return self._find_column(df, ['store_id', 'StoreID', 'store', 'location_id'])
+        return bind(df).get('store_id')
     
     def _get_category_column(self, df):
         """Find category column."""
-        return self._find_column(df, ['category', 'Category', 'product_category', 'cat'])
+        return bind(df).get('category')
     
     def _get_city_column(self, df):
         """Find city column."""
-        return self._find_column(df, ['city', 'City', 'location', 'store_city'])
+        return bind(df).get('city')
     
     def _get_channel_column(self, df):
         """Find channel column."""
-        return self._find_column(df, ['channel', 'Channel', 'sales_channel', 'store_channel'])
+        return bind(df).get('channel')
     
     def calculate_overall_kpis(self, sales_df, products_df):
         """Calculate overall KPIs from sales data."""
@@ -83,15 +83,13 @@ class Simulator:
             qty_col = self._get_qty_column(sales_df)
             order_col = self._get_order_column(sales_df)
             
-            # Create working copy
-            merged = sales_df.copy()
+            # Working copy (shallow: only new columns are added)
+            merged = sales_df.copy(deep=False)
             
-            # Merge with products if possible
+            # Product cost per sales row
             if sku_col_sales and sku_col_products and cost_col:
-                products_subset = products_df[[sku_col_products, cost_col]].copy()
-                products_subset.columns = ['_sku', '_cost']
-                merged['_sku'] = merged[sku_col_sales]
-                merged = merged.merge(products_subset, on='_sku', how='left')
+                products = DimensionLookup(products_df, sku_col_products)
+                merged['_cost'] = products.gather(sales_df[sku_col_sales], {'_cost': cost_col})['_cost']
                 merged['_cost'] = merged['_cost'].fillna(0)
             else:
                 merged['_cost'] = 0
@@ -126,7 +124,7 @@ class Simulator:
             kpis['profit_margin_pct'] = (kpis['total_profit'] / kpis['total_revenue'] * 100) if kpis['total_revenue'] > 0 else 0
             
             # Return rate
-            return_col = self._find_column(sales_df, ['return_flag', 'is_returned', 'returned', 'is_return'])
+            return_col = bind(sales_df).get('return_flag')
             if return_col:
                 returned = pd.to_numeric(sales_df[return_col], errors='coerce').fillna(0)
                 kpis['return_rate_pct'] = float(returned.mean() * 100)
@@ -147,7 +145,7 @@ class Simulator:
             kpis['net_revenue'] = kpis['total_revenue'] - kpis['refund_amount']
             
             # Discount calculations
-            discount_col = self._find_column(merged, ['discount_pct', 'discount', 'discount_percent'])
+            discount_col = bind(merged).get('discount_pct')
             if discount_col and discount_col in merged.columns:
                 merged['_discount_pct'] = pd.to_numeric(merged[discount_col], errors='coerce').fillna(0)
                 kpis['avg_discount_pct'] = float(merged['_discount_pct'].mean())
@@ -174,7 +172,7 @@ class Simulator:
     def calculate_kpis_by_dimension(self, sales_df, stores_df, products_df, dimension):
         """Calculate KPIs grouped by a dimension (city, channel, category)."""
         try:
-            merged = sales_df.copy()
+            merged = sales_df.copy(deep=False)
             
             # Find columns
             sku_col_sales = self._get_sku_column(sales_df)
@@ -189,42 +187,19 @@ class Simulator:
             city_col = self._get_city_column(stores_df)
             channel_col = self._get_channel_column(stores_df)
             
-            # Merge with stores
+            # Store attributes per sales row
             if store_col_sales and store_col_stores:
-                stores_cols = [store_col_stores]
-                if city_col:
-                    stores_cols.append(city_col)
-                if channel_col:
-                    stores_cols.append(channel_col)
-                
-                stores_subset = stores_df[stores_cols].copy()
-                stores_subset.columns = ['_store'] + [f'_{c}' for c in stores_cols[1:]]
-                merged['_store'] = merged[store_col_sales]
-                merged = merged.merge(stores_subset, on='_store', how='left')
-                
-                if city_col:
-                    merged['city'] = merged[f'_{city_col}']
-                if channel_col:
-                    merged['channel'] = merged[f'_{channel_col}']
+                stores = DimensionLookup(stores_df, store_col_stores)
+                attributes = {name: col for name, col in [('city', city_col), ('channel', channel_col)] if col}
+                for name, values in stores.gather(sales_df[store_col_sales], attributes).items():
+                    merged[name] = values
             
-            # Merge with products
+            # Product attributes per sales row
             if sku_col_sales and sku_col_products:
-                products_cols = [sku_col_products]
-                if cost_col:
-                    products_cols.append(cost_col)
-                if category_col:
-                    products_cols.append(category_col)
-                
-                products_subset = products_df[products_cols].copy()
-                new_cols = ['_sku']
-                if cost_col:
-                    new_cols.append('_cost')
-                if category_col:
-                    new_cols.append('category')
-                products_subset.columns = new_cols
-                
-                merged['_sku'] = merged[sku_col_sales]
-                merged = merged.merge(products_subset, on='_sku', how='left')
+                products = DimensionLookup(products_df, sku_col_products)
+                attributes = {name: col for name, col in [('_cost', cost_col), ('category', category_col)] if col}
+                for name, values in products.gather(sales_df[sku_col_sales], attributes).items():
+                    merged[name] = values
             
             # Set defaults
             if '_cost' not in merged.columns:
@@ -280,7 +255,7 @@ class Simulator:
     def calculate_daily_trends(self, sales_df, products_df):
         """Calculate daily performance trends."""
         try:
-            merged = sales_df.copy()
+            merged = sales_df.copy(deep=False)
             
             # Find columns
             sku_col_sales = self._get_sku_column(sales_df)
@@ -291,12 +266,10 @@ class Simulator:
             date_col = self._get_date_column(sales_df)
             order_col = self._get_order_column(sales_df)
             
-            # Merge with products for cost
+            # Product cost per sales row
             if sku_col_sales and sku_col_products and cost_col:
-                products_subset = products_df[[sku_col_products, cost_col]].copy()
-                products_subset.columns = ['_sku', '_cost']
-                merged['_sku'] = merged[sku_col_sales]
-                merged = merged.merge(products_subset, on='_sku', how='left')
+                products = DimensionLookup(products_df, sku_col_products)
+                merged['_cost'] = products.gather(sales_df[sku_col_sales], {'_cost': cost_col})['_cost']
                 merged['_cost'] = merged['_cost'].fillna(0)
             else:
                 merged['_cost'] = 0
@@ -317,48 +290,52 @@ class Simulator:
             merged['revenue'] = merged['_qty'] * merged['_price']
             merged['profit'] = merged['_qty'] * (merged['_price'] - merged['_cost'])
             
-            # Parse date
-            if date_col:
-                merged['date'] = pd.to_datetime(merged[date_col], errors='coerce').dt.date
-            else:
-                # No date column found - create dummy dates
-                merged['date'] = pd.date_range(end=pd.Timestamp.today(), periods=len(merged), freq='h').date
-            
-            merged = merged.dropna(subset=['date'])
-            
-            if len(merged) == 0:
-                return pd.DataFrame(columns=['date', 'revenue', 'profit', 'orders', 'units'])
-            
-            # Group by date
-            daily = merged.groupby('date').agg({
-                'revenue': 'sum',
-                'profit': 'sum',
-                '_qty': 'sum'
-            }).reset_index()
-            
-            # Count orders
-            if order_col:
-                orders_per_day = merged.groupby('date')[order_col].nunique().reset_index()
-                orders_per_day.columns = ['date', 'orders']
-                daily = daily.merge(orders_per_day, on='date', how='left')
-                daily.columns = ['date', 'revenue', 'profit', 'units', 'orders']
-            else:
-                daily['orders'] = daily['_qty']
-                daily.columns = ['date', 'revenue', 'profit', 'units', 'orders']
-            
-            daily = daily.sort_values('date')
-            
-            return daily
+            return self._aggregate_daily(merged, date_col, order_col)
             
         except Exception as e:
             print(f"Error in calculate_daily_trends: {e}")
             return pd.DataFrame(columns=['date', 'revenue', 'profit', 'orders', 'units'])
     
+    def _aggregate_daily(self, merged, date_col, order_col):
+        """Aggregate a prepared frame (revenue, profit, _qty) into a daily series."""
+        # Parse date
+        if date_col:
+            merged['date'] = pd.to_datetime(merged[date_col], errors='coerce').dt.date
+        else:
+            # No date column found - create dummy dates
+            merged['date'] = pd.date_range(end=pd.Timestamp.today(), periods=len(merged), freq='h').date
+        
+        merged = merged.dropna(subset=['date'])
+        
+        if len(merged) == 0:
+            return pd.DataFrame(columns=['date', 'revenue', 'profit', 'orders', 'units'])
+        
+        # Group by date
+        daily = merged.groupby('date').agg({
+            'revenue': 'sum',
+            'profit': 'sum',
+            '_qty': 'sum'
+        }).reset_index()
+        
+        # Count orders
+        if order_col:
+            orders_per_day = merged.groupby('date')[order_col].nunique().reset_index()
+            orders_per_day.columns = ['date', 'orders']
+            daily = daily.merge(orders_per_day, on='date', how='left')
+            daily.columns = ['date', 'revenue', 'profit', 'units', 'orders']
+        else:
+            daily['orders'] = daily['_qty']
+            daily.columns = ['date', 'revenue', 'profit', 'units', 'orders']
+        
+        daily = daily.sort_values('date')
+        
+        return daily
+    
     def calculate_stockout_risk(self, inventory_df):
         """Calculate stockout risk metrics."""
         try:
-            stock_col = self._find_column(inventory_df, ['stock_on_hand', 'stock', 'quantity', 'qty', 'inventory'])
-            reorder_col = self._find_column(inventory_df, ['reorder_point', 'reorder_level', 'min_stock'])
+            stock_col = bind(inventory_df).get('stock_on_hand')
+            reorder_col = bind(inventory_df).get('reorder_point')
             
             if stock_col:
                 inventory_df['_stock'] = pd.to_numeric(inventory_df[stock_col], errors='coerce').fillna(0)
@@ -389,127 +366,396 @@ class Simulator:
                 'stockout_risk_pct': 0
             }
     
+    def _campaign_economics(self, baseline_units, baseline_orders, baseline_profit, avg_price, avg_cost,
+                            discount_pct, elasticity, promo_budget, lost_units=None):
+        """Closed-form campaign math. Every argument may be a scalar or a NumPy array.
+        
+        lost_units is demand that inventory cannot fulfil; it is removed from
+        expected units (and orders pro rata) before revenue and costs.
+        """
+        discount_pct = np.asarray(discount_pct, dtype=float)
+        demand_lift_pct = discount_pct * elasticity
+        demand_units = baseline_units * (1 + demand_lift_pct / 100)
+        expected_units = demand_units if lost_units is None else np.maximum(demand_units - lost_units, 0)
+        
+        discounted_price = avg_price * (1 - discount_pct / 100)
+        expected_revenue = expected_units * discounted_price
+        
+        promo_cost = np.minimum(promo_budget, expected_revenue * 0.1)
+        fulfillment_cost = expected_units * 2
+        cogs = expected_units * avg_cost
+        
+        expected_gross_profit = expected_revenue - cogs
+        expected_net_profit = expected_gross_profit - promo_cost - fulfillment_cost
+        total_investment = promo_cost + fulfillment_cost
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            expected_margin_pct = np.where(expected_revenue > 0, expected_net_profit / expected_revenue * 100, 0.0)
+            roi_pct = np.where(total_investment > 0, (expected_net_profit - baseline_profit) / total_investment * 100, 0.0)
+            fill_ratio = np.where(demand_units > 0, expected_units / demand_units, 1.0)
+        
+        return {
+            'expected_revenue': expected_revenue,
+            'expected_orders': baseline_orders * (1 + demand_lift_pct / 100) * fill_ratio,
+            'expected_units': expected_units,
+            'expected_net_profit': expected_net_profit,
+            'expected_margin_pct': expected_margin_pct,
+            'demand_lift_pct': demand_lift_pct,
+            'roi_pct': roi_pct,
+            'promo_cost': promo_cost,
+            'fulfillment_cost': fulfillment_cost
+        }
+    
+    def _campaign_pairs(self, pair_totals, period_scale):
+        """Baseline campaign-period units and average price per SKU x store pair in a segment."""
+        if pair_totals is None or len(pair_totals) == 0:
+            return None
+        
+        pairs = pair_totals[['_sku', '_store']].reset_index(drop=True)
+        units = pair_totals['_units'].to_numpy(dtype=float)
+        revenue = pair_totals['_revenue'].to_numpy(dtype=float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            pairs['avg_price'] = np.where(units > 0, revenue / units, 0.0)
+        pairs['baseline_units'] = units * period_scale
+        return pairs
+    
+    def check_inventory_feasibility(self, pair_totals, inventory_df, period_scale, discount_pct, demand_multiplier):
+        """Allocate lifted demand across targeted SKU x store pairs and cap it at stock.
+        
+        pair_totals holds observed _units and _revenue per _sku x _store (see segment_pairs).
+        demand_multiplier may be an array (one entry per scenario) for batch runs;
+        per-pair stockouts are only reported for scalar runs.
+        """
+        pairs = self._campaign_pairs(pair_totals, period_scale)
+        if pairs is None or len(pairs) == 0:
+            return None
+        
+        engine = InventoryEngine()
+        stock = engine.latest_stock(inventory_df)
+        pairs = pairs.merge(stock, on=['_sku', '_store'], how='left')
+        
+        unit_price = np.multiply.outer(1 - np.asarray(discount_pct, dtype=float) / 100, pairs['avg_price'].to_numpy())
+        allocation = engine.allocate_campaign_demand(
+            pairs['baseline_units'].to_numpy(), pairs['stock_on_hand'].to_numpy(), unit_price, demand_multiplier
+        )
+        
+        result = {
+            'demand_units': allocation['demand_units'],
+            'fulfilled_units': allocation['fulfilled_units'],
+            'lost_units': allocation['lost_units'],
+            'revenue_at_risk': allocation['revenue_at_risk'],
+            'stockout_pairs': allocation['stockout_pairs'],
+            'untracked_pairs': int(pairs['stock_on_hand'].isna().sum()),
+            'stockouts': None
+        }
+        
+        if np.ndim(demand_multiplier) == 0:
+            lost = allocation['lost_by_pair']
+            stockouts = pairs.assign(
+                campaign_demand=pairs['baseline_units'].to_numpy() * float(demand_multiplier),
+                lost_units=lost
+            )
+            stockouts = stockouts[stockouts['lost_units'] > 0].sort_values('lost_units', ascending=False)
+            stockouts = stockouts.rename(columns={'_sku': 'sku', '_store': 'store_id'})
+            result['stockouts'] = stockouts[['sku', 'store_id', 'stock_on_hand', 'campaign_demand', 'lost_units']].reset_index(drop=True)
+            for key in ['demand_units', 'fulfilled_units', 'lost_units', 'revenue_at_risk']:
+                result[key] = float(result[key])
+            result['stockout_pairs'] = int(result['stockout_pairs'])
+            result['fill_rate_pct'] = (result['fulfilled_units'] / result['demand_units'] * 100) if result['demand_units'] > 0 else 100.0
+        
+        return result
+    
+    def _baseline_profile(self, daily):
+        """Per-day and per-weekday baseline rates from a segment's daily table.
+        
+        Everything downstream works on these few arrays, so campaign baselines
+        for any length or start date cost O(7) rather than a pass over sales.
+        The daily table itself is kept under 'daily' for bootstrapping.
+        """
+        values = daily[['revenue', 'profit', 'orders', 'units']].to_numpy(dtype=float)
+        weekdays = pd.DatetimeIndex(daily.index).dayofweek.to_numpy()
+        weekday_counts = np.bincount(weekdays, minlength=7)
+        weekday_sums = np.stack([np.bincount(weekdays, weights=values[:, i], minlength=7) for i in range(values.shape[1])], axis=1)
+        per_day = values.mean(axis=0)
+        # Weekdays never observed fall back to the overall daily rate
+        per_weekday = np.where(weekday_counts[:, None] > 0, weekday_sums / np.maximum(weekday_counts, 1)[:, None], per_day)
+        
+        return {
+            'window_days': len(daily),
+            'last_date': daily.index[-1],
+            'per_day': per_day,
+            'per_weekday': per_weekday,
+            'daily': daily
+        }
+    
+    def _campaign_baseline(self, profile, campaign_days, seasonality=False, campaign_start=None):
+        """Baseline (revenue, profit, orders, units) for a campaign of campaign_days days.
+        
+        With seasonality, each campaign day uses its weekday's average; the campaign
+        starts on campaign_start, or the day after the last observed sale.
+        """
+        if not seasonality:
+            return profile['per_day'] * campaign_days
+        start = pd.Timestamp(campaign_start) if campaign_start is not None else pd.Timestamp(profile['last_date']) + pd.Timedelta(days=1)
+        campaign_weekdays = (start.dayofweek + np.arange(campaign_days)) % 7
+        return np.bincount(campaign_weekdays, minlength=7) @ profile['per_weekday']
+    
+    def _fact_key_codes(self, values):
+        """Integer codes of a fact key column and the keys they index (missing keys get a code too).
+        
+        Interned keys reuse their shared codes, so nothing is hashed; other
+        columns are factorized.
+        """
+        if is_interned(values):
+            codes = key_codes(values)
+            n_keys = len(values.dtype.categories)
+            keys = pd.Categorical.from_codes(np.append(np.arange(n_keys), -1), dtype=values.dtype)
+            return np.where(codes >= 0, codes, n_keys), keys
+        return pd.factorize(values, use_na_sentinel=False)
+    
+    def _dimension_codes(self, fact_codes, fact_keys, dim_df, key_col, attr_col):
+        """Per-row integer codes and labels for a dimension attribute, via the fact's key codes."""
+        if dim_df is None or not key_col or not attr_col:
+            return np.zeros(len(fact_codes), dtype=np.int64), np.array(['Unknown'], dtype=object)
+        
+        positions = key_positions(fact_keys, dim_df[key_col])
+        values = dim_df[attr_col].astype(object).to_numpy()
+        key_labels = np.where(positions >= 0, values[positions], 'Unknown')
+        key_labels = np.where(pd.isna(key_labels), 'Unknown', key_labels)
+        label_codes, labels = pd.factorize(key_labels)
+        return label_codes[fact_codes], np.asarray(labels, dtype=object)
+    
+    def _dimension_values(self, fact_codes, fact_keys, dim_df, key_col, value_col):
+        """Per-row numeric values of a dimension attribute (0 where missing)."""
+        if dim_df is None or not key_col or not value_col:
+            return np.zeros(len(fact_codes))
+        
+        positions = key_positions(fact_keys, dim_df[key_col])
+        values = pd.to_numeric(dim_df[value_col], errors='coerce').fillna(0).to_numpy(dtype=float)
+        key_values = np.where(positions >= 0, values[positions], 0.0)
+        return key_values[fact_codes]
+    
+    def _build_baseline_cube(self, sales_df, stores_df, products_df):
+        """One pass over sales producing daily totals per city x channel x category
+        and observed totals per city x channel x category x SKU x store.
+        
+        Keys are integer codes (the interned ones when keys were interned at
+        load) and dimension attributes are looked up once per distinct key, so
+        no string columns are merged or copied.
+        Orders are distinct order ids per cell and day; undated rows only count
+        towards average price and cost.
+        """
+        n = len(sales_df)
+        if n == 0:
+            return None
+        
+        sku_col = self._get_sku_column(sales_df)
+        store_col = self._get_store_column(sales_df)
+        qty_col = self._get_qty_column(sales_df)
+        price_col = self._get_price_column(sales_df)
+        date_col = self._get_date_column(sales_df)
+        order_col = self._get_order_column(sales_df)
+        
+        if sku_col:
+            sku_codes, sku_keys = self._fact_key_codes(sales_df[sku_col])
+        else:
+            sku_codes, sku_keys = np.zeros(n, dtype=np.int64), pd.Index([np.nan])
+        if store_col:
+            store_codes, store_keys = self._fact_key_codes(sales_df[store_col])
+        else:
+            store_codes, store_keys = np.zeros(n, dtype=np.int64), pd.Index([np.nan])
+        
+        product_key = self._get_sku_column(products_df) if products_df is not None else None
+        store_key = self._get_store_column(stores_df) if stores_df is not None else None
+        city_codes, cities = self._dimension_codes(store_codes, store_keys, stores_df, store_key,
+                                                   self._get_city_column(stores_df) if stores_df is not None else None)
+        channel_codes, channels = self._dimension_codes(store_codes, store_keys, stores_df, store_key,
+                                                        self._get_channel_column(stores_df) if stores_df is not None else None)
+        category_codes, categories = self._dimension_codes(sku_codes, sku_keys, products_df, product_key,
+                                                           self._get_category_column(products_df) if products_df is not None else None)
+        
+        qty = pd.to_numeric(sales_df[qty_col], errors='coerce').fillna(0).to_numpy(dtype=float) if qty_col else np.ones(n)
+        price = pd.to_numeric(sales_df[price_col], errors='coerce').fillna(0).to_numpy(dtype=float) if price_col else np.zeros(n)
+        cost = self._dimension_values(sku_codes, sku_keys, products_df, product_key,
+                                      self._get_cost_column(products_df) if products_df is not None else None)
+        revenue = qty * price
+        profit = qty * (price - cost)
+        
+        if date_col:
+            dates = pd.to_datetime(sales_df[date_col], errors='coerce').to_numpy().astype('datetime64[D]')
+        else:
+            dates = pd.date_range(end=pd.Timestamp.today(), periods=n, freq='h').to_numpy().astype('datetime64[D]')
+        dated = ~np.isnat(dates)
+        first_day = dates[dated].min() if dated.any() else np.datetime64('1970-01-01', 'D')
+        day_index = np.where(dated, (dates - first_day).astype(np.int64), -1)
+        n_days = int(day_index.max()) + 2
+        day_slot = np.where(dated, day_index, n_days - 1)
+        
+        cell = (city_codes * len(channels) + channel_codes) * len(categories) + category_codes
+        cell_day_codes, cell_days = pd.factorize(cell * n_days + day_slot)
+        n_cells = len(cell_days)
+        
+        def total(weights):
+            return np.bincount(cell_day_codes, weights=weights, minlength=n_cells)
+        
+        if order_col:
+            order_codes, order_keys = self._fact_key_codes(sales_df[order_col])
+            distinct = pd.unique(cell_day_codes.astype(np.int64) * len(order_keys) + order_codes)
+            orders = np.bincount(distinct // len(order_keys), minlength=n_cells).astype(float)
+        else:
+            orders = total(qty)
+        
+        cell_of = cell_days // n_days
+        slot_of = cell_days % n_days
+        category_of = cell_of % len(categories)
+        channel_of = (cell_of // len(categories)) % len(channels)
+        city_of = cell_of // (len(categories) * len(channels))
+        day_values = first_day + np.where(slot_of < n_days - 1, slot_of, 0).astype('timedelta64[D]')
+        
+        daily = pd.DataFrame({
+            'city': cities[city_of],
+            'channel': channels[channel_of],
+            'category': categories[category_of],
+            'date': pd.to_datetime(np.where(slot_of < n_days - 1, day_values, np.datetime64('NaT'))),
+            'revenue': total(revenue),
+            'profit': total(profit),
+            'units': total(qty),
+            'price_sum': total(price),
+            'cost_sum': total(cost),
+            'rows': np.bincount(cell_day_codes, minlength=n_cells),
+            'orders': orders
+        })
+        
+        pairs = None
+        if sku_col and store_col:
+            pair_key = (cell * len(sku_keys) + sku_codes) * len(store_keys) + store_codes
+            pair_codes, pair_ids = pd.factorize(pair_key)
+            pair_cell = pair_ids // (len(sku_keys) * len(store_keys))
+            pairs = pd.DataFrame({
+                'city': cities[pair_cell // (len(categories) * len(channels))],
+                'channel': channels[(pair_cell // len(categories)) % len(channels)],
+                'category': categories[pair_cell % len(categories)],
+                '_sku': np.asarray(sku_keys, dtype=object)[(pair_ids // len(store_keys)) % len(sku_keys)],
+                '_store': np.asarray(store_keys, dtype=object)[pair_ids % len(store_keys)],
+                '_units': np.bincount(pair_codes, weights=qty, minlength=len(pair_ids)),
+                '_revenue': np.bincount(pair_codes, weights=revenue, minlength=len(pair_ids))
+            })
+        
+        return {'daily': daily, 'pairs': pairs}
+    
+    def baseline_cube(self, sales_df, stores_df, products_df, fingerprint=None):
+        """Cached baseline cube for every city x channel x category combination."""
+        key = ('cube', fingerprint or dataset_fingerprint(sales_df, stores_df, products_df))
+        cached = self._baseline_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        cube = self._build_baseline_cube(sales_df, stores_df, products_df)
+        if cube is None:
+            return None
+        return self._baseline_cache.put(key, cube)
+    
+    def _segment_mask(self, table, city, channel, category):
+        """Boolean mask selecting a segment's rows in a cube table."""
+        mask = np.ones(len(table), dtype=bool)
+        for col, value in [('city', city), ('channel', channel), ('category', category)]:
+            if value != 'All':
+                mask &= (table[col] == value).to_numpy()
+        return mask
+    
+    def segment_baseline(self, sales_df, stores_df, products_df, city='All', channel='All', category='All'):
+        """Cached baseline profile and average price/cost for a campaign segment.
+        
+        Derived from the baseline cube, so every segment after the first costs a
+        filter over a few thousand cube rows. Returns None when no dated sales
+        match the segment.
+        """
+        fingerprint = dataset_fingerprint(sales_df, stores_df, products_df)
+        key = ('segment', fingerprint, city, channel, category)
+        cached = self._baseline_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        cube = self.baseline_cube(sales_df, stores_df, products_df, fingerprint)
+        if cube is None:
+            return None
+        
+        cells = cube['daily'][self._segment_mask(cube['daily'], city, channel, category)]
+        dated = cells.dropna(subset=['date'])
+        if len(dated) == 0:
+            return None
+        
+        daily = dated.groupby('date')[['revenue', 'profit', 'orders', 'units']].sum()
+        daily = daily.reindex(pd.date_range(daily.index.min(), daily.index.max(), freq='D'), fill_value=0)
+        
+        baseline = self._baseline_profile(daily)
+        rows = cells['rows'].sum()
+        baseline['avg_price'] = float(cells['price_sum'].sum() / rows)
+        baseline['avg_cost'] = float(cells['cost_sum'].sum() / rows)
+        return self._baseline_cache.put(key, baseline)
+    
+    def segment_pairs(self, sales_df, stores_df, products_df, city='All', channel='All', category='All'):
+        """Observed units and revenue per SKU x store pair in a segment, from the baseline cube."""
+        cube = self.baseline_cube(sales_df, stores_df, products_df)
+        if cube is None or cube['pairs'] is None:
+            return None
+        pairs = cube['pairs']
+        return pairs[self._segment_mask(pairs, city, channel, category)]
+    
+    def _resolve_elasticity(self, sales_df, stores_df, products_df, city='All', channel='All', category='All'):
+        """Elasticity for a campaign segment (fitted or default)."""
+        if not self.use_fitted_elasticity:
+            return self.category_elasticity.get(category, self.default_elasticity) if category != 'All' else self.default_elasticity
+        
+        estimator = ElasticityEstimator(self.category_elasticity, self.default_elasticity)
+        by_city_channel = city != 'All' and channel != 'All'
+        fitted = estimator.fit(sales_df, products_df, stores_df, by_city_channel=by_city_channel)
+        return estimator.lookup(fitted, category, city, channel)
+    
     def simulate_campaign(self, sales_df, stores_df, products_df,
                           discount_pct=10, promo_budget=10000, margin_floor=15,
-                          city='All', channel='All', category='All', campaign_days=7):
-        """Simulate a promotional campaign."""
+                          city='All', channel='All', category='All', campaign_days=7,
+                          inventory_df=None, seasonality=False, campaign_start=None):
+        """Simulate a promotional campaign.
+        
+        Baselines are daily rates over the segment's observed date range. With
+        seasonality, they follow the weekday mix of the campaign window.
+        Pass inventory_df to cap expected sales at the stock available for the
+        targeted SKU x store pairs (inventory-constrained mode).
+        """
         try:
-            merged = sales_df.copy()
-            
-            # Find columns
-            sku_col_sales = self._get_sku_column(sales_df)
-            sku_col_products = self._get_sku_column(products_df)
-            store_col_sales = self._get_store_column(sales_df)
-            store_col_stores = self._get_store_column(stores_df)
-            cost_col = self._get_cost_column(products_df)
-            price_col = self._get_price_column(sales_df)
-            qty_col = self._get_qty_column(sales_df)
-            order_col = self._get_order_column(sales_df)
-            category_col = self._get_category_column(products_df)
-            city_col = self._get_city_column(stores_df)
-            channel_col = self._get_channel_column(stores_df)
-            
-            # Merge with stores
-            if store_col_sales and store_col_stores:
-                stores_cols = [store_col_stores]
-                if city_col:
-                    stores_cols.append(city_col)
-                if channel_col:
-                    stores_cols.append(channel_col)
-                
-                stores_subset = stores_df[stores_cols].copy()
-                stores_subset.columns = ['_store'] + stores_cols[1:]
-                merged['_store'] = merged[store_col_sales]
-                merged = merged.merge(stores_subset, on='_store', how='left')
-            
-            # Merge with products
-            if sku_col_sales and sku_col_products:
-                products_cols = [sku_col_products]
-                if cost_col:
-                    products_cols.append(cost_col)
-                if category_col:
-                    products_cols.append(category_col)
-                
-                products_subset = products_df[products_cols].copy()
-                new_names = ['_sku']
-                if cost_col:
-                    new_names.append('_cost')
-                if category_col:
-                    new_names.append('category')
-                products_subset.columns = new_names
-                
-                merged['_sku'] = merged[sku_col_sales]
-                merged = merged.merge(products_subset, on='_sku', how='left')
-            
-            # Set defaults
-            if '_cost' not in merged.columns:
-                merged['_cost'] = 0
-            if 'category' not in merged.columns:
-                merged['category'] = 'Unknown'
-            if city_col and city_col not in merged.columns:
-                merged[city_col] = 'Unknown'
-            if channel_col and channel_col not in merged.columns:
-                merged[channel_col] = 'Unknown'
-            
-            # Get qty and price
-            if qty_col:
-                merged['_qty'] = pd.to_numeric(merged[qty_col], errors='coerce').fillna(0)
-            else:
-                merged['_qty'] = 1
-            
-            if price_col:
-                merged['_price'] = pd.to_numeric(merged[price_col], errors='coerce').fillna(0)
-            else:
-                merged['_price'] = 0
-            
-            merged['_cost'] = pd.to_numeric(merged['_cost'], errors='coerce').fillna(0)
-            
-            # Filter by targeting
-            if city != 'All' and city_col and city_col in merged.columns:
-                merged = merged[merged[city_col] == city]
-            if channel != 'All' and channel_col and channel_col in merged.columns:
-                merged = merged[merged[channel_col] == channel]
-            if category != 'All' and 'category' in merged.columns:
-                merged = merged[merged['category'] == category]
-            
-            if len(merged) == 0:
+            profile = self.segment_baseline(sales_df, stores_df, products_df, city, channel, category)
+            if profile is None:
                 return {'outputs': None, 'comparison': None, 'warnings': ['No data matches filters']}
             
-            merged['revenue'] = merged['_qty'] * merged['_price']
-            merged['profit'] = merged['_qty'] * (merged['_price'] - merged['_cost'])
-            
-            data_days = 30
-            baseline_revenue = merged['revenue'].sum() / data_days * campaign_days
-            baseline_profit = merged['profit'].sum() / data_days * campaign_days
-            
-            if order_col and order_col in merged.columns:
-                baseline_orders = merged[order_col].nunique() / data_days * campaign_days
-            else:
-                baseline_orders = len(merged) / data_days * campaign_days
-            
-            baseline_units = merged['_qty'].sum() / data_days * campaign_days
-            
-            elasticity = self.category_elasticity.get(category, self.default_elasticity) if category != 'All' else self.default_elasticity
+            baseline_revenue, baseline_profit, baseline_orders, baseline_units = self._campaign_baseline(
+                profile, campaign_days, seasonality, campaign_start)
             
-            demand_lift_pct = discount_pct * elasticity
+            elasticity = self._resolve_elasticity(sales_df, stores_df, products_df, city, channel, category)
             
-            expected_units = baseline_units * (1 + demand_lift_pct / 100)
-            avg_price = merged['_price'].mean()
-            avg_cost = merged['_cost'].mean()
+            avg_price = profile['avg_price']
+            avg_cost = profile['avg_cost']
             
-            discounted_price = avg_price * (1 - discount_pct / 100)
-            expected_revenue = expected_units * discounted_price
+            inventory = None
+            lost_units = None
+            if inventory_df is not None:
+                pair_totals = self.segment_pairs(sales_df, stores_df, products_df, city, channel, category)
+                observed_units = profile['per_day'][3] * profile['window_days']
+                period_scale = baseline_units / observed_units if observed_units > 0 else campaign_days / profile['window_days']
+                demand_multiplier = 1 + discount_pct * elasticity / 100
+                inventory = self.check_inventory_feasibility(pair_totals, inventory_df, period_scale,
+                                                             discount_pct, demand_multiplier)
+                if inventory is not None:
+                    lost_units = inventory['lost_units']
             
-            promo_cost = min(promo_budget, expected_revenue * 0.1)
-            fulfillment_cost = expected_units * 2
-            cogs = expected_units * avg_cost
+            economics = self._campaign_economics(baseline_units, baseline_orders, baseline_profit, avg_price, avg_cost,
+                                                 discount_pct, elasticity, promo_budget, lost_units)
             
-            expected_gross_profit = expected_revenue - cogs
-            expected_net_profit = expected_gross_profit - promo_cost - fulfillment_cost
-            expected_margin_pct = (expected_net_profit / expected_revenue * 100) if expected_revenue > 0 else 0
-            
-            total_investment = promo_cost + fulfillment_cost
-            roi_pct = ((expected_net_profit - baseline_profit) / total_investment * 100) if total_investment > 0 else 0
+            expected_revenue = float(economics['expected_revenue'])
+            expected_net_profit = float(economics['expected_net_profit'])
+            expected_margin_pct = float(economics['expected_margin_pct'])
+            demand_lift_pct = float(economics['demand_lift_pct'])
+            roi_pct = float(economics['roi_pct'])
             
             warnings = []
             if expected_margin_pct < margin_floor:
@@ -518,30 +764,163 @@ class Simulator:
                 warnings.append(f"Negative ROI ({roi_pct:.1f}%)")
             if discount_pct > 30:
                 warnings.append("High discount may erode brand value")
+            if inventory is not None and inventory['lost_units'] > 0:
+                warnings.append(f"Inventory short by {inventory['lost_units']:,.0f} units across {inventory['stockout_pairs']:,} SKU-store pairs "
+                                f"(AED {inventory['revenue_at_risk']:,.0f} revenue at risk)")
             
             outputs = {
                 'expected_revenue': expected_revenue,
-                'expected_orders': int(baseline_orders * (1 + demand_lift_pct / 100)),
-                'expected_units': expected_units,
+                'expected_orders': int(economics['expected_orders']),
+                'expected_units': float(economics['expected_units']),
                 'expected_net_profit': expected_net_profit,
                 'expected_margin_pct': expected_margin_pct,
                 'demand_lift_pct': demand_lift_pct,
                 'roi_pct': roi_pct,
-                'promo_cost': promo_cost,
-                'fulfillment_cost': fulfillment_cost
+                'promo_cost': float(economics['promo_cost']),
+                'fulfillment_cost': float(economics['fulfillment_cost'])
             }
             
             comparison = {
                 'baseline_revenue': baseline_revenue,
                 'baseline_profit': baseline_profit,
                 'baseline_orders': int(baseline_orders),
+                'baseline_window_days': profile['window_days'],
+                'seasonality': seasonality,
                 'revenue_change_pct': ((expected_revenue - baseline_revenue) / baseline_revenue * 100) if baseline_revenue > 0 else 0,
                 'profit_change_pct': ((expected_net_profit - baseline_profit) / abs(baseline_profit) * 100) if baseline_profit != 0 else 0,
                 'order_change_pct': demand_lift_pct
             }
             
-            return {'outputs': outputs, 'comparison': comparison, 'warnings': warnings}
+            return {'outputs': outputs, 'comparison': comparison, 'warnings': warnings, 'inventory': inventory}
             
         except Exception as e:
             print(f"Error in simulate_campaign: {e}")
             return {'outputs': None, 'comparison': None, 'warnings': [f'Error: {str(e)}']}
+    
+    def optimize_discount(self, sales_df, stores_df, products_df,
+                          promo_budget=10000, margin_floor=15,
+                          city='All', channel='All', category='All', campaign_days=7,
+                          objective='net_profit', discounts=None, seasonality=False):
+        """Find the discount that maximizes net profit or ROI subject to the margin floor.
+        
+        All candidate discounts are evaluated in one vectorized pass over the cached
+        segment baseline. Returns the optimum (None if no discount meets the floor)
+        and the full frontier, one row per candidate.
+        """
+        try:
+            profile = self.segment_baseline(sales_df, stores_df, products_df, city, channel, category)
+            if profile is None:
+                return {'optimum': None, 'frontier': None, 'warnings': ['No data matches filters']}
+            
+            discounts = np.arange(0, 51, 1, dtype=float) if discounts is None else np.asarray(discounts, dtype=float)
+            baseline_revenue, baseline_profit, baseline_orders, baseline_units = self._campaign_baseline(
+                profile, campaign_days, seasonality)
+            elasticity = self._resolve_elasticity(sales_df, stores_df, products_df, city, channel, category)
+            
+            economics = self._campaign_economics(baseline_units, baseline_orders, baseline_profit,
+                                                 profile['avg_price'], profile['avg_cost'],
+                                                 discounts, elasticity, promo_budget)
+            
+            frontier = pd.DataFrame({
+                'discount_pct': discounts,
+                'expected_revenue': economics['expected_revenue'],
+                'expected_net_profit': economics['expected_net_profit'],
+                'expected_margin_pct': economics['expected_margin_pct'],
+                'roi_pct': economics['roi_pct'],
+                'demand_lift_pct': economics['demand_lift_pct']
+            })
+            frontier['meets_margin_floor'] = frontier['expected_margin_pct'] >= margin_floor
+            
+            score_col = 'roi_pct' if objective == 'roi' else 'expected_net_profit'
+            feasible = frontier[frontier['meets_margin_floor']]
+            
+            warnings = []
+            optimum = None
+            if len(feasible) > 0:
+                optimum = feasible.loc[feasible[score_col].idxmax()].to_dict()
+            else:
+                warnings.append(f"No discount keeps margin above floor ({margin_floor}%)")
+            
+            return {
+                'optimum': optimum,
+                'frontier': frontier,
+                'objective': score_col,
+                'baseline_revenue': float(baseline_revenue),
+                'baseline_profit': float(baseline_profit),
+                'warnings': warnings
+            }
+            
+        except Exception as e:
+            print(f"Error in optimize_discount: {e}")
+            return {'optimum': None, 'frontier': None, 'warnings': [f'Error: {str(e)}']}
+    
+    def simulate_campaign_monte_carlo(self, sales_df, stores_df, products_df,
+                                      discount_pct=10, promo_budget=10000, margin_floor=15,
+                                      city='All', channel='All', category='All', campaign_days=7,
+                                      n_draws=10000, elasticity_cv=0.25, cost_cv=0.05, seed=None):
+        """Simulate a campaign under uncertainty with a vectorized Monte Carlo pass.
+        
+        Each draw samples an elasticity (lognormal around the category value),
+        a baseline by bootstrapping campaign_days days from the segment's daily
+        trend (days without sales count as zero), and a unit-cost multiplier.
+        The daily trend comes from the cached segment baseline, so repeat runs
+        do not revisit sales rows.
+        """
+        try:
+            profile = self.segment_baseline(sales_df, stores_df, products_df, city, channel, category)
+            if profile is None:
+                return {'percentiles': None, 'warnings': ['No data matches filters']}
+            
+            # Zero-sales days are included so sparse segments are not overstated
+            daily = profile['daily']
+            
+            rng = np.random.default_rng(seed)
+            day_idx = rng.integers(0, len(daily), size=(n_draws, campaign_days))
+            baseline_units = daily['units'].to_numpy(dtype=float)[day_idx].sum(axis=1)
+            baseline_orders = daily['orders'].to_numpy(dtype=float)[day_idx].sum(axis=1)
+            baseline_profit = daily['profit'].to_numpy(dtype=float)[day_idx].sum(axis=1)
+            baseline_revenue = daily['revenue'].to_numpy(dtype=float)[day_idx].sum(axis=1)
+            
+            point_elasticity = self._resolve_elasticity(sales_df, stores_df, products_df, city, channel, category)
+            sigma = np.sqrt(np.log1p(elasticity_cv ** 2))
+            elasticity = point_elasticity * np.exp(rng.normal(-sigma ** 2 / 2, sigma, n_draws))
+            cost_multiplier = np.clip(rng.normal(1.0, cost_cv, n_draws), 0, None)
+            
+            avg_price = profile['avg_price']
+            avg_cost = profile['avg_cost'] * cost_multiplier
+            
+            economics = self._campaign_economics(baseline_units, baseline_orders, baseline_profit, avg_price, avg_cost,
+                                                 discount_pct, elasticity, promo_budget)
+            
+            metrics = {
+                'revenue': economics['expected_revenue'],
+                'net_profit': economics['expected_net_profit'],
+                'margin_pct': economics['expected_margin_pct'],
+                'roi_pct': economics['roi_pct']
+            }
+            quantiles = {name: np.percentile(values, [10, 50, 90]) for name, values in metrics.items()}
+            percentiles = {name: {'p10': float(q[0]), 'p50': float(q[1]), 'p90': float(q[2])} for name, q in quantiles.items()}
+            
+            prob_below_floor = float((metrics['margin_pct'] < margin_floor).mean())
+            prob_negative_roi = float((metrics['roi_pct'] < 0).mean())
+            
+            warnings = []
+            if prob_below_floor > 0.1:
+                warnings.append(f"{prob_below_floor * 100:.0f}% chance margin falls below floor ({margin_floor}%)")
+            if prob_negative_roi > 0.5:
+                warnings.append(f"ROI is negative in {prob_negative_roi * 100:.0f}% of scenarios")
+            
+            return {
+                'percentiles': percentiles,
+                'prob_below_margin_floor': prob_below_floor,
+                'prob_negative_roi': prob_negative_roi,
+                'baseline_revenue_p50': float(np.median(baseline_revenue)),
+                'n_draws': int(n_draws),
+                'observed_days': len(daily),
+                'samples': {'net_profit': metrics['net_profit'], 'margin_pct': metrics['margin_pct']},
+                'warnings': warnings
+            }
+            
+        except Exception as e:
+            print(f"Error in simulate_campaign_monte_carlo: {e}")
+            return {'percentiles': None, 'warnings': [f'Error: {str(e)}']}
@@ -3,6 +3,16 @@
 # Utility Functions
 # ============================================================================
 
+import hashlib
+import os
+import tempfile
+import threading
+import time
+import weakref
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+
 import pandas as pd
 import numpy as np
 
@@ -67,19 +77,227 @@ SIMULATOR_CONFIG = {
         'Sharjah': 0.15
     },
     
+    # Demand lift % per 1% discount; priors for the fitted estimator
     'category_elasticity': {
-        'Electronics': 1.3,
-        'Fashion': 1.2,
-        'Beauty': 1.1,
-        'Sports': 1.0,
-        'Home': 0.9,
-        'Grocery': 0.7
+        'Electronics': 1.8,
+        'Fashion': 2.0,
+        'Grocery': 1.2,
+        'Beauty': 1.6,
+        'Home': 1.4,
+        'Sports': 1.7
+    },
+    'default_elasticity': 1.5,
+    
+    # Elasticity fitting (log-log regression shrunk towards the priors above)
+    'elasticity_fit': {
+        'prior_sd': 0.5,
+        'min_observations': 30,
+        'max_elasticity': 5.0
     },
     
     'promo_cost_per_order': 2.0,
     'fulfillment_cost_pct': 0.05
 }
 
+# ============================================================================
+# COLUMN SCHEMA
+# ============================================================================
+# Canonical column roles per table and the header aliases each accepts, in
+# match order (compared lowercased, spaces as underscores). The one source of
+# column names for FileValidator, CLEANING_RULES (rename/columns) and
+# modules/schema.py. kind types the column when read (see
+# FileValidator.read_schema); fallback_aliases are matched last and are too
+# ambiguous (e.g. inventory 'qty') to recognize a file type by.
+
+COLUMN_SCHEMA = {
+    'products': {
+        'sku': {'kind': 'id', 'aliases': ['sku', 'product_id', 'productid', 'product_sku', 'item_id']},
+        'category': {'kind': 'text', 'aliases': ['category', 'product_category', 'cat']},
+        'brand': {'kind': 'text', 'aliases': ['brand']},
+        'product_name': {'kind': 'text', 'aliases': ['product_name']},
+        'launch_flag': {'kind': 'text', 'aliases': ['launch_flag']},
+        'base_price_aed': {'kind': 'numeric', 'aliases': ['base_price_aed', 'base_price', 'price', 'price_aed'],
+                           'fallback_aliases': ['selling_price', 'selling_price_aed']},
+        'unit_cost_aed': {'kind': 'numeric', 'aliases': ['unit_cost_aed', 'unit_cost', 'cost', 'cost_aed', 'cost_price',
+                                                         'purchase_price', 'buying_price']},
+        'tax_rate': {'kind': 'numeric', 'aliases': ['tax_rate']}
+    },
+    'stores': {
+        'store_id': {'kind': 'id', 'aliases': ['store_id', 'storeid', 'store', 'location_id']},
+        'city': {'kind': 'text', 'aliases': ['city', 'store_city', 'location']},
+        'channel': {'kind': 'text', 'aliases': ['channel', 'sales_channel', 'store_channel']},
+        'fulfillment_type': {'kind': 'text', 'aliases': ['fulfillment_type']},
+        'store_name': {'kind': 'text', 'aliases': ['store_name']}
+    },
+    'sales': {
+        'order_id': {'kind': 'id', 'aliases': ['order_id', 'orderid', 'transaction_id', 'txn_id', 'invoice_id']},
+        'sku': {'kind': 'id', 'aliases': ['sku', 'product_id', 'productid', 'product_sku', 'item_id']},
+        'store_id': {'kind': 'id', 'aliases': ['store_id', 'storeid', 'store', 'location_id']},
+        'qty': {'kind': 'numeric', 'aliases': ['qty', 'quantity', 'units', 'qty_sold', 'units_sold']},
+        'order_time': {'kind': 'datetime', 'aliases': ['order_time', 'order_date', 'date', 'timestamp', 'transaction_date',
+                                                       'order_ts', 'created_at', 'sale_date']},
+        'selling_price_aed': {'kind': 'numeric', 'aliases': ['selling_price_aed', 'selling_price', 'price', 'amount',
+                                                             'unit_price', 'sale_price']},
+        'discount_pct': {'kind': 'numeric', 'aliases': ['discount_pct', 'discount', 'discount_percent']},
+        'payment_status': {'kind': 'text', 'aliases': ['payment_status', 'status', 'payment']},
+        # Read untyped: the cleaner maps its tokens
+        'return_flag': {'kind': None, 'aliases': ['return_flag', 'returned', 'is_returned', 'is_return']}
+    },
+    'inventory': {
+        'sku': {'kind': 'id', 'aliases': ['sku', 'product_id', 'productid', 'product_sku', 'item_id']},
+        'store_id': {'kind': 'id', 'aliases': ['store_id', 'storeid', 'store', 'location_id']},
+        'stock_on_hand': {'kind': 'numeric', 'aliases': ['stock_on_hand', 'stock', 'inventory', 'on_hand'],
+                          'fallback_aliases': ['qty', 'quantity']},
+        'snapshot_date': {'kind': 'datetime', 'aliases': ['snapshot_date', 'date', 'as_of_date']},
+        'reorder_point': {'kind': 'numeric', 'aliases': ['reorder_point', 'reorder_level', 'min_stock']},
+        'lead_time_days': {'kind': 'numeric', 'aliases': ['lead_time_days', 'lead_time']}
+    }
+}
+
+
+def column_aliases(table, role, fallback=True):
+    """Header aliases of a table's column role in match order (fallback aliases last)."""
+    spec = COLUMN_SCHEMA[table][role]
+    return spec['aliases'] + (spec.get('fallback_aliases', []) if fallback else [])
+
+
+# ============================================================================
+# CLEANING RULES
+# ============================================================================
+# Run by modules/rules.py. Per table:
+#   rename  - standard name: variations (columns are renamed to the standard name)
+#   columns - name: candidates (resolved, but the column keeps its own name)
+# Both take their names from COLUMN_SCHEMA.
+#   strip   - text columns converted to str and stripped
+#   numeric - columns coerced with pd.to_numeric
+#   rules   - applied in order; drops are deferred to one keep-mask per table
+# Column rule types: map, domain, boolean, datetime, year_range, fill,
+# replace_negative, cap, impute_missing, upper_bound. Table rule type: dedup.
+# issue/detail/action fill the issues log ({count}, {value} are substituted);
+# flag names the fix_flags bit set on fixed rows. Map rules using text_mappings
+# can set fuzzy (minimum match confidence) and fuzzy_issue (logged per match).
+# Map rules with tokens and boolean rules match case-insensitive token lists
+# via classify_tokens.
+
+CLEANING_RULES = {
+    'tables': {
+        'products': {
+            'rename': {role: column_aliases('products', role) for role in ['sku']},
+            'columns': {role: column_aliases('products', role) for role in ['unit_cost_aed', 'base_price_aed']},
+            'strip': ['category', 'brand', 'product_name', 'launch_flag'],
+            'numeric': [],
+            'rules': [
+                {'type': 'map', 'column': 'category', 'text_mappings': 'categories', 'field': 'category',
+                 'fuzzy': 0.8, 'fuzzy_issue': 'FUZZY_MATCHED_CATEGORY', 'flag': 'STANDARDIZED_CATEGORY'},
+                {'type': 'map', 'column': 'launch_flag', 'fallback': 'title', 'missing': 'Regular',
+                 'tokens': {'New': ['new', 'n'], 'Regular': ['regular', 'reg', 'r']},
+                 'flag': 'STANDARDIZED_LAUNCH_FLAG'},
+                {'type': 'domain', 'column': 'launch_flag', 'valid': CONFIG['valid_launch_flags'], 'label': 'launch_flag',
+                 'issue': 'INVALID_LAUNCH_FLAG'},
+                {'type': 'impute_missing', 'column': 'unit_cost_aed', 'source': 'base_price_aed', 'ratio': 0.6,
+                 'issue': 'MISSING_UNIT_COST', 'flag': 'IMPUTED_COST',
+                 'detail': '{count} products missing unit_cost_aed', 'action': 'Imputed based on price or median'},
+                {'type': 'upper_bound', 'column': 'unit_cost_aed', 'bound': 'base_price_aed', 'ratio': 0.6,
+                 'issue': 'COST_EXCEEDS_PRICE', 'flag': 'REPRICED_COST',
+                 'detail': '{count} products have unit_cost > base_price', 'action': 'Set cost to 60% of price'},
+                {'type': 'dedup', 'columns': ['sku'], 'keep': 'first', 'issue': 'DUPLICATE_SKU',
+                 'detail': '{count} duplicate SKUs found', 'action': 'Kept first occurrence'}
+            ]
+        },
+        'stores': {
+            'rename': {role: column_aliases('stores', role) for role in ['store_id']},
+            'columns': {},
+            'strip': ['city', 'channel', 'store_name', 'fulfillment_type'],
+            'numeric': [],
+            'rules': [
+                {'type': 'map', 'column': 'city', 'text_mappings': 'cities', 'field': 'city',
+                 'fuzzy': 0.8, 'fuzzy_issue': 'FUZZY_MATCHED_CITY', 'flag': 'STANDARDIZED_CITY'},
+                {'type': 'domain', 'column': 'city', 'valid': CONFIG['valid_cities'], 'label': 'City', 'issue': 'INVALID_CITY'},
+                {'type': 'map', 'column': 'channel', 'text_mappings': 'channels', 'field': 'channel',
+                 'fuzzy': 0.8, 'fuzzy_issue': 'FUZZY_MATCHED_CHANNEL', 'flag': 'STANDARDIZED_CHANNEL'},
+                {'type': 'domain', 'column': 'channel', 'valid': CONFIG['valid_channels'], 'label': 'Channel', 'issue': 'INVALID_CHANNEL'},
+                {'type': 'map', 'column': 'fulfillment_type', 'fallback': 'strip',
+                 'tokens': {'Own': ['own', 'self'], '3PL': ['3pl', 'third party', 'thirdparty', '3rd party']},
+                 'flag': 'STANDARDIZED_FULFILLMENT'},
+                {'type': 'domain', 'column': 'fulfillment_type', 'valid': CONFIG['valid_fulfillment_types'],
+                 'label': 'fulfillment_type', 'issue': 'INVALID_FULFILLMENT_TYPE'},
+                {'type': 'dedup', 'columns': ['store_id'], 'keep': 'first', 'issue': 'DUPLICATE_STORE_ID',
+                 'detail': '{count} duplicate store_ids found', 'action': 'Kept first occurrence'}
+            ]
+        },
+        'sales': {
+            'rename': {role: column_aliases('sales', role) for role in [
+                'order_id', 'sku', 'store_id', 'qty', 'order_time', 'selling_price_aed', 'discount_pct',
+                'payment_status', 'return_flag']},
+            'columns': {},
+            'strip': [],
+            'numeric': ['qty', 'selling_price_aed'],
+            'rules': [
+                {'type': 'datetime', 'column': 'order_time', 'issue': 'INVALID_TIMESTAMP',
+                 'detail': '{count} orders have corrupted/unparseable timestamps', 'action': 'Dropped rows'},
+                {'type': 'year_range', 'column': 'order_time', 'min_year': 2020, 'max_year': 2030, 'issue': 'OUT_OF_RANGE_DATE',
+                 'detail': '{count} orders have dates outside valid range (2020-2030)', 'action': 'Dropped rows'},
+                {'type': 'map', 'column': 'payment_status', 'fallback': 'title',
+                 'tokens': {'Paid': ['paid', 'p', 'completed'], 'Failed': ['failed', 'f', 'failure'],
+                            'Refunded': ['refunded', 'r', 'refund']},
+                 'flag': 'STANDARDIZED_PAYMENT_STATUS'},
+                {'type': 'domain', 'column': 'payment_status', 'valid': CONFIG['valid_payment_statuses'],
+                 'label': 'payment_status', 'issue': 'INVALID_PAYMENT_STATUS'},
+                {'type': 'boolean', 'column': 'return_flag', 'true': CONFIG['true_values'],
+                 'false': CONFIG['false_values'], 'missing': CONFIG['null_representations'],
+                 'issue': 'INVALID_RETURN_FLAG', 'flag': 'DEFAULTED_RETURN_FLAG',
+                 'detail': '{count} orders have invalid return_flag', 'action': 'Set to False'},
+                {'type': 'fill', 'column': 'discount_pct', 'value': 0, 'issue': 'MISSING_DISCOUNT', 'flag': 'DEFAULTED_DISCOUNT',
+                 'detail': '{count} orders missing discount_pct', 'action': 'Set to 0'},
+                {'type': 'replace_negative', 'column': 'qty', 'value': 1, 'issue': 'NEGATIVE_QTY', 'flag': 'FIXED_NEGATIVE_QTY',
+                 'detail': '{count} orders have negative qty', 'action': 'Set to 1'},
+                {'type': 'cap', 'column': 'qty', 'quantile': 0.95, 'threshold': 3, 'cap': 2,
+                 'issue': 'OUTLIER_QTY', 'flag': 'CAPPED_QTY',
+                 'detail': '{count} orders have extreme qty values', 'action': 'Capped at {value:.0f}'},
+                {'type': 'replace_negative', 'column': 'selling_price_aed', 'value': 'median', 'action_code': 'IMPUTED',
+                 'issue': 'NEGATIVE_PRICE', 'flag': 'FIXED_NEGATIVE_PRICE',
+                 'detail': '{count} orders have negative price', 'action': 'Set to median'},
+                {'type': 'cap', 'column': 'selling_price_aed', 'quantile': 0.95, 'threshold': 5, 'cap': 3,
+                 'issue': 'OUTLIER_PRICE', 'flag': 'CAPPED_PRICE',
+                 'detail': '{count} orders have extreme price values', 'action': 'Capped at {value:.0f}'},
+                {'type': 'dedup', 'columns': ['order_id'], 'sort_by': 'order_time', 'ascending': False, 'keep': 'first',
+                 'issue': 'DUPLICATE_ORDER_ID', 'detail': '{count} duplicate order_ids found', 'action': 'Kept latest by timestamp'}
+            ]
+        },
+        'inventory': {
+            'rename': {role: column_aliases('inventory', role) for role in [
+                'sku', 'store_id', 'stock_on_hand', 'snapshot_date']},
+            'columns': {},
+            'strip': [],
+            'numeric': ['stock_on_hand'],
+            'rules': [
+                {'type': 'replace_negative', 'column': 'stock_on_hand', 'value': 0, 'issue': 'NEGATIVE_STOCK', 'flag': 'ZEROED_STOCK',
+                 'detail': '{count} inventory records have negative stock', 'action': 'Set to 0'},
+                {'type': 'cap', 'column': 'stock_on_hand', 'quantile': 0.95, 'threshold': 5, 'cap': 3,
+                 'issue': 'EXTREME_STOCK', 'flag': 'CAPPED_STOCK',
+                 'detail': '{count} inventory records have extreme stock values', 'action': 'Capped at {value:.0f}'},
+                {'type': 'fill', 'column': 'reorder_point', 'value': 10, 'issue': 'MISSING_REORDER_POINT', 'flag': 'DEFAULTED_REORDER_POINT',
+                 'detail': '{count} records missing reorder_point', 'action': 'Set to 10'},
+                {'type': 'fill', 'column': 'lead_time_days', 'value': 3, 'issue': 'MISSING_LEAD_TIME', 'flag': 'DEFAULTED_LEAD_TIME',
+                 'detail': '{count} records missing lead_time_days', 'action': 'Set to 3'},
+                {'type': 'dedup', 'columns': ['sku', 'store_id', 'snapshot_date'], 'min_columns': 2, 'keep': 'last',
+                 'issue': 'DUPLICATE_INVENTORY', 'detail': '{count} duplicate inventory records', 'action': 'Kept latest'}
+            ]
+        }
+    },
+    # Checked after all tables, against the rows the referenced table keeps
+    'foreign_keys': [
+        {'table': 'sales', 'column': 'sku', 'ref_table': 'products', 'ref_column': 'sku', 'issue': 'INVALID_SKU_FK',
+         'report_key': 'invalid_skus', 'detail': '{count} sales reference non-existent SKUs', 'action': 'Dropped rows'},
+        {'table': 'sales', 'column': 'store_id', 'ref_table': 'stores', 'ref_column': 'store_id', 'issue': 'INVALID_STORE_FK',
+         'report_key': 'invalid_stores', 'detail': '{count} sales reference non-existent stores', 'action': 'Dropped rows'},
+        {'table': 'inventory', 'column': 'sku', 'ref_table': 'products', 'ref_column': 'sku', 'issue': 'INVALID_SKU_FK',
+         'detail': '{count} inventory records reference non-existent SKUs', 'action': 'Dropped rows'},
+        {'table': 'inventory', 'column': 'store_id', 'ref_table': 'stores', 'ref_column': 'store_id', 'issue': 'INVALID_STORE_FK',
+         'detail': '{count} inventory records reference non-existent stores', 'action': 'Dropped rows'}
+    ]
+}
+
 # ============================================================================
 # CHART THEME (High Contrast for Projector)
 # ============================================================================
@@ -133,17 +351,175 @@ def style_plotly_chart(fig):
     )
     return fig
 
+SAMPLE_DATA_FILES = {
+    'products': 'data/products.csv',
+    'stores': 'data/stores.csv',
+    'sales': 'data/sales_raw.csv',
+    'inventory': 'data/inventory_snapshot.csv'
+}
+
+try:
+    import pyarrow  # noqa: F401
+    CSV_ENGINE = 'pyarrow'
+except ImportError:
+    CSV_ENGINE = 'c'
+
+
+def read_typed_csv(source, file_type=None):
+    """Read a CSV with the read schema of its file type (see FileValidator.read_schema).
+    
+    IDs and text are read as strings, CONFIG['null_representations'] become
+    nulls, numeric columns come back numeric and date columns as datetimes;
+    unparseable values become NaN/NaT rather than leaving the column as text.
+    Without a file_type this is a plain read through CSV_ENGINE.
+    """
+    if file_type is None:
+        return pd.read_csv(source, engine=CSV_ENGINE)
+    
+    from .validator import FileValidator
+    
+    header = pd.read_csv(source, nrows=0).columns
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    schema = FileValidator.read_schema(file_type, header)
+    
+    df = pd.read_csv(source, engine=CSV_ENGINE, dtype=schema['dtype'] or None,
+                     na_values=CONFIG['null_representations'], keep_default_na=True)
+    for col in schema['numeric']:
+        if not pd.api.types.is_numeric_dtype(df[col]):
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+    for col in schema['dates']:
+        df[col] = parse_dates_lenient(df[col])
+    return df
+
+
+def parse_dates_lenient(values):
+    """Parse dates fast as ISO 8601, then retry only the failures with mixed formats."""
+    parsed = pd.to_datetime(values, errors='coerce', format='ISO8601')
+    retry = parsed.isna() & values.notna()
+    if retry.any():
+        parsed[retry] = pd.to_datetime(values[retry], errors='coerce', format='mixed')
+    return parsed
+
+
+def classify_tokens(values, vocabularies, missing_tokens=()):
+    """Label values by case-insensitive token vocabularies, once per distinct value.
+
+    vocabularies maps each label to its tokens, e.g. {True: CONFIG['true_values'],
+    False: CONFIG['false_values']}. Values of any type compare as
+    str(value).strip().lower(), so True, 'TRUE' and ' true ' all match 'true'.
+    Returns (labels, matched, missing) arrays aligned with values: the label
+    (None when unmatched), whether a vocabulary matched, and whether the value
+    is null or one of missing_tokens.
+    """
+    codes, uniques = pd.factorize(pd.Series(values), use_na_sentinel=False)
+    uniques = pd.Series(np.asarray(uniques, dtype=object))
+    keys = uniques.astype(str).str.strip().str.lower()
+
+    lookup = {str(token).strip().lower(): label for label, tokens in vocabularies.items() for token in tokens}
+    matched = keys.isin(list(lookup)).to_numpy()
+    labels = np.full(len(uniques), None, dtype=object)
+    labels[matched] = [lookup[key] for key in keys[matched]]
+    missing = (uniques.isna() | keys.isin([str(t).strip().lower() for t in missing_tokens])).to_numpy() & ~matched
+    return labels[codes], matched[codes], missing[codes]
+
+
+def _timed_read_csv(source, file_type):
+    """Parse one CSV source, returning (frame, seconds)."""
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    start = time.perf_counter()
+    df = read_typed_csv(source, file_type)
+    return df, time.perf_counter() - start
+
+
+def read_csv_files(sources, max_workers=None):
+    """Parse several CSVs concurrently.
+    
+    sources maps a name to a path or file object; names that are FileValidator
+    file types ('products', 'sales', ...) are read with that type's schema.
+    The pyarrow engine releases
+    the GIL while parsing, so with enough cores wall time is close to the
+    largest file's parse time. Workers default to one per file, capped at the
+    CPU count. Returns (frames, timings) keyed by name; timings also holds 'total'.
+    """
+    if max_workers is None:
+        max_workers = max(1, min(len(sources), os.cpu_count() or 1))
+    
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {name: executor.submit(_timed_read_csv, source, name if name in SAMPLE_DATA_FILES else None)
+                   for name, source in sources.items()}
+        results = {name: future.result() for name, future in futures.items()}
+    
+    frames = {name: result[0] for name, result in results.items()}
+    timings = {name: result[1] for name, result in results.items()}
+    timings['total'] = time.perf_counter() - start
+    return frames, timings
+
+
 def load_sample_data():
     """Load sample data from data folder."""
     try:
-        products = pd.read_csv('data/products.csv')
-        stores = pd.read_csv('data/stores.csv')
-        sales = pd.read_csv('data/sales_raw.csv')
-        inventory = pd.read_csv('data/inventory_snapshot.csv')
-        return products, stores, sales, inventory
+        frames, _ = read_csv_files(SAMPLE_DATA_FILES)
+        return frames['products'], frames['stores'], frames['sales'], frames['inventory']
     except Exception as e:
         return None, None, None, None
 
+EXPORT_FORMATS = ['CSV', 'Parquet'] if CSV_ENGINE == 'pyarrow' else ['CSV']
+
+
+def _remove_file(path):
+    """Delete a file if it still exists."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class ExportArchive:
+    """An export ZIP on disk, deleted on release(), when garbage collected or at interpreter exit."""
+    
+    def __init__(self, path):
+        self.path = path
+        self._finalizer = weakref.finalize(self, _remove_file, path)
+    
+    def release(self):
+        """Delete the archive now (idempotent)."""
+        self._finalizer()
+    
+    def exists(self):
+        """Whether the archive is still on disk."""
+        return self._finalizer.alive and os.path.exists(self.path)
+
+
+def write_export_archive(frames, fmt='CSV'):
+    """Write named dataframes into a ZIP on disk and return it as an ExportArchive.
+    
+    CSV members are DEFLATE-compressed; Parquet members are already compressed
+    and are stored as-is. Each frame is written straight to the archive, so the
+    whole export is never held in memory. The file lives until the archive is
+    released or dropped (e.g. with its session), or the process exits.
+    """
+    handle, path = tempfile.mkstemp(prefix='uae_pulse_export_', suffix='.zip')
+    os.close(handle)
+    
+    try:
+        if fmt == 'Parquet':
+            with zipfile.ZipFile(path, 'w', zipfile.ZIP_STORED) as archive:
+                for name, df in frames.items():
+                    with archive.open(f"{name}.parquet", 'w') as member:
+                        df.to_parquet(member, index=False)
+        else:
+            with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+                for name, df in frames.items():
+                    with archive.open(f"{name}.csv", 'w') as member:
+                        df.to_csv(member, index=False, encoding='utf-8')
+    except Exception:
+        os.remove(path)
+        raise
+    return ExportArchive(path)
+
 def get_data_summary(df, name):
     """Get summary statistics for a dataframe."""
     return {
@@ -154,3 +530,114 @@ def get_data_summary(df, name):
         'duplicate_count': df.duplicated().sum(),
         'memory_mb': df.memory_usage(deep=True).sum() / (1024 * 1024)
     }
+
+def get_dataset_metadata(tables, sales_df=None):
+    """Small summary record for a dataset version: per-table shape and nulls,
+    plus sales record count and revenue. Meant to be computed once per version
+    and read by every page instead of rescanning the frames.
+    """
+    metadata = {'tables': {}, 'sales_records': 0, 'sales_revenue': 0.0}
+    
+    for name, df in tables.items():
+        if df is None:
+            continue
+        cells = len(df) * len(df.columns)
+        null_count = int(df.isnull().sum().sum())
+        metadata['tables'][name] = {
+            'rows': len(df),
+            'columns': len(df.columns),
+            'null_count': null_count,
+            'null_pct': (null_count / cells * 100) if cells > 0 else 0
+        }
+    
+    if sales_df is not None:
+        metadata['sales_records'] = len(sales_df)
+        try:
+            qty = pd.to_numeric(sales_df['qty'], errors='coerce').fillna(0)
+            price = pd.to_numeric(sales_df['selling_price_aed'], errors='coerce').fillna(0)
+            metadata['sales_revenue'] = float((qty * price).sum())
+        except Exception:
+            metadata['sales_revenue'] = 0.0
+    
+    return metadata
+
+# ============================================================================
+# DATASET FINGERPRINTS & CACHING
+# ============================================================================
+
+# Per-frame digests keyed by id(); the weak reference guards against id reuse
+_frame_digests = {}
+_frame_digests_lock = threading.Lock()
+
+
+def _frame_digest(df):
+    """Digest of a single dataframe's full content, memoized for the lifetime of the object."""
+    with _frame_digests_lock:
+        entry = _frame_digests.get(id(df))
+        if entry is not None and entry[0]() is df:
+            return entry[1]
+    
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr((df.shape, list(df.columns), [str(t) for t in df.dtypes])).encode())
+    if len(df) > 0:
+        try:
+            digest.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+        except Exception:
+            digest.update(str(id(df)).encode())
+    value = digest.digest()
+    
+    try:
+        key = id(df)
+        ref = weakref.ref(df, lambda _, key=key: _frame_digests.pop(key, None))
+        with _frame_digests_lock:
+            _frame_digests[key] = (ref, value)
+    except TypeError:
+        pass
+    return value
+
+
+def dataset_fingerprint(*dfs):
+    """Fingerprint of one or more dataframes, used as a cache key.
+    
+    Hashes shape, columns, dtypes and every row, so frames that differ in any
+    value get different keys. Frames are expected to be replaced (as session
+    state does) rather than mutated in place, which lets each frame's digest
+    be memoized: the rows are hashed once per frame object.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for df in dfs:
+        if df is None:
+            digest.update(b'<none>')
+            continue
+        digest.update(_frame_digest(df))
+    return digest.hexdigest()
+
+
+class FingerprintCache:
+    """Small thread-safe LRU cache keyed by dataset fingerprint."""
+    
+    def __init__(self, max_entries=8):
+        self.max_entries = max_entries
+        self._store = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        """Return the cached value for key, or None."""
+        with self._lock:
+            if key not in self._store:
+                return None
+            self._store.move_to_end(key)
+            return self._store[key]
+    
+    def put(self, key, value):
+        """Store value under key, evicting the least recently used entry."""
+        with self._lock:
+            self._store[key] = value
+            self._store.move_to_end(key)
+            while len(self._store) > self.max_entries:
+                self._store.popitem(last=False)
+        return value
+    
+    def clear(self):
+        with self._lock:
+            self._store.clear()
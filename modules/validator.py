@@ -6,52 +6,63 @@ Validates uploaded files match expected schema for each file type.
 
 import pandas as pd
 
+from .utils import COLUMN_SCHEMA, column_aliases
+
 
 class FileValidator:
     """Validates uploaded files against expected schemas."""
     
-    # Required columns for each file type (with variations)
+    # Required columns for each file type (with variations), from COLUMN_SCHEMA;
+    # fallback aliases are left out so an ambiguous column cannot make a file look valid
     SCHEMAS = {
         'products': {
-            'required': [
-                ['sku', 'product_id', 'productid', 'SKU'],
-                ['category'],
-                ['base_price_aed', 'base_price', 'price'],
-            ],
-            'optional': ['unit_cost_aed', 'unit_cost', 'brand', 'launch_flag', 'tax_rate'],
+            'required': [column_aliases('products', role, fallback=False) for role in ['sku', 'category', 'base_price_aed']],
+            'optional': ['unit_cost_aed', 'brand', 'launch_flag', 'tax_rate'],
             'unique_identifiers': ['sku', 'product_id', 'category', 'brand', 'launch_flag', 'base_price_aed']
         },
         'stores': {
-            'required': [
-                ['store_id', 'storeid'],
-                ['city'],
-                ['channel']
-            ],
+            'required': [column_aliases('stores', role, fallback=False) for role in ['store_id', 'city', 'channel']],
             'optional': ['fulfillment_type', 'store_name'],
             'unique_identifiers': ['store_id', 'city', 'channel', 'fulfillment_type']
         },
         'sales': {
-            'required': [
-                ['order_id', 'orderid', 'transaction_id'],
-                ['sku', 'product_id', 'productid'],
-                ['store_id', 'storeid'],
-                ['qty', 'quantity', 'units'],
-                ['selling_price_aed', 'selling_price', 'price', 'amount']
-            ],
+            'required': [column_aliases('sales', role, fallback=False)
+                         for role in ['order_id', 'sku', 'store_id', 'qty', 'selling_price_aed']],
             'optional': ['order_time', 'discount_pct', 'payment_status', 'return_flag'],
             'unique_identifiers': ['order_id', 'qty', 'selling_price_aed', 'payment_status', 'discount_pct', 'return_flag']
         },
         'inventory': {
-            'required': [
-                ['sku', 'product_id', 'productid'],
-                ['store_id', 'storeid'],
-                ['stock_on_hand', 'stock', 'inventory', 'on_hand']
-            ],
+            'required': [column_aliases('inventory', role, fallback=False) for role in ['sku', 'store_id', 'stock_on_hand']],
             'optional': ['snapshot_date', 'reorder_point', 'lead_time_days'],
             'unique_identifiers': ['stock_on_hand', 'stock', 'reorder_point', 'lead_time_days', 'snapshot_date']
         }
     }
     
+    @classmethod
+    def read_schema(cls, file_type, columns):
+        """
+        Read schema for a file's actual header, from the file type's COLUMN_SCHEMA kinds.
+        
+        Returns {'dtype': {col: 'str'}, 'numeric': [...], 'dates': [...]} using the
+        header's own column names. Columns outside the schema (and flags such as
+        return_flag, whose tokens the cleaner maps) keep inferred types.
+        """
+        kinds = {alias: spec['kind'] for spec in COLUMN_SCHEMA.get(file_type, {}).values()
+                 for alias in spec['aliases'] + spec.get('fallback_aliases', [])}
+        
+        read_schema = {'dtype': {}, 'numeric': [], 'dates': []}
+        for col in columns:
+            kind = kinds.get(str(col).strip().lower().replace(' ', '_'))
+            # Dates keep the engine's native inference (much faster than text);
+            # columns it could not parse are coerced afterwards
+            if kind in ('id', 'text'):
+                read_schema['dtype'][col] = 'str'
+            if kind == 'numeric':
+                read_schema['numeric'].append(col)
+            elif kind == 'datetime':
+                read_schema['dates'].append(col)
+        return read_schema
+    
     @classmethod
     def validate_file(cls, df, expected_type):
         """
@@ -116,6 +127,26 @@ class FileValidator:
                 'uploaded_columns': list(df_columns)[:10]
             }
     
+    @classmethod
+    def validate_header(cls, file, expected_type, sample_rows=5):
+        """
+        Validate an uploaded file from its header and first few rows only.
+        
+        The file position is restored afterwards so it can be parsed in full later.
+        The result carries the parsed sample under 'sample'.
+        """
+        try:
+            sample = pd.read_csv(file, nrows=sample_rows)
+        except Exception:
+            sample = None
+        finally:
+            if hasattr(file, 'seek'):
+                file.seek(0)
+        
+        result = cls.validate_file(sample, expected_type)
+        result['sample'] = sample
+        return result
+    
     @classmethod
     def _detect_file_type(cls, df_columns):
         """Detect the actual file type based on columns - STRICT matching."""